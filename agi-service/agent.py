@@ -1,9 +1,17 @@
 import logging
+import os
 import re
-import json
-from typing import Dict, Any, List, Optional, Tuple
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import tools
 import asyncio
+import render
+from cache import TTLCache
+from memory import SessionContext
+from results import ENTITY_TYPES, ListCursor, ToolResult
+import analytics
+import intent_classifier
+import name_index
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +20,8 @@ REGEX_PATTERNS = {
     # Client patterns
     "list_clients": r"(?i)^(?:list|show|get)\s+(?:all\s+)?clients$",
     "get_client": r"(?i)^(?:tell|show|get|give)\s+(?:me\s+)?(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on)?\s+client\s+(?:with\s+id\s+)?(\d+)$",
+    "get_clients": r"(?i)^(?:tell|show|get|give)(?:\s+me)?(?:\s+(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on))?\s+clients?\s+(?:with\s+ids?\s+)?(\d+(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+|\s*-\s*|\s+(?:to|through)\s+)\d+)+)$",
+    "get_client_by_name": r"(?i)^(?:tell|show|get|give)(?:\s+me)?(?:\s+(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on))?\s+client\s+(?:named\s+|called\s+)?(?!(?:with\s+)?ids?\b)(?!\d+$)(.+?)$",
     "add_client": r"(?i)^(?:add|create)\s+(?:a\s+)?(?:new\s+)?client\s+(?:named|called|with\s+name\s+)?\s*([^,]+?)(?:\s+with\s+niche\s+([^,]+?))?(?:\s+with\s+(?:email|contact|contact\s+email)\s+([^,]+?))?$",
     "update_client": r"(?i)^(?:update|change|modify)\s+client\s+(?:with\s+id\s+)?(\d+)\s+(?:set|change)\s+(\w+)\s+(?:to|as)\s+(.+)$",
     "delete_client": r"(?i)^(?:delete|remove)\s+client\s+(?:with\s+id\s+)?(\d+)$",
@@ -19,440 +29,610 @@ REGEX_PATTERNS = {
     # Campaign patterns
     "list_campaigns": r"(?i)^(?:list|show|get)\s+(?:all\s+)?campaigns$",
     "get_campaign": r"(?i)^(?:tell|show|get|give)\s+(?:me\s+)?(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on)?\s+campaign\s+(?:with\s+id\s+)?(\d+)$",
+    "get_campaigns": r"(?i)^(?:tell|show|get|give)(?:\s+me)?(?:\s+(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on))?\s+campaigns?\s+(?:with\s+ids?\s+)?(\d+(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+|\s*-\s*|\s+(?:to|through)\s+)\d+)+)$",
+    "get_campaign_by_name": r"(?i)^(?:tell|show|get|give)(?:\s+me)?(?:\s+(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on))?\s+campaign\s+(?:named\s+|called\s+)?(?!(?:with\s+)?ids?\b)(?!\d+$)(.+?)$",
     "add_campaign": r"(?i)^(?:add|create)\s+(?:a\s+)?(?:new\s+)?campaign\s+(?:named|called|with\s+name\s+)?\s*([^,]+?)(?:\s+for\s+client\s+([^,]+?))?(?:\s+with\s+(?:status|budget|start|end)\s+([^,]+?))?$",
     
     # Content idea patterns
     "list_content_ideas": r"(?i)^(?:list|show|get)\s+(?:all\s+)?(?:content\s+)?ideas$",
     "get_content_idea": r"(?i)^(?:tell|show|get|give)\s+(?:me\s+)?(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on)?\s+(?:content\s+)?idea\s+(?:with\s+id\s+)?(\d+)$",
+    "get_content_ideas": r"(?i)^(?:tell|show|get|give)(?:\s+me)?(?:\s+(?:about|details\s+(?:for|about)|info(?:rmation)?\s+(?:for|about)|details\s+on))?\s+(?:content\s+)?ideas?\s+(?:with\s+ids?\s+)?(\d+(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+|\s*-\s*|\s+(?:to|through)\s+)\d+)+)$",
     "add_content_idea": r"(?i)^(?:add|create)\s+(?:a\s+)?(?:new\s+)?(?:content\s+)?idea\s+(?:titled|called|with\s+title\s+)?\s*([^,]+?)(?:\s+with\s+type\s+([^,]+?))?(?:\s+for\s+client\s+([^,]+?))?$",
     
+    # Follow-ups about the records of a client or campaign, e.g. "ideas for campaign 4" or "what campaigns does that client have?"
+    "linked_list": r"(?i)^(?:(?:list|show|get|give)\s+(?:me\s+)?(?:the\s+|all\s+)?|what\s+)?(?P<entity>campaigns|(?:content\s+)?ideas)\s+(?:are\s+)?(?:for|of|does|do)\s+(?:the\s+|that\s+|this\s+)?(?P<of>client|campaign)(?:\s+(?:with\s+id\s+)?(?P<id>\d+))?(?:\s+have)?\??$",
+    
+    # Paging through the last long list, e.g. "next page" or "show clients page 3"
+    "page_step": r"(?i)^(?:(?:show|go\s+to|get)\s+(?:me\s+)?(?:the\s+)?)?(next|previous|prev|first|last)\s+page(?:\s+of\s+(clients|campaigns|(?:content\s+)?ideas))?$",
+    "page_number": r"(?i)^(?:(?:show|list|get|go\s+to)\s+(?:me\s+)?)?(?:(?:all\s+)?(clients|campaigns|(?:content\s+)?ideas)\s+)?page\s+(\d+)(?:\s+of\s+(clients|campaigns|(?:content\s+)?ideas))?$",
+    
+    # Filtered list pattern, e.g. "list clients with niche fintech limit 10"
+    "list_query": r"(?i)^(?:list|show|get)\s+(?:all\s+)?(clients|campaigns|(?:content\s+)?ideas)\s+(.+)$",
+    
     # Marketing data pattern
     "get_marketing_data": r"(?i)^(?:get|show|display)\s+(?:marketing\s+)?(?:data|performance|stats|analytics|metrics)$",
     
+    # Marketing analytics, e.g. "top 5 clients by revenue" or "compare Q1 vs Q2"
+    "roi_by_client": r"(?i)^(?:(?:show|get|display)\s+(?:me\s+)?(?:the\s+)?|what(?:'s|\s+is)\s+(?:the\s+)?)?roi\s+(?:by|per|for\s+each)\s+clients?$",
+    "top_clients": r"(?i)^(?:(?:show|get|display|list)\s+(?:me\s+)?(?:the\s+)?)?top\s+(\d+)\s+clients?(?:\s+by\s+(revenue|spend|spending|roi))?$",
+    "marketing_trend": r"(?i)^(?:(?:show|get|display)\s+(?:me\s+)?(?:the\s+)?)?(revenue|spend|spending|roi)\s+trends?(?:\s+(?:(?:for|over|in)\s+)?(?:the\s+)?(?:last|past)\s+(\d+)\s+months?)?$",
+    "marketing_slice": r"(?i)^(?:(?:show|get|display)\s+(?:me\s+)?(?:the\s+)?)?(revenue|spend|spending|roi|(?:marketing\s+)?data|performance)\s+((?:for|of|from|between|in|during)\s+.+)$",
+    "compare_quarters": r"(?i)^compare\s+q([1-4])(?:\s+(\d{4}))?\s+(?:vs\.?|versus|and|to|with|against)\s+q([1-4])(?:\s+(\d{4}))?$",
+    
     # Help pattern
     "help": r"(?i)^(?:help|commands|what can you do|how to use)$"
 }
 
-def process_prompt(prompt: str, session_id: str, conversation_history: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+# User-facing field names accepted in list filters and field selections
+LIST_FIELD_ALIASES = {
+    "contact person": "contact_person",
+    "contact email": "contact_email",
+    "target audience": "targetAudience",
+    "start date": "startDate",
+    "end date": "endDate",
+    "created": "created_at",
+    "updated": "updated_at",
+    "email": "contact_email",
+    "contact": "contact_person",
+    "audience": "targetAudience",
+    "start": "startDate",
+    "end": "endDate",
+}
+
+LIST_ENTITY_TOOLS = {
+    "clients": "list_clients",
+    "campaigns": "list_campaigns",
+    "ideas": "list_content_ideas",
+}
+
+# Field each list tool renders as the row title; always selected
+LIST_TITLE_FIELDS = {
+    "list_clients": "name",
+    "list_campaigns": "name",
+    "list_content_ideas": "title",
+}
+
+_LIST_FIELD_NAME = "|".join(
+    [alias.replace(" ", r"\s+") for alias in sorted(LIST_FIELD_ALIASES, key=len, reverse=True)] + [r"\w+"]
+)
+_LIST_CLAUSE_END = r"(?=\s+(?:with|where|and|for\s+client|limit|offset|fields|showing|only)\s|\s*$)"
+
+# One clause of a filtered list command
+LIST_CLAUSE_PATTERN = re.compile(
+    r"\s*(?:"
+    r"(?:fields|showing|only)\s+(?P<fields>[\w ]+?(?:\s*(?:,|\band\b)\s*[\w ]+?)*)"
+    r"|(?:with|where|and)\s+(?P<field>" + _LIST_FIELD_NAME + r")\s+(?:(?:=|is|of)\s+)?(?P<value>[^,]+?)"
+    r"|for\s+client\s+(?P<client>[^,]+?)"
+    r"|limit\s+(?P<limit>\d+)"
+    r"|offset\s+(?P<offset>\d+)"
+    r")" + _LIST_CLAUSE_END,
+    re.IGNORECASE,
+)
+
+# Separators and ranges inside an ID list such as "3, 7 and 12" or "4-9"
+ID_SEPARATOR_PATTERN = re.compile(r"\s*,\s*(?:and\s+)?|\s+and\s+")
+ID_RANGE_PATTERN = re.compile(r"(\d+)\s*(?:-|\s(?:to|through)\s)\s*(\d+)")
+
+def parse_id_list(text: str, limit: int) -> List[str]:
     """
-    Process the user prompt to determine which tool to use and extract parameters.
-    Returns a tuple of (tool_name, parameters).
+    Parse an ID list such as "3, 7 and 12" or "4-9" into unique IDs, in order.
+    At most `limit + 1` IDs are returned so callers can detect oversized requests.
     """
-    logger.info(f"Processing prompt: {prompt}")
-    
-    # Use conversation history to enhance context understanding
-    context = extract_context_from_history(conversation_history)
-    
-    # Try to match specific patterns for different tools
-    if re.search(r'list\s+clients?', prompt, re.IGNORECASE):
-        return "list_clients", {}
-    
-    # Add client pattern - fixed the regex pattern to use 'name' instead of 'n'
-    add_client_match = re.search(r'add\s+(a\s+)?(new\s+)?client\s+(named|called)?\s+(?P<name>[^,\.]+)(\s+with\s+niche\s+(?P<niche>[^,\.]+))?(\s+(with\s+)?(contact|email)\s+(?P<email>[^,\.]+))?', prompt, re.IGNORECASE)
-    if add_client_match:
-        params = {
-            "name": add_client_match.group('name').strip() if add_client_match.group('name') else None,
-            "niche": add_client_match.group('niche').strip() if add_client_match.group('niche') else None,
-            "contact_email": add_client_match.group('email').strip() if add_client_match.group('email') else None
-        }
-        return "add_client", {k: v for k, v in params.items() if v is not None}
-    
-    # Update client pattern
-    update_client_match = re.search(r'update\s+client\s+(with\s+)?id\s+(?P<id>\d+)\s+set\s+(?P<field>\w+)\s+to\s+(?P<value>[^,\.]+)', prompt, re.IGNORECASE)
-    if update_client_match:
-        client_id = update_client_match.group('id').strip()
-        field = update_client_match.group('field').strip()
-        value = update_client_match.group('value').strip()
-        
-        params = {"id": client_id}
-        params[field] = value
-        return "update_client", params
-    
-    # Delete client pattern
-    delete_client_match = re.search(r'delete\s+client\s+(with\s+)?id\s+(?P<id>\d+)', prompt, re.IGNORECASE)
-    if delete_client_match:
-        client_id = delete_client_match.group('id').strip()
-        return "delete_client", {"id": client_id}
-    
-    # Get client details pattern - new functionality
-    get_client_match = re.search(r'(tell\s+me\s+about|get|show|display)\s+client\s+(with\s+)?id\s+(?P<id>\d+)', prompt, re.IGNORECASE)
-    if get_client_match:
-        client_id = get_client_match.group('id').strip()
-        return "get_client_details", {"id": client_id}
-    
-    # Handle references to entities from previous conversation
-    if context and "clients" in context:
-        # Check for references to clients by name
-        for client in context["clients"]:
-            if client["name"].lower() in prompt.lower():
-                if "niche" in prompt.lower() or "industry" in prompt.lower():
-                    return "respond", {"message": f"The niche for {client['name']} is: {client['niche']}"}
-                if "email" in prompt.lower() or "contact" in prompt.lower():
-                    return "respond", {"message": f"The contact email for {client['name']} is: {client['contact_email']}"}
-                return "get_client_details", {"id": str(client["id"])}
+    ids = []
+    seen = set()
+    for part in ID_SEPARATOR_PATTERN.split(text.strip()):
+        range_match = ID_RANGE_PATTERN.fullmatch(part)
+        if range_match:
+            start, end = sorted((int(range_match.group(1)), int(range_match.group(2))))
+            candidates = range(start, min(end, start + limit) + 1)
+        elif part.isdigit():
+            candidates = [int(part)]
+        else:
+            continue
         
-        # Check for references to clients by ID
-        id_match = re.search(r'(client|id)\s+(\#|number\s+)?(\d+)', prompt, re.IGNORECASE)
-        if id_match:
-            client_id = id_match.group(3)
-            for client in context["clients"]:
-                if str(client["id"]) == client_id:
-                    if "niche" in prompt.lower() or "industry" in prompt.lower():
-                        return "respond", {"message": f"The niche for client #{client_id} ({client['name']}) is: {client['niche']}"}
-                    if "email" in prompt.lower() or "contact" in prompt.lower():
-                        return "respond", {"message": f"The contact email for client #{client_id} ({client['name']}) is: {client['contact_email']}"}
-                    return "get_client_details", {"id": client_id}
-    
-    # Help command
-    if re.search(r'^help$', prompt, re.IGNORECASE):
-        help_message = """
-### Available Commands
+        for record_id in candidates:
+            if record_id not in seen:
+                seen.add(record_id)
+                ids.append(str(record_id))
+            if len(ids) > limit:
+                return ids
+    
+    return ids
 
-**Client Management:**
-- `list clients` - Show all clients
-- `add client named [name] with niche [industry] with email [email]` - Add a new client
-- `update client with id [ID] set [field] to [value]` - Update client information
-- `delete client with id [ID]` - Remove a client
-- `tell me about client with id [ID]` - Get detailed client information
+NO_CURSOR_MESSAGE = "There's no list to page through yet. Try 'list clients' first."
 
-You can also refer to clients by their ID or name in follow-up questions, such as:
-- "What is the niche of client 5?"
-- "Tell me the email for Acme Inc"
-"""
-        return "respond", {"message": help_message}
-    
-    # If no specific intent is detected, provide a helpful response
-    logger.warning(f"No matching tool found for prompt: {prompt}")
-    return "respond", {"message": "I'm sorry, I don't understand that request. You can try:\n- 'List clients'\n- 'Add a new client named Acme Inc with niche technology'\n- 'Update client with id 123 set name to Acme Technologies'\n- 'Delete client with id 123'\n- 'Tell me about client with id 123'\n- Type 'help' to see all available commands"}
-
-def extract_context_from_history(conversation_history: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """
-    Extract relevant context from conversation history.
-    """
-    context = {}
-    
-    # Look for client list responses in the conversation history
-    for message in reversed(conversation_history):
-        if message["role"] == "assistant" and "### Client List" in message["content"]:
-            # Try to parse client information from the formatted response
-            clients = []
-            client_blocks = re.findall(r'\d+\.\s+\*\*([^*]+)\*\*\s+- ID:\s+(\d+).*?(?=\d+\.\s+\*\*|$)', message["content"], re.DOTALL)
-            
-            for client_block in client_blocks:
-                client_name = client_block[0].strip()
-                client_id = client_block[1].strip()
-                
-                # Extract other details
-                niche_match = re.search(r'Niche:\s+([^\n]+)', client_block[0], re.DOTALL)
-                email_match = re.search(r'Email:\s+([^\n]+)', client_block[0], re.DOTALL)
-                
-                client = {
-                    "id": int(client_id),
-                    "name": client_name,
-                    "niche": niche_match.group(1).strip() if niche_match else "",
-                    "contact_email": email_match.group(1).strip() if email_match else ""
-                }
-                clients.append(client)
-            
-            if clients:
-                context["clients"] = clients
-                break
-        
-        # Also look for individual client additions
-        elif message["role"] == "assistant" and "Successfully added client:" in message["content"]:
-            client_match = re.search(r'Successfully added client:\s+\*\*([^*]+)\*\*\s+with ID:\s+\*\*(\d+)\*\*', message["content"])
-            if client_match:
-                client_name = client_match.group(1).strip()
-                client_id = client_match.group(2).strip()
-                
-                if "clients" not in context:
-                    context["clients"] = []
-                
-                context["clients"].append({
-                    "id": int(client_id),
-                    "name": client_name,
-                    "niche": "",  # We don't have this info from the success message
-                    "contact_email": ""
-                })
-    
-    return context
-
-async def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, conversation_history: List[Dict[str, Any]]) -> Any:
+UNKNOWN_REQUEST_MESSAGE = "I'm sorry, I don't understand that request. You can try:\n- 'List clients'\n- 'Add a new client named Acme Inc with niche technology'\n- 'Update client with id 123 set name to Acme Technologies'\n- 'Delete client with id 123'\n- 'Tell me about client with id 123'\n- Type 'help' to see all available commands"
+
+# Detail tools that accept a name instead of an ID: tool -> (entity type, label)
+NAME_LOOKUPS = {
+    "get_client_details": ("clients", "client"),
+    "get_campaign": ("campaigns", "campaign"),
+}
+
+# Write tools whose "client" parameter is a client name
+CLIENT_NAME_PARAMETERS = {"add_campaign", "add_content_idea"}
+
+# List filters that hold a name, and the entity type it names (None: the listed type)
+NAME_FILTERS = {"client": "clients", "name": None}
+
+# List tools whose records are linked to a client, answered from the session's entity graph when fresh
+CLIENT_LINKED_LISTS = {"list_campaigns", "list_content_ideas"}
+
+async def find_names(entity_type: str, name: str) -> List[name_index.NameMatch]:
     """
-    Execute the selected tool with the given parameters.
+    Candidate entities for a name. Served from the name index; names it
+    doesn't know are looked up with a filtered backend query and, if that
+    finds nothing (a prefix or a misspelling), with a listing of just the
+    names, which the tool cache shares between lookups. Both are indexed
+    for next time.
+    """
+    index = name_index.NAME_INDEXES[entity_type]
+    candidates = index.matches(name)
+    if candidates:
+        return candidates
+    
+    list_tool = tools.get_tool(f"list_{entity_type}")["execute"]
+    records = await list_tool({"filters": {"name": name}, "fields": ["name"], "limit": 5})
+    if records:
+        index.update(records)
+    else:
+        index.replace(await list_tool({"fields": ["name"]}))
+    return index.matches(name)
+
+def unresolved_name_message(label: str, name: str, candidates: List[name_index.NameMatch]) -> str:
+    if not candidates:
+        return f"I couldn't find a {label} named '{name}'. Please check the name or use its ID."
+    options = "\n".join(f"- **{candidate.name}** (ID: {candidate.id})" for candidate in candidates)
+    return f"More than one {label} matches '{name}'. Which one did you mean?\n{options}"
+
+async def linked_client(parameters: Dict[str, Any], session: SessionContext) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The name of the client a follow-up asks about (parameters "of" and
+    "id"), or None and a reply saying why there isn't one. Without an ID it
+    is the client or campaign the session last looked at; a record the
+    session hasn't seen is fetched.
+    """
+    of = parameters["of"]
+    entity_type = f"{of}s"
+    if parameters.get("id") is None:
+        record = session.graph.focus.get(entity_type)
+        if record is None:
+            return None, f"Which {of} do you mean? Ask about one first, e.g. 'tell me about {of} 3', or give its ID."
+    else:
+        record = session.graph.get(entity_type, parameters["id"])
+        if record is None:
+            record = await tools.get_tool(f"get_{of}")["execute"]({"id": parameters["id"]})
+    
+    name = record.get("name") if of == "client" else record.get("client")
+    if not name:
+        return None, f"Campaign {record.get('id', parameters.get('id'))} isn't linked to a client."
+    return name, None
+
+async def run_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, session: SessionContext) -> ToolResult:
+    """
+    Execute the selected tool and return its structured result.
+    Errors from the tool are raised; see tool_error_message.
     """
     logger.info(f"Executing tool: {tool_name} with parameters: {parameters}")
     
     # Special case for the "respond" tool which just returns a message
     if tool_name == "respond":
-        return parameters.get("message", "I don't understand that request.")
+        return ToolResult(tool_name, parameters, parameters.get("message", "I don't understand that request."))
+    
+    # Names become ID lookups
+    if tool_name in NAME_LOOKUPS and "id" not in parameters and parameters.get("name"):
+        entity_type, label = NAME_LOOKUPS[tool_name]
+        candidates = await find_names(entity_type, parameters["name"])
+        match = name_index.best_match(candidates)
+        if match is None:
+            return ToolResult("respond", parameters, unresolved_name_message(label, parameters["name"], candidates))
+        logger.info(f"Resolved {label} name '{parameters['name']}' to ID {match.id}")
+        parameters = {"id": match.id}
+    
+    # The backend matches name filters exactly, so filter on the canonical name
+    if tool_name in PAGED_TOOLS and parameters.get("filters"):
+        filters = dict(parameters["filters"])
+        for field, entity_type in NAME_FILTERS.items():
+            entity_type = entity_type or ENTITY_TYPES[tool_name]
+            if not filters.get(field) or entity_type not in name_index.NAME_INDEXES:
+                continue
+            candidates = await find_names(entity_type, str(filters[field]))
+            match = name_index.best_match(candidates)
+            if match is None and candidates:
+                return ToolResult("respond", parameters, unresolved_name_message(entity_type[:-1], filters[field], candidates))
+            if match is not None:
+                filters[field] = match.name
+        parameters = {**parameters, "filters": filters}
+    
+    # Store the canonical client name rather than the user's spelling of it
+    if tool_name in CLIENT_NAME_PARAMETERS and parameters.get("client"):
+        match = name_index.best_match(await find_names("clients", parameters["client"]))
+        if match is not None:
+            parameters = {**parameters, "client": match.name}
+    
+    # Follow-ups about the records of a client or campaign list the client's
+    if tool_name in CLIENT_LINKED_LISTS and parameters.get("of"):
+        client, reply = await linked_client(parameters, session)
+        if client is None:
+            return ToolResult("respond", parameters, reply)
+        parameters = {"filters": {"client": client}}
+    
+    # A client's campaigns or content ideas fetched recently are served from the session
+    if tool_name in CLIENT_LINKED_LISTS and list(parameters) == ["filters"] and list(parameters["filters"]) == ["client"]:
+        rows = session.graph.lookup(ENTITY_TYPES[tool_name], parameters["filters"]["client"], time.time())
+        if rows is not None:
+            logger.info(f"Answered {tool_name} for client '{parameters['filters']['client']}' from session memory: {len(rows)} records")
+            return ToolResult(tool_name, parameters, rows)
     
     # Special case for the new get_client_details tool
     if tool_name == "get_client_details":
-        client_id = parameters.get("id")
-        try:
-            # Use the current event loop and await the coroutine directly
-            client_result = await tools.get_client({"id": client_id})
-            
-            if client_result:
-                # Format a nice response
-                response = f"### Client Details\n\n"
-                response += f"**{client_result['name']}** (ID: {client_result['id']})\n\n"
-                response += f"- **Niche:** {client_result['niche'] or 'Not specified'}\n"
-                response += f"- **Contact Person:** {client_result['contact_person'] or 'Not specified'}\n"
-                response += f"- **Contact Email:** {client_result['contact_email'] or 'Not specified'}\n"
-                response += f"- **Notes:** {client_result['notes'] or 'None'}\n"
-                
-                if client_result.get('industry'):
-                    response += f"- **Industry:** {client_result['industry']}\n"
-                if client_result.get('satisfaction') is not None:
-                    response += f"- **Satisfaction:** {client_result['satisfaction']}\n"
-                if client_result.get('tier'):
-                    response += f"- **Tier:** {client_result['tier']}\n"
-                
-                response += f"\n*Created: {client_result['created_at']}*\n"
-                response += f"*Last Updated: {client_result['updated_at']}*"
-                
-                # Add proactive suggestions
-                response += "\n\n---\n\n**What would you like to do next?**\n"
-                response += f"- Update this client's information\n"
-                response += f"- Delete this client\n"
-                response += f"- List all clients\n"
-                response += f"- Add a campaign for this client\n"
-                
-                return response
-            else:
-                return f"I couldn't find a client with ID {client_id}. Please check the ID and try again."
-        except Exception as e:
-            logger.error(f"Error executing get_client_details: {e}")
-            return f"Sorry, I encountered an error while trying to get client details: {str(e)}"
+        client_result = await tools.get_tool("get_client")["execute"]({"id": parameters.get("id")})
+        tool_result = ToolResult(tool_name, parameters, client_result)
+        name_index.index_result(tool_result)
+        return tool_result
     
     # For other tools, find the tool in the registry and execute it
-    available_tools = tools.get_tools()
-    tool = next((t for t in available_tools if t["name"] == tool_name), None)
+    tool = tools.get_tool(tool_name)
     
     if not tool:
         logger.error(f"Tool not found: {tool_name}")
-        return f"Error: Tool '{tool_name}' not found."
+        return ToolResult("respond", {}, f"Error: Tool '{tool_name}' not found.")
     
-    try:
-        # Await the coroutine directly
-        result = await tool["execute"](parameters)
+    result = await tool["execute"](parameters)
+    if isinstance(result, list):
+        logger.info(f"Tool execution result: {len(result)} records")
+    else:
         logger.info(f"Tool execution result: {result}")
-        
-        # Format the response based on the tool and result
-        if tool_name == "list_clients":
-            if not result:
-                response = "No clients found."
-            else:
-                response = "### Client List\n"
-                for i, client in enumerate(result, 1):
-                    response += f"{i}. **{client['name']}**\n"
-                    response += f"   - ID: {client['id']}\n"
-                    response += f"   - Niche: {client['niche'] or 'Not specified'}\n"
-                    if client.get('contact_person'):
-                        response += f"   - Contact: {client['contact_person']}\n"
-                    if client.get('contact_email'):
-                        response += f"   - Email: {client['contact_email']}\n"
-                
-                # Add proactive suggestions
-                response += "\n---\n\n**What would you like to do next?**\n"
-                response += "- Add a new client\n"
-                response += "- Get details about a specific client\n"
-                response += "- Update a client's information\n"
-                response += "- List campaigns\n"
-            
-            return response
-        
-        elif tool_name == "add_client":
-            response = f"### Client Added\nSuccessfully added client: **{result['name']}** with ID: **{result['id']}**"
-            
-            # Add proactive suggestions
-            response += "\n\n---\n\n**What would you like to do next?**\n"
-            response += "- Add another client\n"
-            response += f"- Update this client's information\n"
-            response += "- List all clients\n"
-            response += f"- Add a campaign for this client\n"
-            
-            return response
-        
-        elif tool_name == "update_client":
-            return f"Client updated successfully! The changes have been applied to the client record."
-        
-        elif tool_name == "delete_client":
-            return f"Client deleted successfully. The client has been removed from the database."
-        
-        # Campaign tools
-        elif tool_name == "list_campaigns":
-            if not result:
-                response = "No campaigns found."
-            else:
-                response = "### Campaign List\n"
-                for i, campaign in enumerate(result, 1):
-                    response += f"{i}. **{campaign['name']}**\n"
-                    response += f"   - ID: {campaign['id']}\n"
-                    response += f"   - Status: {campaign['status'] or 'Not specified'}\n"
-                    response += f"   - Client: {campaign['client'] or 'Not specified'}\n"
-                    if campaign.get('budget'):
-                        response += f"   - Budget: {campaign['budget']}\n"
-                    if campaign.get('startDate'):
-                        response += f"   - Start Date: {campaign['startDate']}\n"
-                    if campaign.get('endDate'):
-                        response += f"   - End Date: {campaign['endDate']}\n"
-                
-                # Add proactive suggestions
-                response += "\n---\n\n**What would you like to do next?**\n"
-                response += "- Add a new campaign\n"
-                response += "- Get details about a specific campaign\n"
-                response += "- List content ideas\n"
-            
-            return response
-        
-        elif tool_name == "get_campaign":
-            if not result:
-                return f"I couldn't find a campaign with ID {parameters.get('id')}. Please check the ID and try again."
-            
-            campaign = result
-            response = f"### Campaign Details\n\n"
-            response += f"**{campaign['name']}** (ID: {campaign['id']})\n\n"
-            response += f"- **Status:** {campaign['status'] or 'Not specified'}\n"
-            response += f"- **Client:** {campaign['client'] or 'Not specified'}\n"
-            response += f"- **Budget:** {campaign['budget'] or 'Not specified'}\n"
-            response += f"- **Start Date:** {campaign['startDate'] or 'Not specified'}\n"
-            response += f"- **End Date:** {campaign['endDate'] or 'Not specified'}\n"
-            response += f"- **Target Audience:** {campaign['targetAudience'] or 'Not specified'}\n"
-            
-            if campaign.get('channels'):
-                channels = campaign['channels']
-                if isinstance(channels, list):
-                    response += f"- **Channels:** {', '.join(channels)}\n"
-                else:
-                    response += f"- **Channels:** {channels}\n"
-            
-            # Add proactive suggestions
-            response += "\n\n---\n\n**What would you like to do next?**\n"
-            response += f"- List all campaigns\n"
-            response += f"- Add content ideas for this campaign\n"
-            response += f"- View marketing data\n"
-            
-            return response
-        
-        elif tool_name == "add_campaign":
-            response = f"### Campaign Added\nSuccessfully added campaign: **{result['name']}** with ID: **{result['id']}**"
-            
-            # Add proactive suggestions
-            response += "\n\n---\n\n**What would you like to do next?**\n"
-            response += "- Add another campaign\n"
-            response += f"- Add content ideas for this campaign\n"
-            response += "- List all campaigns\n"
-            
-            return response
-        
-        # Content Ideas tools
-        elif tool_name == "list_content_ideas":
-            if not result:
-                response = "No content ideas found."
-            else:
-                response = "### Content Ideas List\n"
-                for i, idea in enumerate(result, 1):
-                    response += f"{i}. **{idea['title']}**\n"
-                    response += f"   - ID: {idea['id']}\n"
-                    response += f"   - Type: {idea['type'] or 'Not specified'}\n"
-                    response += f"   - Status: {idea['status'] or 'New'}\n"
-                    response += f"   - Priority: {idea['priority'] or 'Medium'}\n"
-                    if idea.get('client'):
-                        response += f"   - Client: {idea['client']}\n"
-                
-                # Add proactive suggestions
-                response += "\n---\n\n**What would you like to do next?**\n"
-                response += "- Add a new content idea\n"
-                response += "- Get details about a specific idea\n"
-                response += "- List campaigns\n"
-            
-            return response
-        
-        elif tool_name == "get_content_idea":
-            if not result:
-                return f"I couldn't find a content idea with ID {parameters.get('id')}. Please check the ID and try again."
-            
-            idea = result
-            response = f"### Content Idea Details\n\n"
-            response += f"**{idea['title']}** (ID: {idea['id']})\n\n"
-            response += f"- **Type:** {idea['type'] or 'Not specified'}\n"
-            response += f"- **Status:** {idea['status'] or 'New'}\n"
-            response += f"- **Priority:** {idea['priority'] or 'Medium'}\n"
-            response += f"- **Client:** {idea['client'] or 'Not specified'}\n"
-            
-            # Add proactive suggestions
-            response += "\n\n---\n\n**What would you like to do next?**\n"
-            response += f"- List all content ideas\n"
-            response += f"- Add another content idea\n"
-            
-            return response
-        
-        elif tool_name == "add_content_idea":
-            response = f"### Content Idea Added\nSuccessfully added content idea: **{result['title']}** with ID: **{result['id']}**"
-            
-            # Add proactive suggestions
-            response += "\n\n---\n\n**What would you like to do next?**\n"
-            response += "- Add another content idea\n"
-            response += "- List all content ideas\n"
-            response += "- View marketing data\n"
-            
-            return response
-        
-        # Marketing Data tools
-        elif tool_name == "get_marketing_data":
-            if not result:
-                response = "No marketing data available."
-            else:
-                response = "### Marketing Performance Data\n\n"
-                response += "| Month | Revenue | Spend | ROI | Client |\n"
-                response += "|-------|---------|-------|-----|--------|\n"
-                
-                for data in result:
-                    response += f"| {data['month']} | ${data['revenue']} | ${data['spend']} | {data['roi']}x | {data['client']} |\n"
-                
-                # Add proactive suggestions
-                response += "\n---\n\n**What would you like to do next?**\n"
-                response += "- List campaigns\n"
-                response += "- List content ideas\n"
-                response += "- List clients\n"
-            
-            return response
-        
-        # Generic response for other tools
-        return f"Operation completed successfully. Result: {result}"
     
+    tool_result = ToolResult(tool_name, parameters, result)
+    name_index.index_result(tool_result)
+    return tool_result
+
+def iter_response(tool_result: ToolResult) -> Iterator[str]:
+    """
+    Yield the markdown response for a tool result in chunks.
+    """
+    if tool_result.tool_name in ("respond", "error"):
+        yield tool_result.result
+        return
+    yield from render.iter_render(tool_result.tool_name, tool_result.result, tool_result.parameters)
+
+def tool_error_message(tool_name: str, error: Exception) -> str:
+    """
+    Log a failed tool call and build the message shown to the user.
+    """
+    if tool_name == "get_client_details":
+        logger.error(f"Error executing get_client_details: {error}")
+        return f"Sorry, I encountered an error while trying to get client details: {str(error)}"
+    logger.error(f"Error executing tool {tool_name}: {error}")
+    return f"Sorry, I encountered an error: {str(error)}"
+
+# Paging of long lists across the turns of a session
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+PAGED_TOOLS = {"list_clients", "list_campaigns", "list_content_ideas"}
+
+def page_size_from_context(context: Optional[Dict[str, Any]]) -> Optional[int]:
+    """
+    The "page_size" option of a chat request, if it is a positive integer.
+    """
+    try:
+        page_size = int((context or {}).get("page_size"))
+    except (TypeError, ValueError):
+        return None
+    return page_size if page_size > 0 else None
+
+def paginate(tool_result: ToolResult, page_size: Optional[int] = None) -> ToolResult:
+    """
+    Cut a long list result down to its first page, with a cursor for the
+    rest. Lists the user already limited or offset are left alone.
+    """
+    page_size = page_size or LIST_PAGE_SIZE
+    rows = tool_result.result
+    if (
+        tool_result.tool_name not in PAGED_TOOLS
+        or not isinstance(rows, list)
+        or len(rows) <= page_size
+        or tool_result.parameters.get("limit")
+        or tool_result.parameters.get("offset")
+    ):
+        return tool_result
+    return ListCursor(tool_result.tool_name, tool_result.parameters, rows, page_size).page_result(1)
+
+async def turn_page(parameters: Dict[str, Any], session_id: str, session: SessionContext, page_size: Optional[int] = None) -> ToolResult:
+    """
+    Show another page of a list from the session's cursor. The rows are the
+    ones fetched for the first page, so paging never goes back to the backend.
+    """
+    tool_name = parameters.get("tool_name")
+    cursor = session.find_cursor(tool_name)
+    if cursor is None:
+        if tool_name is None:
+            return ToolResult("respond", parameters, NO_CURSOR_MESSAGE)
+        # "show clients page 3" without an earlier listing
+        listing = await run_tool(tool_name, {}, session_id, session)
+        cursor = ListCursor(tool_name, listing.parameters, listing.result, page_size or LIST_PAGE_SIZE, page=0)
+    
+    page_size = page_size or cursor.page_size
+    pages = max(1, -(-len(cursor.rows) // page_size))
+    # Rows before and up to the current page; "next" and "previous" continue
+    # from them even when the page size changes
+    before = max(0, (cursor.page - 1) * cursor.page_size)
+    through = cursor.page * cursor.page_size
+    
+    page = parameters["page"]
+    if page == "next":
+        page = through // page_size + 1
+        if page > pages:
+            return ToolResult("respond", parameters, "That was the last page of the list.")
+    elif page == "previous":
+        page = (before - 1) // page_size + 1 if before else 0
+        if page < 1:
+            return ToolResult("respond", parameters, "You're already on the first page of the list.")
+    elif page == "first":
+        page = 1
+    elif page == "last":
+        page = pages
+    
+    if not 1 <= page <= pages:
+        return ToolResult("respond", parameters, f"That list only has {pages} page{'s' if pages != 1 else ''}.")
+    return cursor.page_result(page, page_size)
+
+async def run_paged(tool_name: str, parameters: Dict[str, Any], session_id: str, session: SessionContext, page_size: Optional[int] = None) -> ToolResult:
+    """
+    run_tool, with long lists cut into pages and page commands served from
+    the session's cursor.
+    """
+    if tool_name == "page_list":
+        return await turn_page(parameters, session_id, session, page_size)
+    return paginate(await run_tool(tool_name, parameters, session_id, session), page_size)
+
+async def execute_tool(tool_name: str, parameters: Dict[str, Any], session_id: str, session: SessionContext, page_size: Optional[int] = None) -> Tuple[str, Optional[ToolResult]]:
+    """
+    Execute the selected tool with the given parameters.
+    Returns the markdown response and the structured result (None if the tool failed).
+    """
+    try:
+        tool_result = await run_paged(tool_name, parameters, session_id, session, page_size)
+    except Exception as e:
+        return tool_error_message(tool_name, e), None
+    
+    try:
+        return "".join(iter_response(tool_result)), tool_result
     except Exception as e:
-        logger.error(f"Error executing tool {tool_name}: {e}")
-        return f"Sorry, I encountered an error: {str(e)}"
+        return tool_error_message(tool_name, e), tool_result
 
-async def process_prompt(prompt: str, session_id: str, conversation_history: List[Dict[str, Any]]) -> str:
+async def run_step(tool_name: str, parameters: Dict[str, Any], session_id: str, session: SessionContext, page_size: Optional[int] = None) -> ToolResult:
+    """
+    Run one step of a plan. A failing step is reported in its own section
+    instead of failing the whole plan.
+    """
+    try:
+        return await run_paged(tool_name, parameters, session_id, session, page_size)
+    except Exception as e:
+        return ToolResult("error", {"tool_name": tool_name}, tool_error_message(tool_name, e))
+
+async def run_plan(steps: List[Tuple[str, Dict[str, Any]]], session_id: str, session: SessionContext, page_size: Optional[int] = None) -> ToolResult:
+    """
+    Execute the steps of a compound prompt. Consecutive reads run
+    concurrently; each write runs on its own, in order, so reads after it
+    see its effect.
+    """
+    results: List[Optional[ToolResult]] = [None] * len(steps)
+    reads: List[int] = []
+    
+    async def run_reads():
+        parts = await asyncio.gather(*[run_step(*steps[index], session_id, session, page_size) for index in reads])
+        for index, part in zip(reads, parts):
+            results[index] = part
+        reads.clear()
+    
+    for index, (tool_name, parameters) in enumerate(steps):
+        if tool_name in tools.WRITE_TOOLS:
+            await run_reads()
+            results[index] = await run_step(tool_name, parameters, session_id, session, page_size)
+        else:
+            reads.append(index)
+    await run_reads()
+    
+    plan = [{"tool_name": tool_name, "parameters": parameters} for tool_name, parameters in steps]
+    return ToolResult("plan", {"steps": plan}, results)
+
+def iter_plan_response(plan_result: ToolResult) -> Iterator[str]:
+    """
+    Yield the response of a compound prompt, one section per step.
+    """
+    for position, part in enumerate(plan_result.parts):
+        if position:
+            yield PLAN_SECTION_SEPARATOR
+        yield from _guard_chunks(part.tool_name, iter_response(part))
+
+async def process_prompt(prompt: str, session_id: str, session: SessionContext, context: Optional[Dict[str, Any]] = None) -> Tuple[str, Optional[ToolResult]]:
     """
     Process a user prompt and determine which tool to use.
+    `context` carries per-request options such as "page_size".
+    Returns the markdown response and the structured tool result, if any.
     """
     logger.info(f"Processing prompt: {prompt}")
+    page_size = page_size_from_context(context)
     
-    tool_name, parameters = select_tool(prompt, conversation_history)
+    steps = select_plan(prompt, session)
+    if steps:
+        logger.info(f"Selected plan: {steps}")
+        plan_result = await run_plan(steps, session_id, session, page_size)
+        return "".join(iter_plan_response(plan_result)), plan_result
+    
+    tool_name, parameters = select_tool_or_classify(prompt, session)
     
     if tool_name:
         logger.info(f"Selected tool: {tool_name}, parameters: {parameters}")
-        result = await execute_tool(tool_name, parameters, session_id, conversation_history)
-        return result
+        return await execute_tool(tool_name, parameters, session_id, session, page_size)
     else:
         logger.warning(f"No matching tool found for prompt: {prompt}")
-        return "I'm sorry, I don't understand that request. You can try:\n- 'List clients'\n- 'Add a new client named Acme Inc with niche technology'\n- 'Update client with id 123 set name to Acme Technologies'\n- 'Delete client with id 123'\n- 'Tell me about client with id 123'\n- Type 'help' to see all available commands"
+        return UNKNOWN_REQUEST_MESSAGE, None
 
-def select_tool(prompt: str, conversation_history: List[Dict[str, Any]]) -> Tuple[Optional[str], Dict[str, Any]]:
+def summarize_result(tool_result: ToolResult) -> str:
     """
-    Select the appropriate tool based on the user prompt.
-    Returns a tuple of (tool_name, parameters).
+    One-line text for a result returned without markdown, recorded as the
+    assistant's turn in the conversation.
+    """
+    if tool_result.tool_name in ("respond", "error"):
+        return tool_result.result
+    if tool_result.tool_name == "plan":
+        return "; ".join(summarize_result(part) for part in tool_result.parts)
+    
+    result = tool_result.result
+    summary = f"{tool_result.tool_name}: "
+    if isinstance(result, dict) and result.get("message"):
+        summary += str(result["message"])
+    elif isinstance(result, dict) and isinstance(result.get("rows"), list):
+        # Aggregates, e.g. from analyze_marketing_data
+        summary += f"{len(result['rows'])} row" + ("" if len(result["rows"]) == 1 else "s")
+    elif isinstance(result, list) or tool_result.records:
+        count = len(result) if isinstance(result, list) else len(tool_result.records)
+        summary += f"{count} record" + ("" if count == 1 else "s")
+    else:
+        summary += "done"
+    if tool_result.cursor is not None:
+        summary += f" (page {tool_result.cursor.page} of {tool_result.cursor.pages})"
+    return summary
+
+async def process_prompt_result(prompt: str, session_id: str, session: SessionContext, context: Optional[Dict[str, Any]] = None) -> ToolResult:
+    """
+    Like process_prompt, but return only the structured tool result; no
+    markdown is rendered. Used by the JSON response mode.
+    """
+    logger.info(f"Processing prompt for a JSON response: {prompt}")
+    page_size = page_size_from_context(context)
+    
+    steps = select_plan(prompt, session)
+    if steps:
+        logger.info(f"Selected plan: {steps}")
+        return await run_plan(steps, session_id, session, page_size)
+    
+    tool_name, parameters = select_tool_or_classify(prompt, session)
+    
+    if not tool_name:
+        logger.warning(f"No matching tool found for prompt: {prompt}")
+        return ToolResult("respond", {}, UNKNOWN_REQUEST_MESSAGE)
+    
+    logger.info(f"Selected tool: {tool_name}, parameters: {parameters}")
+    return await run_step(tool_name, parameters, session_id, session, page_size)
+
+async def stream_prompt(prompt: str, session_id: str, session: SessionContext, context: Optional[Dict[str, Any]] = None) -> Tuple[Optional[ToolResult], Iterator[str]]:
+    """
+    Like process_prompt, but return the response as an iterator of chunks
+    (header, runs of rows, footer) that renders lazily once the tool result
+    is available.
     """
-    # Check for help command
-    if re.match(REGEX_PATTERNS["help"], prompt):
-        return "respond", {
-            "message": """
+    logger.info(f"Streaming prompt: {prompt}")
+    page_size = page_size_from_context(context)
+    
+    steps = select_plan(prompt, session)
+    if steps:
+        logger.info(f"Selected plan: {steps}")
+        plan_result = await run_plan(steps, session_id, session, page_size)
+        return plan_result, iter_plan_response(plan_result)
+    
+    tool_name, parameters = select_tool_or_classify(prompt, session)
+    
+    if not tool_name:
+        logger.warning(f"No matching tool found for prompt: {prompt}")
+        return None, iter([UNKNOWN_REQUEST_MESSAGE])
+    
+    logger.info(f"Selected tool: {tool_name}, parameters: {parameters}")
+    try:
+        tool_result = await run_paged(tool_name, parameters, session_id, session, page_size)
+    except Exception as e:
+        return None, iter([tool_error_message(tool_name, e)])
+    
+    return tool_result, _guard_chunks(tool_name, iter_response(tool_result))
+
+def _guard_chunks(tool_name: str, chunks: Iterator[str]) -> Iterator[str]:
+    started = False
+    try:
+        for chunk in chunks:
+            started = True
+            yield chunk
+    except Exception as e:
+        # Part of the response may already be on the wire, so append the error
+        message = tool_error_message(tool_name, e)
+        yield f"\n\n{message}" if started else message
+
+def resolve_list_field(tool_name: str, name: str) -> Optional[str]:
+    """
+    Map a user-facing field name to the backend field of a list tool.
+    """
+    name = re.sub(r"\s+", " ", name.strip().lower())
+    field = LIST_FIELD_ALIASES.get(name, name)
+    for allowed in tools.LIST_FIELDS[tool_name]:
+        if allowed.lower() == field.lower():
+            return allowed
+    return None
+
+def select_list_query(entity: str, clause: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Parse the clauses of a filtered list command into list tool parameters:
+    filters, limit/offset and selected fields.
+    Returns None if the text isn't a list query.
+    """
+    tool_name = LIST_ENTITY_TOOLS[entity.split()[-1].lower()]
+    filters = {}
+    parameters = {}
+    
+    position = 0
+    clause = clause.strip()
+    while position < len(clause):
+        match = LIST_CLAUSE_PATTERN.match(clause, position)
+        if not match:
+            return None
+        position = match.end()
+        
+        if match.group("fields"):
+            fields = []
+            for name in re.split(r"\s*,\s*(?:and\s+)?|\s+and\s+", match.group("fields")):
+                field = resolve_list_field(tool_name, name)
+                if not field:
+                    return "respond", {"message": unknown_list_field_message(tool_name, name)}
+                fields.append(field)
+            title_field = LIST_TITLE_FIELDS[tool_name]
+            if title_field not in fields:
+                fields.insert(0, title_field)
+            parameters["fields"] = fields
+        elif match.group("field"):
+            field = resolve_list_field(tool_name, match.group("field"))
+            if not field:
+                return "respond", {"message": unknown_list_field_message(tool_name, match.group("field"))}
+            filters[field] = match.group("value").strip().strip("'\"")
+        elif match.group("client"):
+            filters["client"] = match.group("client").strip().strip("'\"")
+        elif match.group("limit"):
+            parameters["limit"] = int(match.group("limit"))
+        elif match.group("offset"):
+            parameters["offset"] = int(match.group("offset"))
+    
+    if filters:
+        parameters["filters"] = filters
+    return tool_name, parameters
+
+UNKNOWN_LIST_FIELD_PREFIX = "I can't filter or select by "
+
+def unknown_list_field_message(tool_name: str, name: str) -> str:
+    """
+    Explain which fields a list command accepts.
+    """
+    fields = ", ".join(tools.LIST_FIELDS[tool_name])
+    return f"{UNKNOWN_LIST_FIELD_PREFIX}'{name.strip()}'. Available fields are: {fields}."
+
+def select_batch_tool(tool_name: str, id_text: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the parameters for a batch lookup, refusing oversized ID lists.
+    """
+    ids = parse_id_list(id_text, tools.BATCH_MAX_IDS)
+    if len(ids) > tools.BATCH_MAX_IDS:
+        return "respond", {"message": f"I can look up at most {tools.BATCH_MAX_IDS} records at once. Please narrow down the list of IDs."}
+    return tool_name, {"ids": ids}
+
+HELP_MESSAGE = """
 ### Available Commands
 
 **Client Management:**
@@ -461,150 +641,503 @@ def select_tool(prompt: str, conversation_history: List[Dict[str, Any]]) -> Tupl
 - `update client with id [ID] set [field] to [value]` - Update client information
 - `delete client with id [ID]` - Remove a client
 - `tell me about client with id [ID]` - Get detailed client information
+- `tell me about clients [ID], [ID] and [ID]` - Get details for several clients (ranges like `3-7` work too)
 
 **Campaign Management:**
 - `list campaigns` - Show all campaigns
+- `list campaigns with status [status]` - Show campaigns matching a filter
 - `add campaign named [name] for client [client]` - Add a new campaign
 - `tell me about campaign with id [ID]` - Get detailed campaign information
+- `tell me about campaigns [ID], [ID] and [ID]` - Get details for several campaigns
+- `campaigns for client [ID]` - Show a client's campaigns (or `what campaigns does that client have?` after asking about one)
 
 **Content Ideas:**
 - `list ideas` - Show all content ideas
+- `list ideas for client [client]` - Show content ideas for one client
 - `add idea titled [title] with type [type] for client [client]` - Add a new content idea
 - `tell me about idea with id [ID]` - Get detailed content idea information
+- `tell me about ideas [ID], [ID] and [ID]` - Get details for several content ideas
+- `ideas for campaign [ID]` - Show the content ideas of a campaign's client
 
 **Marketing Data:**
 - `show marketing data` - Display marketing performance data
+- `roi by client` - Revenue, spend and ROI for each client
+- `top 5 clients by revenue` - Rank clients by revenue, spend or roi
+- `spend trend last 6 months` - Monthly spend (or revenue, roi) with a rolling average
+- `compare Q1 vs Q2` - Compare two quarters (add a year, e.g. `Q4 2023`, for another year)
+- `revenue for [client] from March to June` - Marketing data and totals for a client and/or range of months (also `spend in May 2024`)
+
+Long lists are shown a page at a time:
+- `next page` / `previous page` - Move through the last list
+- `show clients page 3` - Jump to a page
+
+You can combine commands in one message, such as:
+- `list clients and list campaigns and show marketing data`
 
-You can also refer to clients by their ID or name in follow-up questions, such as:
-- "What is the niche of client 5?"
-- "Tell me the email for Acme Inc"
+You can refer to clients and campaigns by name instead of ID; close spellings work too, such as:
+- `tell me about client Acme`
+- `list ideas for client acme`
 """
-        }
-    
-    # CLIENT TOOLS
-    # Check for list clients command
-    if re.match(REGEX_PATTERNS["list_clients"], prompt):
-        return "list_clients", {}
-    
-    # Check for get client details command
-    match = re.match(REGEX_PATTERNS["get_client"], prompt)
-    if match:
-        client_id = match.group(1)
-        return "get_client_details", {"id": client_id}
-    
-    # Check for add client command
-    match = re.match(REGEX_PATTERNS["add_client"], prompt)
-    if match:
-        name = match.group(1).strip()
-        niche = match.group(2).strip() if match.group(2) else ""
-        email = match.group(3).strip() if match.group(3) else ""
-        
-        parameters = {"name": name}
-        if niche:
-            parameters["niche"] = niche
-        if email:
-            parameters["contact_email"] = email
-            
-        return "add_client", parameters
-    
-    # Check for update client command
-    match = re.match(REGEX_PATTERNS["update_client"], prompt)
-    if match:
-        client_id = match.group(1)
-        field = match.group(2).strip()
-        value = match.group(3).strip()
-        
-        # Map user-friendly field names to actual database fields
-        field_mapping = {
-            "name": "name",
-            "niche": "niche",
-            "email": "contact_email",
-            "contact": "contact_person",
-            "notes": "notes",
-        }
-        
-        db_field = field_mapping.get(field.lower(), field.lower())
-        
-        parameters = {
-            "id": client_id,
-            db_field: value
-        }
+
+# Intent handlers: turn a pattern match into (tool_name, parameters).
+# A handler may return None to let the next candidate pattern try.
+def _select_help(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    return "respond", {"message": HELP_MESSAGE}
+
+def _select_get_client(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    client_id = match.group(1)
+    return "get_client_details", {"id": client_id}
+
+def _select_add_client(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    name = match.group(1).strip()
+    niche = match.group(2).strip() if match.group(2) else ""
+    email = match.group(3).strip() if match.group(3) else ""
+    
+    parameters = {"name": name}
+    if niche:
+        parameters["niche"] = niche
+    if email:
+        parameters["contact_email"] = email
         
-        return "update_client", parameters
-    
-    # Check for delete client command
-    match = re.match(REGEX_PATTERNS["delete_client"], prompt)
-    if match:
-        client_id = match.group(1)
-        return "delete_client", {"id": client_id}
-    
-    # CAMPAIGN TOOLS
-    # Check for list campaigns command
-    if re.match(REGEX_PATTERNS["list_campaigns"], prompt):
-        return "list_campaigns", {}
-    
-    # Check for get campaign details command
-    match = re.match(REGEX_PATTERNS["get_campaign"], prompt)
-    if match:
-        campaign_id = match.group(1)
-        return "get_campaign", {"id": campaign_id}
-    
-    # Check for add campaign command
-    match = re.match(REGEX_PATTERNS["add_campaign"], prompt)
-    if match:
-        name = match.group(1).strip()
-        client = match.group(2).strip() if match.group(2) else ""
-        additional_info = match.group(3).strip() if match.group(3) else ""
+    return "add_client", parameters
+
+def _select_update_client(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    client_id = match.group(1)
+    field = match.group(2).strip()
+    value = match.group(3).strip()
+    
+    # Map user-friendly field names to actual database fields
+    field_mapping = {
+        "name": "name",
+        "niche": "niche",
+        "email": "contact_email",
+        "contact": "contact_person",
+        "notes": "notes",
+    }
+    
+    db_field = field_mapping.get(field.lower(), field.lower())
+    
+    parameters = {
+        "id": client_id,
+        db_field: value
+    }
+    
+    return "update_client", parameters
+
+def _select_delete_client(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    client_id = match.group(1)
+    return "delete_client", {"id": client_id}
+
+def _select_add_campaign(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    name = match.group(1).strip()
+    client = match.group(2).strip() if match.group(2) else ""
+    additional_info = match.group(3).strip() if match.group(3) else ""
+    
+    parameters = {"name": name}
+    if client:
+        parameters["client"] = client
+    if additional_info:
+        # Try to determine if it's status, budget, etc.
+        if "budget" in prompt.lower():
+            parameters["budget"] = additional_info
+        elif "status" in prompt.lower():
+            parameters["status"] = additional_info
+        elif "start" in prompt.lower():
+            parameters["startDate"] = additional_info
+        elif "end" in prompt.lower():
+            parameters["endDate"] = additional_info
         
-        parameters = {"name": name}
-        if client:
-            parameters["client"] = client
-        if additional_info:
-            # Try to determine if it's status, budget, etc.
-            if "budget" in prompt.lower():
-                parameters["budget"] = additional_info
-            elif "status" in prompt.lower():
-                parameters["status"] = additional_info
-            elif "start" in prompt.lower():
-                parameters["startDate"] = additional_info
-            elif "end" in prompt.lower():
-                parameters["endDate"] = additional_info
-            
-        return "add_campaign", parameters
-    
-    # CONTENT IDEAS TOOLS
-    # Check for list content ideas command
-    if re.match(REGEX_PATTERNS["list_content_ideas"], prompt):
-        return "list_content_ideas", {}
-    
-    # Check for get content idea details command
-    match = re.match(REGEX_PATTERNS["get_content_idea"], prompt)
-    if match:
-        idea_id = match.group(1)
-        return "get_content_idea", {"id": idea_id}
-    
-    # Check for add content idea command
-    match = re.match(REGEX_PATTERNS["add_content_idea"], prompt)
-    if match:
-        title = match.group(1).strip()
-        content_type = match.group(2).strip() if match.group(2) else "blog"
-        client = match.group(3).strip() if match.group(3) else ""
+    return "add_campaign", parameters
+
+def _select_add_content_idea(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    title = match.group(1).strip()
+    content_type = match.group(2).strip() if match.group(2) else "blog"
+    client = match.group(3).strip() if match.group(3) else ""
+    
+    parameters = {
+        "title": title,
+        "type": content_type,
+        "status": "new",
+        "priority": "medium"
+    }
+    if client:
+        parameters["client"] = client
         
-        parameters = {
-            "title": title,
-            "type": content_type,
-            "status": "new",
-            "priority": "medium"
-        }
-        if client:
-            parameters["client"] = client
-            
-        return "add_content_idea", parameters
-    
-    # MARKETING DATA TOOLS
-    # Check for get marketing data command
-    if re.match(REGEX_PATTERNS["get_marketing_data"], prompt):
-        return "get_marketing_data", {}
+    return "add_content_idea", parameters
+
+def _select_linked_list(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    # The client or campaign is resolved when the tool runs, see linked_client
+    parameters = {"of": match.group("of").lower()}
+    if match.group("id"):
+        parameters["id"] = match.group("id")
+    return LIST_ENTITY_TOOLS[match.group("entity").split()[-1].lower()], parameters
+
+def _metric(word: Optional[str], default: str) -> str:
+    word = (word or default).lower()
+    return "spend" if word == "spending" else word
+
+def _select_top_clients(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    return "analyze_marketing_data", {"analysis": "top_clients", "limit": int(match.group(1)), "metric": _metric(match.group(2), "revenue")}
+
+def _select_marketing_trend(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    return "analyze_marketing_data", {"analysis": "trend", "metric": _metric(match.group(1), "spend"), "months": int(match.group(2) or 6)}
+
+def _select_compare_quarters(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    quarters = [[int(match.group(1)), int(match.group(2)) if match.group(2) else None], [int(match.group(3)), int(match.group(4)) if match.group(4) else None]]
+    return "analyze_marketing_data", {"analysis": "compare_quarters", "quarters": quarters}
+
+MONTH_RANGE_PATTERN = re.compile(r"(?i)(?:^|\s+)(?:from|between)\s+(.+?)\s+(?:to|through|until|and|-)\s+(.+)$")
+SINGLE_MONTH_PATTERN = re.compile(r"(?i)(?:^|\s+)(?:in|during|for)\s+([a-z]+\.?(?:\s+\d{4})?|\d{4}-\d{1,2})$")
+SLICE_CLIENT_PATTERN = re.compile(r"(?i)^(?:for|of)\s+(?:client\s+)?(.+)$")
+
+def _select_marketing_slice(match: re.Match, prompt: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    "revenue for Acme from March to June", "spend in May 2024" or "roi for
+    Globex": marketing data for a client and/or a range of months.
+    """
+    rest = match.group(2).strip()
+    parameters: Dict[str, Any] = {}
+    
+    months = MONTH_RANGE_PATTERN.search(rest)
+    if months:
+        parameters["start"], parameters["end"] = months.group(1).strip(), months.group(2).strip()
+    else:
+        months = SINGLE_MONTH_PATTERN.search(rest)
+        if months and analytics.month_ordinal(months.group(1)) >= 0:
+            parameters["start"] = months.group(1).strip()
+        else:
+            months = None
+    if months:
+        rest = rest[:months.start()].strip()
+        if any(analytics.month_ordinal(parameters[name]) < 0 for name in ("start", "end") if name in parameters):
+            return None
+    
+    if rest:
+        client = SLICE_CLIENT_PATTERN.match(rest)
+        if not client:
+            return None
+        parameters["client"] = client.group(1).strip()
+    
+    metric = match.group(1).lower()
+    if metric in analytics.METRICS or metric == "spending":
+        parameters["metric"] = _metric(metric, "revenue")
+    return "get_marketing_data", parameters
+
+# Intents in match priority order: (pattern name, leading verbs, nouns, handler).
+# Nouns are the first entity keyword in the prompt; None means any (or none).
+def _page_tool(entity: Optional[str]) -> Optional[str]:
+    return LIST_ENTITY_TOOLS[entity.split()[-1].lower()] if entity else None
+
+def _select_page_step(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    step = match.group(1).lower()
+    return "page_list", {"page": "previous" if step == "prev" else step, "tool_name": _page_tool(match.group(2))}
+
+def _select_page_number(match: re.Match, prompt: str) -> Tuple[str, Dict[str, Any]]:
+    return "page_list", {"page": int(match.group(2)), "tool_name": _page_tool(match.group(1) or match.group(3))}
+
+CLIENT_NOUNS = ("client",)
+CAMPAIGN_NOUNS = ("campaign",)
+IDEA_NOUNS = ("idea",)
+LIST_VERBS = ("list", "show", "get")
+DETAIL_VERBS = ("tell", "show", "get", "give")
+
+INTENTS = [
+    ("help", ("help", "commands", "what", "how"), None, _select_help),
+    
+    # Client intents
+    ("list_clients", LIST_VERBS, CLIENT_NOUNS, lambda match, prompt: ("list_clients", {})),
+    ("get_client", DETAIL_VERBS, CLIENT_NOUNS, _select_get_client),
+    ("get_clients", DETAIL_VERBS, CLIENT_NOUNS, lambda match, prompt: select_batch_tool("get_clients", match.group(1))),
+    ("get_client_by_name", DETAIL_VERBS, CLIENT_NOUNS, lambda match, prompt: ("get_client_details", {"name": match.group(1).strip()})),
+    ("add_client", ("add", "create"), CLIENT_NOUNS, _select_add_client),
+    ("update_client", ("update", "change", "modify"), CLIENT_NOUNS, _select_update_client),
+    ("delete_client", ("delete", "remove"), CLIENT_NOUNS, _select_delete_client),
+    
+    # Campaign intents
+    ("list_campaigns", LIST_VERBS, CAMPAIGN_NOUNS, lambda match, prompt: ("list_campaigns", {})),
+    ("get_campaign", DETAIL_VERBS, CAMPAIGN_NOUNS, lambda match, prompt: ("get_campaign", {"id": match.group(1)})),
+    ("get_campaigns", DETAIL_VERBS, CAMPAIGN_NOUNS, lambda match, prompt: select_batch_tool("get_campaigns", match.group(1))),
+    ("get_campaign_by_name", DETAIL_VERBS, CAMPAIGN_NOUNS, lambda match, prompt: ("get_campaign", {"name": match.group(1).strip()})),
+    ("add_campaign", ("add", "create"), CAMPAIGN_NOUNS, _select_add_campaign),
+    
+    # Content idea intents
+    ("list_content_ideas", LIST_VERBS, IDEA_NOUNS, lambda match, prompt: ("list_content_ideas", {})),
+    ("get_content_idea", DETAIL_VERBS, IDEA_NOUNS, lambda match, prompt: ("get_content_idea", {"id": match.group(1)})),
+    ("get_content_ideas", DETAIL_VERBS, IDEA_NOUNS, lambda match, prompt: select_batch_tool("get_content_ideas", match.group(1))),
+    ("add_content_idea", ("add", "create"), IDEA_NOUNS, _select_add_content_idea),
+    
+    # Paging
+    ("page_step", ("show", "go", "get", "next", "previous", "prev", "first", "last"), None, _select_page_step),
+    # "clients page 2" and "all clients page 2" lead with the list they page
+    ("page_number", ("show", "list", "get", "go", "page", "all", "clients", "campaigns", "ideas", "content"), None, _select_page_number),
+    
+    # Campaigns and content ideas of a client or campaign
+    ("linked_list", LIST_VERBS + ("give", "what", "campaigns", "ideas", "content"), CAMPAIGN_NOUNS + IDEA_NOUNS, _select_linked_list),
+    
+    # Filtered lists
+    ("list_query", LIST_VERBS, CLIENT_NOUNS + CAMPAIGN_NOUNS + IDEA_NOUNS, lambda match, prompt: select_list_query(match.group(1), match.group(2))),
+    
+    # Marketing data
+    ("get_marketing_data", ("get", "show", "display"), ("data",), lambda match, prompt: ("get_marketing_data", {})),
+    ("roi_by_client", ("roi", "show", "get", "display", "what", "what's"), None, lambda match, prompt: ("analyze_marketing_data", {"analysis": "roi_by_client"})),
+    ("top_clients", ("top", "show", "get", "display", "list"), None, _select_top_clients),
+    ("marketing_trend", ("revenue", "spend", "spending", "roi", "show", "get", "display"), None, _select_marketing_trend),
+    ("compare_quarters", ("compare",), None, _select_compare_quarters),
+    ("marketing_slice", ("revenue", "spend", "spending", "roi", "data", "marketing", "performance", "show", "get", "display"), None, _select_marketing_slice),
+]
+
+# Patterns compiled once at import
+COMPILED_PATTERNS = {name: re.compile(pattern) for name, pattern in REGEX_PATTERNS.items()}
+
+# First entity keyword of a prompt; the marketing data words all route as "data"
+NOUN_PATTERN = re.compile(r"(?i)\b(client|campaign|idea|data|performance|stats|analytics|metrics)s?\b")
+NOUN_ALIASES = {"performance": "data", "stats": "data", "analytics": "data", "metrics": "data"}
+
+def _build_routes() -> Dict[Tuple[str, Optional[str]], List[Tuple[re.Pattern, Any]]]:
+    """
+    Index the intents by (leading verb, noun) so a prompt only tries the
+    handful of patterns that could possibly match it, in priority order.
+    """
+    all_nouns = [None] + sorted({noun for _, _, nouns, _ in INTENTS if nouns for noun in nouns})
+    routes: Dict[Tuple[str, Optional[str]], List[Tuple[re.Pattern, Any]]] = {}
+    for name, verbs, nouns, handler in INTENTS:
+        for verb in verbs:
+            for noun in (nouns if nouns is not None else all_nouns):
+                routes.setdefault((verb, noun), []).append((COMPILED_PATTERNS[name], handler))
+    return routes
+
+ROUTES = _build_routes()
+
+def route_key(prompt: str) -> Tuple[str, Optional[str]]:
+    """
+    The (leading verb, first entity noun) pair used to look up candidate intents.
+    """
+    words = prompt.split(None, 1)
+    verb = words[0].lower() if words else ""
+    noun_match = NOUN_PATTERN.search(prompt)
+    if not noun_match:
+        return verb, None
+    noun = noun_match.group(1).lower()
+    return verb, NOUN_ALIASES.get(noun, noun)
+
+def select_tool(prompt: str, session: SessionContext) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Select the appropriate tool based on the user prompt.
+    Returns a tuple of (tool_name, parameters).
+    """
+    for pattern, handler in ROUTES.get(route_key(prompt), ()):
+        match = pattern.match(prompt)
+        if match:
+            selection = handler(match, prompt)
+            if selection:
+                return selection
     
     # No matching tool found
-    return None, {}
\ No newline at end of file
+    return None, {}
+
+# Memoized intent parsing for repeated, context-free commands
+INTENT_CACHE_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "4096"))
+intent_cache = TTLCache(max_entries=INTENT_CACHE_MAX_ENTRIES, default_ttl=float("inf"))
+
+# Tools whose parameters don't depend on the case or spacing of the prompt
+MEMOIZABLE_TOOLS = {
+    "list_clients",
+    "list_campaigns",
+    "list_content_ideas",
+    "get_client_details",
+    "get_campaign",
+    "get_content_idea",
+    "get_clients",
+    "get_campaigns",
+    "get_content_ideas",
+    "get_marketing_data",
+    "analyze_marketing_data",
+}
+
+# Parameters that echo the user's wording (filter values, client names, months)
+# or are resolved against the session when the tool runs (linked lists)
+UNMEMOIZABLE_PARAMETERS = ("filters", "name", "client", "start", "end", "of")
+
+# Words that make a prompt depend on what was said earlier in the session
+CONTEXT_PATTERN = re.compile(r"(?i)\b(?:it|its|this|that|these|those|them|they|their|next|previous|page)\b")
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Case-fold a prompt and collapse its whitespace.
+    """
+    return " ".join(prompt.split()).casefold()
+
+def is_memoizable(tool_name: Optional[str], parameters: Dict[str, Any]) -> bool:
+    """
+    Whether a selection can be reused for every prompt with the same
+    normalized text: the help reply, and selections of MEMOIZABLE_TOOLS
+    whose parameters are all IDs, numbers or fixed keywords. Any of
+    UNMEMOIZABLE_PARAMETERS rules a selection out, as would free-text replies.
+    """
+    if tool_name == "respond":
+        return parameters.get("message") == HELP_MESSAGE
+    return tool_name in MEMOIZABLE_TOOLS and not any(parameters.get(name) for name in UNMEMOIZABLE_PARAMETERS)
+
+def select_tool_memoized(prompt: str, session: SessionContext) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    select_tool behind an LRU keyed on the normalized prompt. Only
+    context-free intents whose parameters survive normalization are cached;
+    prompts that refer back to the conversation always go to select_tool.
+    """
+    if CONTEXT_PATTERN.search(prompt):
+        return select_tool(prompt, session)
+    
+    key = ("select_tool", normalize_prompt(prompt))
+    found, selection = intent_cache.get(key)
+    if found:
+        tool_name, parameters = selection
+        return tool_name, dict(parameters)
+    
+    tool_name, parameters = select_tool(prompt, session)
+    if is_memoizable(tool_name, parameters):
+        intent_cache.set(key, (tool_name, dict(parameters)))
+    return tool_name, parameters
+
+def _hint(intent: str, *commands: str) -> Tuple[str, Dict[str, Any]]:
+    lines = "".join(f"- `{command}`\n" for command in commands)
+    return "respond", {"message": f"It sounds like you want to {intent}. Try:\n{lines}"}
+
+# What a prompt recognized by the intent classifier does: run a tool that
+# needs no parameters, or point to the command for intents that need details
+# (IDs, names, values) the classifier can't extract
+CLASSIFIED_INTENTS = {
+    "list_clients": ("list_clients", {}),
+    "list_campaigns": ("list_campaigns", {}),
+    "list_content_ideas": ("list_content_ideas", {}),
+    "get_marketing_data": ("get_marketing_data", {}),
+    "roi_by_client": ("analyze_marketing_data", {"analysis": "roi_by_client"}),
+    "top_clients": ("analyze_marketing_data", {"analysis": "top_clients", "limit": 5, "metric": "revenue"}),
+    "marketing_trend": ("analyze_marketing_data", {"analysis": "trend", "metric": "spend", "months": 6}),
+    "help": ("respond", {"message": HELP_MESSAGE}),
+    "next_page": ("page_list", {"page": "next", "tool_name": None}),
+    "compare_quarters": _hint("compare quarters", "compare Q1 vs Q2", "compare Q4 2023 vs Q1 2024"),
+    "get_client": _hint("look up a client", "tell me about client [ID]", "tell me about client [name]"),
+    "add_client": _hint("add a client", "add client named [name] with niche [industry] with email [email]"),
+    "update_client": _hint("update a client", "update client with id [ID] set [field] to [value]"),
+    "delete_client": _hint("delete a client", "delete client with id [ID]"),
+    "add_campaign": _hint("add a campaign", "add campaign named [name] for client [client]"),
+    "add_content_idea": _hint("add a content idea", "add idea titled [title] with type [type] for client [client]"),
+}
+
+# Prompts that ask to destroy something are never guessed at
+DESTRUCTIVE_PATTERN = re.compile(r"(?i)\b(?:delete|remove|drop|erase|wipe|destroy|purge|clear|kill|cancel)\b")
+DESTRUCTIVE_MESSAGE = "I only delete records when asked with an exact command. To remove a client, use:\n- `delete client with id [ID]`\n"
+
+# Commands to point to when a recognized prompt has a number its tool can't take
+NUMBER_HINTS = {
+    "list_clients": ("tell me about client [ID]", "list clients limit [N]"),
+    "list_campaigns": ("tell me about campaign [ID]", "list campaigns limit [N]"),
+    "list_content_ideas": ("tell me about idea [ID]", "list ideas limit [N]"),
+    "get_marketing_data": ("revenue for [client] in [month]", "spend in May 2024"),
+    "roi_by_client": ("roi by client",),
+    "top_clients": ("top [N] clients by revenue",),
+    "marketing_trend": ("spend trend last [N] months",),
+    "next_page": ("show clients page [N]",),
+}
+NUMBER_PATTERN = re.compile(r"\b\d+\b")
+
+def select_tool_or_classify(prompt: str, session: SessionContext) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    select_tool_memoized, falling back to the intent classifier for prompts
+    no pattern matches. Compound prompts don't use the fallback: a guess for
+    one of their parts shouldn't turn a prompt into a plan.
+    
+    A guess never runs a tool for a prompt that asks to delete something,
+    or that names an ID or number the tool would silently drop ("show
+    campaign 3" is not "list campaigns"); those get the command to use.
+    """
+    tool_name, parameters = select_tool_memoized(prompt, session)
+    if tool_name:
+        return tool_name, parameters
+    
+    if DESTRUCTIVE_PATTERN.search(prompt):
+        return "respond", {"message": DESTRUCTIVE_MESSAGE}
+    
+    prediction = intent_classifier.classify(prompt)
+    if prediction is None or prediction.label not in CLASSIFIED_INTENTS:
+        return None, {}
+    tool_name, parameters = CLASSIFIED_INTENTS[prediction.label]
+    number = NUMBER_PATTERN.search(prompt)
+    if tool_name != "respond" and number:
+        lines = "".join(f"- `{command}`\n" for command in NUMBER_HINTS.get(prediction.label, ()))
+        return "respond", {"message": f"I'm not sure what {number.group()} refers to there. Try:\n{lines}"}
+    return tool_name, dict(parameters)
+
+# Compound prompts, e.g. "list clients and list campaigns and show marketing data"
+PLAN_MAX_STEPS = int(os.getenv("PLAN_MAX_STEPS", "5"))
+PLAN_SECTION_SEPARATOR = "\n\n"
+
+# Candidate split points: a connector followed by the verb of another command,
+# or by the first word of an analytics phrasing ("top 5 clients", "roi by client")
+COMMAND_VERBS = r"(?:list|show|get|display|tell|give|add|create|update|change|modify|delete|remove|help|top|roi|revenue|spend|spending|compare)"
+PLAN_SPLIT_PATTERN = re.compile(
+    r"\s*[,;]\s*(?:(?:and\s+)?then\s+|and\s+)?(?=" + COMMAND_VERBS + r"\b)"
+    r"|\s+(?:and\s+then|and|then)\s+(?=" + COMMAND_VERBS + r"\b)",
+    re.IGNORECASE,
+)
+
+# Free-text values a command takes, which are never split: quoted text, and
+# what follows titled/named/called/notes up to the next comma or semicolon
+# (the add patterns don't take commas in values)
+PLAN_VALUE_PATTERN = re.compile(r"""(?<!\w)"[^"]*"|(?<!\w)'[^']*'(?!\w)|\b(?:titled|named|called|notes)\b[^,;]*""", re.IGNORECASE)
+
+def select_plan(prompt: str, session: SessionContext) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+    """
+    Split a compound prompt into the tool selections of its sub-intents.
+    Returns None unless the prompt splits into at least two commands that
+    each select a tool.
+    
+    Connectors also appear inside single commands ("add client named A and
+    B", "clients 3, 7 and 12"), so a prompt that selects a tool as a whole
+    is left alone, unless all it gets is the list query's unknown-field
+    reply ("list clients and top 5 clients by revenue"). Otherwise it is cut
+    at every candidate outside a free-text value and the shortest pieces
+    that all select a tool win; pieces that don't are merged with the next one.
+    """
+    text = prompt.strip()
+    tool_name, parameters = select_tool_memoized(text, session)
+    if tool_name and not (tool_name == "respond" and str(parameters.get("message", "")).startswith(UNKNOWN_LIST_FIELD_PREFIX)):
+        return None
+    
+    values = [value.span() for value in PLAN_VALUE_PATTERN.finditer(text)]
+    cuts = [
+        cut for cut in PLAN_SPLIT_PATTERN.finditer(text)
+        if not any(start <= cut.start() < end for start, end in values)
+    ]
+    if not cuts:
+        return None
+    
+    # Piece i spans text[starts[i]:ends[i]]
+    starts = [0] + [cut.end() for cut in cuts]
+    ends = [cut.start() for cut in cuts] + [len(text)]
+    
+    # Best segmentation of the pieces from index `first` onwards
+    memo: Dict[int, Optional[List[Tuple[str, Dict[str, Any]]]]] = {}
+    
+    def segment(first: int) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        if first == len(starts):
+            return []
+        if first in memo:
+            return memo[first]
+        memo[first] = None
+        for last in range(first, len(starts)):
+            tool_name, parameters = select_tool_memoized(text[starts[first]:ends[last]], session)
+            if not tool_name:
+                continue
+            rest = segment(last + 1)
+            if rest is not None:
+                memo[first] = [(tool_name, parameters)] + rest
+                break
+        return memo[first]
+    
+    steps = segment(0)
+    if not steps or len(steps) < 2:
+        return None
+    if len(steps) > PLAN_MAX_STEPS:
+        return [("respond", {"message": f"I can run up to {PLAN_MAX_STEPS} commands in one message. Please split your request into smaller parts."})]
+    return steps
@@ -0,0 +1,388 @@
+import calendar
+import re
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from name_index import NameIndex
+
+# Months averaged by the rolling column of a trend
+ROLLING_MONTHS = 3
+
+# Metrics the analyses can rank or trend on; ROI is revenue over spend
+METRICS = ("revenue", "spend", "roi")
+
+MONTH_NUMBERS = {
+    **{name.lower(): number for number, name in enumerate(calendar.month_abbr) if name},
+    **{name.lower(): number for number, name in enumerate(calendar.month_name) if name},
+    "sept": 9,
+}
+
+_NUMERIC_MONTH = re.compile(r"^(\d{4})[-/](\d{1,2})\b")
+_NAMED_MONTH = re.compile(r"(?i)^([a-z]+)\.?(?:[\s,-]+(\d{4}))?$")
+
+def month_ordinal(label: Any) -> int:
+    """
+    Months since year 0 of a "2024-03", "2024-03-01", "Mar 2024" or "March"
+    label, or -1 if it isn't a month. Labels without a year count as year 0.
+    """
+    label = str(label or "").strip()
+    match = _NUMERIC_MONTH.match(label)
+    if match:
+        year, month = int(match.group(1)), int(match.group(2))
+    else:
+        match = _NAMED_MONTH.match(label)
+        if not match or match.group(1).lower() not in MONTH_NUMBERS:
+            return -1
+        year, month = int(match.group(2) or 0), MONTH_NUMBERS[match.group(1).lower()]
+    return year * 12 + month - 1 if 1 <= month <= 12 else -1
+
+def month_label(ordinal: int) -> str:
+    """
+    "2024-03" for a month ordinal, or "Mar" when the data has no year.
+    """
+    year, month = divmod(int(ordinal), 12)
+    return f"{year}-{month + 1:02d}" if year else calendar.month_abbr[month + 1]
+
+def _column(rows: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    try:
+        return np.fromiter((row.get(key) or 0 for row in rows), dtype=np.float64, count=len(rows))
+    except (TypeError, ValueError):
+        # Stray non-numeric values count as zero rather than failing the whole table
+        return np.array([_number(row.get(key)) for row in rows], dtype=np.float64)
+
+def _number(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator != 0)
+
+def _round(value: float) -> float:
+    return round(float(value), 2)
+
+class MarketingFrame:
+    """
+    Columnar copy of the marketing data rows: one NumPy array per column,
+    with months as ordinals and clients as integer codes, so the analyses
+    are whole-array group-bys instead of loops over row dicts.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], fingerprint: Optional[str] = None):
+        self.rows = rows
+        # Identifies the data the frame was built from, see fetched_listing
+        self.fingerprint = fingerprint
+        self.revenue = _column(rows, "revenue")
+        self.spend = _column(rows, "spend")
+
+        # Factorize the string columns, parsing each distinct month label once
+        client_codes: Dict[Any, int] = {}
+        self.clients = np.fromiter((client_codes.setdefault(row.get("client"), len(client_codes)) for row in rows), dtype=np.int64, count=len(rows))
+        self.client_names: List[str] = [str(name) if name is not None else "Unassigned" for name in client_codes]
+
+        month_codes: Dict[Any, int] = {}
+        codes = np.fromiter((month_codes.setdefault(row.get("month"), len(month_codes)) for row in rows), dtype=np.int64, count=len(rows))
+        ordinals = np.fromiter((month_ordinal(label) for label in month_codes), dtype=np.int64, count=len(month_codes))
+        self.months = ordinals[codes] if len(rows) else codes
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @cached_property
+    def index(self) -> "MarketingIndex":
+        """
+        Sorted month and client/month views for range queries, built on first use.
+        """
+        return MarketingIndex(self)
+
+    @cached_property
+    def latest_year(self) -> int:
+        dated = self.months[self.months >= 0]
+        return int(dated.max()) // 12 if len(dated) else 0
+
+    def client_totals(self, metric: str) -> np.ndarray:
+        """
+        Metric total per client code.
+        """
+        count = len(self.client_names)
+        if metric == "roi":
+            return _ratio(self.client_totals("revenue"), self.client_totals("spend"))
+        return np.bincount(self.clients, weights=getattr(self, metric), minlength=count).astype(np.float64, copy=False)
+
+    def roi_by_client(self) -> Dict[str, Any]:
+        """
+        Revenue, spend and ROI per client, best ROI first.
+        """
+        revenue = self.client_totals("revenue")
+        spend = self.client_totals("spend")
+        roi = _ratio(revenue, spend)
+        order = np.lexsort((revenue, roi))[::-1]
+        return {
+            "analysis": "roi_by_client",
+            "rows": [self._client_row(code, revenue, spend, roi) for code in order.tolist()],
+        }
+
+    def top_clients(self, limit: int = 5, metric: str = "revenue") -> Dict[str, Any]:
+        """
+        The `limit` clients with the highest metric total.
+        """
+        totals = self.client_totals(metric)
+        limit = max(0, min(limit, len(totals)))
+        # Partial selection, then sort only the winners
+        top = np.argpartition(-totals, limit - 1)[:limit] if limit else np.array([], dtype=np.int64)
+        top = top[np.argsort(-totals[top], kind="stable")]
+        revenue = self.client_totals("revenue")
+        spend = self.client_totals("spend")
+        roi = _ratio(revenue, spend)
+        return {
+            "analysis": "top_clients",
+            "metric": metric,
+            "limit": limit,
+            "rows": [self._client_row(code, revenue, spend, roi) for code in top.tolist()],
+        }
+
+    def trend(self, metric: str = "spend", months: int = 6) -> Dict[str, Any]:
+        """
+        Monthly metric totals over the last `months` months of data, with the
+        change from the previous month and a rolling average.
+        """
+        dated = self.months >= 0
+        if not dated.any() or months < 1:
+            return {"analysis": "trend", "metric": metric, "months": months, "rows": []}
+
+        start = int(self.months[dated].min())
+        last = int(self.months[dated].max())
+        # Extra leading months feed the first rolling averages and changes;
+        # those reaching back before the data starts are left out
+        first = last - months - ROLLING_MONTHS + 2
+        window = dated & (self.months >= first)
+        offsets = self.months[window] - first
+        size = last - first + 1
+        revenue = np.bincount(offsets, weights=self.revenue[window], minlength=size)
+        spend = np.bincount(offsets, weights=self.spend[window], minlength=size)
+
+        if metric == "roi":
+            values = _ratio(revenue, spend)
+            rolling = _ratio(self._moving_sum(revenue), self._moving_sum(spend))
+        else:
+            values = revenue if metric == "revenue" else spend
+            rolling = self._moving_sum(values) / ROLLING_MONTHS
+        changes = np.diff(values)
+
+        shown = range(size - months, size)
+        return {
+            "analysis": "trend",
+            "metric": metric,
+            "months": months,
+            "rows": [
+                {
+                    "month": month_label(first + offset),
+                    metric: _round(values[offset]),
+                    "change": _round(changes[offset - 1]) if first + offset - 1 >= start else None,
+                    "rolling_average": _round(rolling[offset - ROLLING_MONTHS + 1]) if first + offset - ROLLING_MONTHS + 1 >= start else None,
+                }
+                for offset in shown
+                if first + offset >= start
+            ],
+        }
+
+    def compare_quarters(self, quarters: Sequence[Tuple[int, Optional[int]]]) -> Dict[str, Any]:
+        """
+        Revenue, spend and ROI of each (quarter, year) period, and the change
+        from the first period to each of the others. A missing year means
+        the latest year in the data.
+        """
+        dated = self.months >= 0
+        latest_year = self.latest_year
+        years = self.months // 12
+        quarter_of_month = self.months % 12 // 3 + 1
+
+        periods = []
+        for quarter, year in quarters:
+            year = latest_year if year is None else year
+            mask = dated & (years == year) & (quarter_of_month == quarter)
+            revenue = float(self.revenue[mask].sum())
+            spend = float(self.spend[mask].sum())
+            periods.append({
+                "period": f"Q{quarter} {year}" if year else f"Q{quarter}",
+                "revenue": _round(revenue),
+                "spend": _round(spend),
+                "roi": _round(revenue / spend) if spend else 0.0,
+                "rows": int(mask.sum()),
+            })
+
+        base = periods[0] if periods else None
+        for period in periods[1:]:
+            period["change"] = {
+                metric: _round((period[metric] - base[metric]) / base[metric] * 100) if base[metric] else None
+                for metric in METRICS
+            }
+        return {"analysis": "compare_quarters", "rows": periods}
+
+    @staticmethod
+    def _moving_sum(values: np.ndarray) -> np.ndarray:
+        # Sums over each run of ROLLING_MONTHS consecutive months
+        totals = np.cumsum(np.concatenate(([0.0], values)))
+        return totals[ROLLING_MONTHS:] - totals[:-ROLLING_MONTHS]
+
+    def _client_row(self, code: int, revenue: np.ndarray, spend: np.ndarray, roi: np.ndarray) -> Dict[str, Any]:
+        return {
+            "client": self.client_names[code],
+            "revenue": _round(revenue[code]),
+            "spend": _round(spend[code]),
+            "roi": _round(roi[code]),
+        }
+
+class MarketingIndex:
+    """
+    Row positions of a MarketingFrame sorted by month, and by client then
+    month, so a month range or a client's months are found by binary search
+    (np.searchsorted) in O(log n) and read as one contiguous run of k rows.
+    """
+
+    def __init__(self, frame: MarketingFrame):
+        self.frame = frame
+        months = frame.months
+        self.by_month = np.argsort(months, kind="stable")
+        self.sorted_months = months[self.by_month]
+
+        # One sortable key per row: client code, then month (undated rows first)
+        self._low = int(months.min()) if len(months) else 0
+        self._width = (int(months.max()) - self._low + 1) if len(months) else 1
+        keys = frame.clients * self._width + (months - self._low)
+        self.by_client = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.by_client]
+
+        self.client_names = NameIndex()
+        for code, name in enumerate(frame.client_names):
+            self.client_names.add(code, name)
+
+    def positions(self, client: Optional[int] = None, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """
+        Row positions, in month order, of a client (by code) and/or the
+        months from `start` to `end` inclusive (as ordinals).
+        """
+        if client is None:
+            low = np.searchsorted(self.sorted_months, 0 if start is None else start, side="left")
+            high = len(self.sorted_months) if end is None else np.searchsorted(self.sorted_months, end, side="right")
+            return self.by_month[low:high]
+
+        base = client * self._width - self._low
+        first = base + (self._low if start is None else max(start, self._low))
+        last = base + (self._low + self._width - 1 if end is None else min(end, self._low + self._width - 1))
+        if last < first:
+            return self.by_client[:0]
+        low = np.searchsorted(self.sorted_keys, first, side="left")
+        high = np.searchsorted(self.sorted_keys, last, side="right")
+        return self.by_client[low:high]
+
+    def resolve_months(self, start: Optional[str], end: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Month ordinals for the ends of a range given as labels. A month
+        without a year takes the year of the other end, or else the latest
+        year in the data; a range like "November to February" starts in the
+        year before.
+        """
+        ordinals = []
+        for label in (start, end):
+            ordinal = month_ordinal(label) if label is not None else None
+            if ordinal is not None and ordinal < 0:
+                raise ValueError(f"'{label}' isn't a month I recognize")
+            ordinals.append(ordinal)
+
+        first, last = ordinals
+        first_dated = first is not None and first >= 12
+        last_dated = last is not None and last >= 12
+        latest_year = self.frame.latest_year
+        if first is not None and not first_dated:
+            first += (last // 12 if last_dated else latest_year) * 12
+        if last is not None and not last_dated:
+            last += (ordinals[0] // 12 if first_dated else latest_year) * 12
+        if first is not None and last is not None and first > last:
+            if not first_dated:
+                first -= 12
+            elif not last_dated:
+                last += 12
+        return first, last
+
+    def slice(self, client: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        """
+        The rows of a client and/or a month range, with their totals.
+        """
+        first, last = self.resolve_months(start, end or start)
+        description = {
+            "client": client,
+            "start": month_label(first) if first is not None else None,
+            "end": month_label(last) if last is not None else None,
+        }
+
+        code = None
+        if client is not None:
+            match = self.client_names.resolve(client)
+            if match is None:
+                return {"slice": description, "rows": [], "totals": None}
+            code = int(match.id)
+            description["client"] = match.name
+
+        positions = self.positions(code, first, last)
+        revenue = float(self.frame.revenue[positions].sum())
+        spend = float(self.frame.spend[positions].sum())
+        rows = self.frame.rows
+        return {
+            "slice": description,
+            "rows": [rows[position] for position in positions.tolist()],
+            "totals": {"revenue": _round(revenue), "spend": _round(spend), "roi": _round(revenue / spend) if spend else 0.0},
+        }
+
+# The frame of the last marketing data seen, and the rows it was built from
+_frame: Optional[MarketingFrame] = None
+
+# The last marketing data listing fetched, and its fingerprint
+_fetched: Optional[Tuple[Sequence[Dict[str, Any]], str]] = None
+
+def fetched_listing(rows: Sequence[Dict[str, Any]], fingerprint: str) -> None:
+    """
+    Record the fingerprint of a marketing data listing as it is fetched (its
+    length and ETag, or a hash of the response body), so a refetch of the
+    same data is recognized without comparing rows.
+    """
+    global _fetched
+    _fetched = (rows, fingerprint)
+
+def marketing_frame(rows: Sequence[Dict[str, Any]]) -> MarketingFrame:
+    """
+    The columnar frame for a marketing data listing. It is only rebuilt when
+    the data changes: the same (cached) listing, or a refetched one with the
+    same fingerprint, reuses the previous frame. Rows without a fingerprint
+    always get a new frame.
+    """
+    global _frame
+    fingerprint = _fetched[1] if _fetched is not None and _fetched[0] is rows else None
+    if _frame is not None and (rows is _frame.rows or (fingerprint is not None and fingerprint == _frame.fingerprint)):
+        _frame.rows = rows
+        return _frame
+    _frame = MarketingFrame(rows, fingerprint)
+    return _frame
+
+def analyze(rows: Sequence[Dict[str, Any]], parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the analysis named by parameters["analysis"] over marketing data rows.
+    """
+    frame = marketing_frame(rows)
+    analysis = parameters.get("analysis")
+    metric = parameters.get("metric", "revenue")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'; use one of {', '.join(METRICS)}")
+
+    if analysis == "roi_by_client":
+        return frame.roi_by_client()
+    if analysis == "top_clients":
+        return frame.top_clients(int(parameters.get("limit", 5)), metric)
+    if analysis == "trend":
+        return frame.trend(parameters.get("metric", "spend"), int(parameters.get("months", 6)))
+    if analysis == "compare_quarters":
+        return frame.compare_quarters([(int(quarter), int(year) if year else None) for quarter, year in parameters.get("quarters", [])])
+    raise ValueError(f"Unknown analysis '{analysis}'")
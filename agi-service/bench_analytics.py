@@ -0,0 +1,139 @@
+"""
+Benchmark for the marketing analytics over a large marketing data table.
+
+Compares each analysis in analytics.MarketingFrame (whole-array NumPy
+group-bys) against a row-by-row Python loop over the row dicts, checks both
+give the same numbers, and reports the cost of building the columnar frame
+and of reusing it when the data hasn't changed. Range queries ("revenue for
+a client from March to June") are timed against the month/client index and
+against a scan of every row.
+
+Usage:
+    python bench_analytics.py [--rows 1000000] [--clients 500] [--repeat N]
+"""
+import argparse
+import copy
+from collections import defaultdict
+
+import analytics
+from bench_render import best_of
+
+def make_marketing_data(count, clients):
+    return [
+        {
+            "id": i,
+            "month": f"{2020 + i % 60 // 12}-{i % 12 + 1:02d}",
+            "revenue": 1000 + i % 997,
+            "spend": 400 + i % 101,
+            "roi": round((1000 + i % 997) / (400 + i % 101), 2),
+            "client": f"Client {i * 7919 % clients}",
+        }
+        for i in range(count)
+    ]
+
+def loop_totals(rows):
+    revenue = defaultdict(float)
+    spend = defaultdict(float)
+    for row in rows:
+        revenue[row["client"]] += row["revenue"]
+        spend[row["client"]] += row["spend"]
+    return revenue, spend
+
+def loop_roi_by_client(rows):
+    revenue, spend = loop_totals(rows)
+    return sorted(((revenue[client] / spend[client], revenue[client], client) for client in revenue), reverse=True)
+
+def loop_top_clients(rows, limit):
+    revenue, _ = loop_totals(rows)
+    return sorted(revenue.items(), key=lambda item: -item[1])[:limit]
+
+def loop_trend(rows, months):
+    totals = defaultdict(float)
+    for row in rows:
+        totals[analytics.month_ordinal(row["month"])] += row["spend"]
+    last = max(totals)
+    return [totals[month] for month in range(last - months + 1, last + 1)]
+
+def loop_compare_quarters(rows, year):
+    totals = defaultdict(float)
+    for row in rows:
+        ordinal = analytics.month_ordinal(row["month"])
+        if ordinal // 12 == year:
+            totals[ordinal % 12 // 3 + 1] += row["revenue"]
+    return totals[1], totals[2]
+
+def scan_slice(rows, client, first, last):
+    return [
+        row for row in rows
+        if (client is None or row["client"] == client) and first <= analytics.month_ordinal(row["month"]) <= last
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="marketing data rows")
+    parser.add_argument("--clients", type=int, default=500, help="distinct clients")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per case (best is reported)")
+    args = parser.parse_args()
+
+    rows = make_marketing_data(args.rows, args.clients)
+    refetched = copy.deepcopy(rows)
+
+    build = best_of(lambda: analytics.MarketingFrame(rows), 1)
+    # Fetched listings carry a fingerprint of the response (see tools.get_marketing_data)
+    analytics.fetched_listing(rows, f"{len(rows)}:bench")
+    frame = analytics.marketing_frame(rows)
+    reuse_same = best_of(lambda: analytics.marketing_frame(rows), args.repeat)
+    analytics.fetched_listing(refetched, f"{len(rows)}:bench")
+    reuse_equal = best_of(lambda: analytics.marketing_frame(refetched), 1)
+    assert analytics.marketing_frame(refetched) is frame
+
+    # Both approaches must agree before their timings mean anything
+    latest_year = int(frame.months.max()) // 12
+    expected = loop_roi_by_client(rows)
+    assert [row["client"] for row in frame.roi_by_client()["rows"]] == [client for _, _, client in expected]
+    assert [(row["client"], row["revenue"]) for row in frame.top_clients(5)["rows"]] == loop_top_clients(rows, 5)
+    assert [row["spend"] for row in frame.trend("spend", 6)["rows"]] == loop_trend(rows, 6)
+    assert tuple(period["revenue"] for period in frame.compare_quarters([(1, None), (2, None)])["rows"]) == loop_compare_quarters(rows, latest_year)
+
+    cases = [
+        ("roi by client", lambda: loop_roi_by_client(rows), frame.roi_by_client),
+        ("top 5 clients by revenue", lambda: loop_top_clients(rows, 5), lambda: frame.top_clients(5)),
+        ("spend trend last 6 months", lambda: loop_trend(rows, 6), lambda: frame.trend("spend", 6)),
+        ("compare Q1 vs Q2", lambda: loop_compare_quarters(rows, latest_year), lambda: frame.compare_quarters([(1, None), (2, None)])),
+    ]
+
+    print(f"{args.rows} rows, {args.clients} clients")
+    print(f"frame build {build:.1f} ms; reuse for the same listing {reuse_same:.4f} ms, for an equal refetched listing {reuse_equal:.4f} ms")
+    print()
+    print(f"{'analysis':<28} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for name, loop, vectorized in cases:
+        before = best_of(loop, args.repeat)
+        after = best_of(vectorized, args.repeat)
+        print(f"{name:<28} {before:>10.1f} {after:>10.1f} {before / after:>7.1f}x")
+
+    index_build = best_of(lambda: analytics.MarketingIndex(frame), 1)
+    index = frame.index
+    latest = f"{latest_year}"
+    queries = [
+        ("client, 4 months", "Client 7", f"March {latest}", f"June {latest}"),
+        ("client, all months", "Client 7", None, None),
+        ("all clients, 1 month", None, f"May {latest}", None),
+    ]
+
+    print()
+    print(f"index build {index_build:.1f} ms")
+    print(f"{'range query':<28} {'rows':>8} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+    for name, client, start, end in queries:
+        first, last = index.resolve_months(start, end or start)
+        first = 0 if first is None else first
+        last = int(frame.months.max()) if last is None else last
+        expected = scan_slice(rows, client, first, last)
+        found = index.slice(client, start, end)["rows"]
+        assert sorted(row["id"] for row in found) == sorted(row["id"] for row in expected), name
+
+        before = best_of(lambda: scan_slice(rows, client, first, last), args.repeat)
+        after = best_of(lambda: index.slice(client, start, end), args.repeat)
+        print(f"{name:<28} {len(found):>8} {before:>10.1f} {after:>10.2f} {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
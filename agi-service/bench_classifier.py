@@ -0,0 +1,169 @@
+"""
+Benchmark for the fallback intent classifier in intent_classifier.py.
+
+Trains on the bundled corpus and reports, on held-out prompts that the regex
+router doesn't match: accuracy of the predictions that clear the confidence
+threshold, how many prompts are answered versus declined, how many
+out-of-scope prompts are wrongly answered, and the latency of single-prompt
+and batched scoring (p50/p99).
+
+Usage:
+    python bench_classifier.py [--threshold 0.5] [--repeat N]
+"""
+import argparse
+import logging
+import statistics
+import time
+
+import agent
+import intent_classifier
+
+# Written separately from intent_corpus.txt; "other" prompts should be declined
+HELD_OUT = [
+    ("list_clients", "who are all our clients"),
+    ("list_clients", "can i see the client list"),
+    ("list_clients", "show me who our customers are"),
+    ("list_clients", "what customers do we have"),
+    ("list_clients", "list every client"),
+    ("list_clients", "i'd like to see all clients"),
+    ("list_clients", "please display the clients"),
+    ("list_clients", "gimme the clients"),
+    ("list_campaigns", "what campaigns do we run"),
+    ("list_campaigns", "can i see the campaign list"),
+    ("list_campaigns", "show me all of the campaigns"),
+    ("list_campaigns", "which promotions are running"),
+    ("list_campaigns", "list every campaign"),
+    ("list_campaigns", "i'd like to see the campaigns"),
+    ("list_campaigns", "campaigns please"),
+    ("list_content_ideas", "what ideas do we have for content"),
+    ("list_content_ideas", "show me all the content ideas"),
+    ("list_content_ideas", "which blog ideas are there"),
+    ("list_content_ideas", "list every idea"),
+    ("list_content_ideas", "i'd like to see the ideas"),
+    ("list_content_ideas", "content ideas please"),
+    ("get_marketing_data", "how's marketing performing"),
+    ("get_marketing_data", "show me our marketing numbers"),
+    ("get_marketing_data", "what are the kpis this month"),
+    ("get_marketing_data", "can i see the performance report"),
+    ("get_marketing_data", "monthly numbers please"),
+    ("get_marketing_data", "how are the numbers looking"),
+    ("roi_by_client", "what's the return on investment for each client"),
+    ("roi_by_client", "which clients give us the best roi"),
+    ("roi_by_client", "roi broken down per client"),
+    ("roi_by_client", "how profitable are our clients"),
+    ("top_clients", "which clients earn us the most"),
+    ("top_clients", "who are the top customers by revenue"),
+    ("top_clients", "our biggest accounts"),
+    ("top_clients", "highest earning clients"),
+    ("marketing_trend", "how is our spend trending"),
+    ("marketing_trend", "has spending gone up lately"),
+    ("marketing_trend", "spend over the past months"),
+    ("marketing_trend", "what's the trend in ad spend"),
+    ("compare_quarters", "how does this quarter compare with the last one"),
+    ("compare_quarters", "q2 against q1"),
+    ("compare_quarters", "compare quarterly results"),
+    ("compare_quarters", "quarter vs quarter"),
+    ("help", "what can i do here"),
+    ("help", "how do i use you"),
+    ("help", "what are the commands"),
+    ("help", "i need some help"),
+    ("help", "show me what you can do"),
+    ("get_client", "look up a specific client"),
+    ("get_client", "find me a client"),
+    ("get_client", "show details for a client"),
+    ("get_client", "what's the contact email for a client"),
+    ("add_client", "i want to add a new customer"),
+    ("add_client", "onboard a client"),
+    ("add_client", "register a new client please"),
+    ("add_client", "we just signed a new client"),
+    ("update_client", "i need to edit a client"),
+    ("update_client", "change a client's email address"),
+    ("update_client", "update a customer"),
+    ("delete_client", "remove a client"),
+    ("delete_client", "delete a customer"),
+    ("delete_client", "get rid of a customer"),
+    ("add_campaign", "set up a campaign"),
+    ("add_campaign", "launch a new promotion"),
+    ("add_campaign", "create a new marketing campaign"),
+    ("add_content_idea", "save a new content idea"),
+    ("add_content_idea", "add an idea for a post"),
+    ("add_content_idea", "i've got a blog post idea"),
+    ("next_page", "show me more"),
+    ("next_page", "more rows"),
+    ("next_page", "continue please"),
+    ("next_page", "keep going please"),
+    ("other", "what's the weather like"),
+    ("other", "thanks so much"),
+    ("other", "hey"),
+    ("other", "tell me something funny"),
+    ("other", "what's the time"),
+    ("other", "book me a hotel"),
+    ("other", "who is the president"),
+    ("other", "sing a song"),
+    ("other", "good night"),
+    ("other", "qwerty"),
+    ("other", "how far is the moon"),
+    ("other", "order some coffee"),
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=intent_classifier.CLASSIFIER_THRESHOLD, help="confidence threshold")
+    parser.add_argument("--margin", type=float, default=intent_classifier.CLASSIFIER_MARGIN, help="minimum lead over the runner-up label")
+    parser.add_argument("--repeat", type=int, default=20, help="timing runs per prompt")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    # The held-out prompts must be ones the router sends to the fallback
+    for _, prompt in HELD_OUT:
+        assert agent.select_tool(prompt, [])[0] is None, prompt
+
+    start = time.perf_counter()
+    classifier = intent_classifier.IntentClassifier.from_corpus()
+    training = (time.perf_counter() - start) * 1000
+
+    prompts = [prompt for _, prompt in HELD_OUT]
+    predictions = classifier.predict(prompts)
+    answered = correct = wrong_other = 0
+    in_scope = sum(1 for label, _ in HELD_OUT if label != intent_classifier.OTHER_LABEL)
+    misses = []
+    for (label, prompt), prediction in zip(HELD_OUT, predictions):
+        if not intent_classifier.is_confident(prediction, args.threshold, args.margin):
+            continue
+        answered += 1
+        if prediction.label == label:
+            correct += 1
+        else:
+            misses.append((prompt, label, prediction))
+            wrong_other += label == intent_classifier.OTHER_LABEL
+    top1 = sum(prediction.label == label for (label, _), prediction in zip(HELD_OUT, predictions))
+
+    single = []
+    for prompt in prompts:
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            classifier.predict([prompt])
+            single.append((time.perf_counter() - started) * 1000)
+    batched = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        classifier.predict(prompts)
+        batched.append((time.perf_counter() - started) * 1000 / len(prompts))
+
+    print(f"trained on {len(intent_classifier.load_corpus())} examples, {len(classifier.vocabulary)} n-grams, {len(classifier.labels)} labels in {training:.0f} ms")
+    print(f"held-out prompts: {len(HELD_OUT)} ({in_scope} in scope), threshold {args.threshold:g}, margin {args.margin:g}")
+    print(f"top-1 accuracy (no threshold): {top1 / len(HELD_OUT):.1%}")
+    print(f"answered: {answered} ({answered / len(HELD_OUT):.1%}), accuracy of answered: {correct / max(answered, 1):.1%}")
+    print(f"in-scope prompts answered correctly: {correct / in_scope:.1%}; out-of-scope prompts answered: {wrong_other}")
+    print(f"latency per prompt, single: p50 {statistics.median(single):.3f} ms, p99 {percentile(single, 0.99):.3f} ms (budget {intent_classifier.CLASSIFIER_BUDGET_MS:g} ms)")
+    print(f"latency per prompt, batch of {len(prompts)}: p50 {statistics.median(batched):.3f} ms, p99 {percentile(batched, 0.99):.3f} ms")
+    for prompt, label, prediction in misses:
+        print(f"  wrong: {prompt!r} is {label}, predicted {prediction.label} ({prediction.confidence:.2f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark for the per-session context handed to the agent (memory.SessionContext).
+
+Fills one session with chat turns, the last one a paged client list, and
+measures what each prompt pays to find it: the previous copy of the
+history and backwards scan for the latest cursor, against get_context and
+the context's cursor. History lengths above HISTORY_CAPACITY use a store
+with a larger buffer.
+
+Usage:
+    python bench_context.py [--lengths 10,50,500,5000] [--repeat N]
+"""
+import argparse
+import logging
+
+import memory
+from bench_render import best_of
+from results import ListCursor, ToolResult
+
+def legacy_find_cursor(conversation_history, tool_name=None):
+    for message in reversed(conversation_history):
+        if message.role != "assistant" or message.result is None:
+            continue
+        for part in reversed(message.result.parts):
+            if part.cursor is not None and tool_name in (None, part.tool_name):
+                return part.cursor
+    return None
+
+def fill(store, session_id, length):
+    rows = [{"id": i, "name": f"Client {i}", "niche": "Retail"} for i in range(120)]
+    listing = ListCursor("list_clients", {}, rows, 50).page_result(1)
+    for turn in range(length // 2 - 1):
+        store.add_interaction(session_id, "user", f"tell me about client {turn}")
+        store.add_interaction(session_id, "assistant", f"Client {turn}", result=ToolResult("get_client_details", {"id": str(turn)}, rows[turn % len(rows)]))
+    store.add_interaction(session_id, "user", "list clients")
+    store.add_interaction(session_id, "assistant", "Client list", result=listing)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", default="10,50,500,5000", help="comma-separated history lengths")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    print(f"{'messages':>8} {'op':<28} {'history ms':>11} {'context ms':>11} {'speedup':>8}")
+    for length in (int(length) for length in args.lengths.split(",")):
+        store = memory.Memory(history_capacity=max(length, memory.HISTORY_CAPACITY))
+        fill(store, "bench", length)
+        assert legacy_find_cursor(store.get_conversation_history("bench")) is store.get_context("bench").find_cursor()
+
+        cases = [
+            # "show campaigns page 2" with no campaign list in the session makes the scan read every message
+            ("latest cursor", lambda: legacy_find_cursor(store.get_conversation_history("bench")), lambda: store.get_context("bench").find_cursor()),
+            ("cursor of another list", lambda: legacy_find_cursor(store.get_conversation_history("bench"), "list_campaigns"), lambda: store.get_context("bench").find_cursor("list_campaigns")),
+        ]
+        for name, before_case, after_case in cases:
+            before = best_of(lambda: [before_case() for _ in range(100)], args.repeat) / 100
+            after = best_of(lambda: [after_case() for _ in range(100)], args.repeat) / 100
+            print(f"{length:>8} {name:<28} {before:>11.4f} {after:>11.4f} {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for the per-session entity index in memory.py.
+
+Tracks client listings of growing size in one session and then reads the
+five most recently mentioned clients, comparing the entity index (dict by
+ID in recency order) with the previous list of entity dicts, which was
+re-keyed on every tracked result and sorted on every read.
+
+Usage:
+    python bench_entities.py [--sizes 1000,10000,100000] [--repeat N]
+"""
+import argparse
+import logging
+import time
+
+import memory
+from bench_render import best_of
+from results import ToolResult
+
+def legacy_track(entities, records):
+    now = time.time()
+    known = {str(entity["id"]): entity for entity in entities}
+    for record in records:
+        entity = known.get(str(record["id"]))
+        if entity is None:
+            entity = dict(record)
+            entities.append(entity)
+            known[str(record["id"])] = entity
+        else:
+            entity.update(record)
+        entity["last_mentioned"] = now
+
+def legacy_recent(entities, limit):
+    return sorted(entities, key=lambda x: x.get("last_mentioned", 0), reverse=True)[:limit]
+
+def make_clients(count):
+    return [{"id": i, "name": f"Client {i}", "niche": "Retail"} for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated listing sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    store = memory.Memory()
+
+    print(f"{'clients':>8} {'op':<24} {'list ms':>10} {'index ms':>10} {'speedup':>8}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        clients = make_clients(size)
+        # Tracking one record again after the listing: a follow-up like "tell me about client 7"
+        follow_up = clients[size // 2:size // 2 + 1]
+        listing = ToolResult("list_clients", {}, clients)
+        detail = ToolResult("get_client_details", {"id": follow_up[0]["id"]}, follow_up[0])
+
+        entities = []
+        legacy_track(entities, clients)
+        memory.entity_store.pop("bench", None)
+        index = memory.EntityIndex(capacity=size)
+        memory.entity_store["bench"] = {"clients": index}
+        store.track_entities("bench", listing)
+        assert [entity["id"] for entity in index.recent()][::-1] == [entity["id"] for entity in entities]
+
+        cases = [
+            ("track the listing", lambda: legacy_track(entities, clients), lambda: store.track_entities("bench", listing)),
+            ("track one record", lambda: legacy_track(entities, follow_up), lambda: store.track_entities("bench", detail)),
+            ("5 most recent", lambda: legacy_recent(entities, 5), lambda: store.get_recent_entities("bench", "clients", 5)),
+        ]
+        for name, before_case, after_case in cases:
+            before = best_of(before_case, args.repeat)
+            after = best_of(after_case, args.repeat)
+            print(f"{size:>8} {name:<24} {before:>10.3f} {after:>10.3f} {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark for follow-up questions answered from the session's entity graph
+(memory.EntityGraph).
+
+After one `list campaigns` and `list ideas`, asks for the campaigns and the
+content ideas of a series of clients, the way follow-ups such as "campaigns
+for client 7" or "ideas for campaign 12" are run by agent.run_tool. The
+backend is simulated in-process with a fixed latency per request. Reports
+backend requests and time per follow-up, with the graph's listings kept
+fresh (ENTITY_GRAPH_TTL_SECONDS) and with them always stale, which is how
+every follow-up went before the graph.
+
+Usage:
+    python bench_followups.py [--clients 200] [--campaigns 10000] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import time
+
+import httpx
+
+import agent
+import memory
+import tools
+
+def make_backend(args):
+    clients = [{"id": i, "name": f"Client {i}", "niche": "Retail"} for i in range(1, args.clients + 1)]
+    tables = {
+        "clients": clients,
+        "campaigns": [{"id": i, "name": f"Campaign {i}", "status": "active", "client": f"Client {i % args.clients + 1}"} for i in range(1, args.campaigns + 1)],
+        "content-ideas": [{"id": i, "title": f"Idea {i}", "type": "blog", "client": f"Client {i % args.clients + 1}"} for i in range(1, args.campaigns + 1)],
+    }
+    requests = collections.Counter()
+
+    async def handle(request):
+        requests[request.url.path] += 1
+        await asyncio.sleep(args.latency_ms / 1000)
+        table, _, record_id = request.url.path.split("/api/", 1)[1].partition("/")
+        rows = tables[table]
+        if record_id:
+            return httpx.Response(200, json=next(row for row in rows if str(row["id"]) == record_id))
+        client = request.url.params.get("client")
+        if client is not None:
+            rows = [row for row in rows if row["client"].casefold() == client.casefold()]
+        return httpx.Response(200, json=rows, headers={"X-Query-Applied": "true"})
+
+    return httpx.MockTransport(handle), requests
+
+async def run_case(args, requests, ttl):
+    tools.tool_cache.clear()
+    session = memory.SessionContext()
+    session.graph.ttl = ttl
+    for tool_name in ("list_campaigns", "list_content_ideas", "list_clients"):
+        session.update(await agent.run_tool(tool_name, {}, "bench", session), time.time())
+
+    requests.clear()
+    started = time.perf_counter()
+    for client_id in range(1, args.clients + 1):
+        for tool_name, of in (("list_campaigns", "client"), ("list_content_ideas", "campaign")):
+            result = await agent.run_tool(tool_name, {"of": of, "id": str(client_id)}, "bench", session)
+            session.update(result, time.time())
+    elapsed = time.perf_counter() - started
+    return sum(requests.values()), elapsed
+
+async def run(args):
+    transport, requests = make_backend(args)
+    tools._http_client = httpx.AsyncClient(transport=transport)
+    followups = args.clients * 2
+
+    print(f"{args.clients} clients, {args.campaigns} campaigns and content ideas, {args.latency_ms:g} ms per backend request")
+    print(f"{'listings':<12} {'follow-ups':>10} {'requests':>9} {'ms each':>9}")
+    for name, ttl in (("stale", 0.0), ("fresh", memory.ENTITY_GRAPH_TTL_SECONDS)):
+        count, elapsed = await run_case(args, requests, ttl)
+        print(f"{name:<12} {followups:>10} {count:>9} {elapsed * 1000 / followups:>9.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200, help="clients asked about")
+    parser.add_argument("--campaigns", type=int, default=10_000, help="campaigns, and content ideas, in the backend")
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated backend latency per request")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark for the /chat response body of large list results.
+
+Compares the markdown path (render the rows, then encode the ChatResponse
+model) against the JSON response mode: the typed tool result encoded the
+default FastAPI way (jsonable_encoder over the response model), and with
+service.CompactJSONResponse, with and without orjson.
+
+Usage:
+    python bench_json.py [--rows 10000 100000] [--repeat N]
+"""
+import argparse
+import logging
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import main as service
+import render
+from bench_render import best_of, make_clients, make_marketing_data
+from results import ToolResult
+
+def markdown_body(tool_result):
+    response = render.render(tool_result.tool_name, tool_result.result, tool_result.parameters)
+    content = jsonable_encoder(service.ChatResponse(response=response, session_id="bench"))
+    return JSONResponse(content).body
+
+def default_json_body(tool_result):
+    content = jsonable_encoder(service.ChatResponse(
+        response=service.summarize_result(tool_result),
+        session_id="bench",
+        format="json",
+        result=tool_result.to_dict(),
+    ))
+    return JSONResponse(content).body
+
+def json_body(tool_result):
+    return service.CompactJSONResponse({
+        "response": service.summarize_result(tool_result),
+        "session_id": "bench",
+        "format": "json",
+        "result": tool_result.to_dict(),
+    }).body
+
+def stdlib_json_body(tool_result):
+    orjson, service.orjson = service.orjson, None
+    try:
+        return json_body(tool_result)
+    finally:
+        service.orjson = orjson
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="row counts to encode")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    cases = [
+        ("list_clients", make_clients),
+        ("get_marketing_data", make_marketing_data),
+    ]
+
+    encoder = "orjson" if service.orjson is not None else "orjson (not installed)"
+    print(f"{'tool':<20} {'rows':>8} {'markdown ms':>12} {'json default ms':>16} {'json stdlib ms':>15} {encoder + ' ms':>12} {'markdown MB':>12} {'json MB':>8}")
+    for tool_name, make_rows in cases:
+        for rows in args.rows:
+            tool_result = ToolResult(tool_name, {}, make_rows(rows))
+
+            markdown = best_of(lambda: markdown_body(tool_result), args.repeat)
+            default = best_of(lambda: default_json_body(tool_result), args.repeat)
+            stdlib = best_of(lambda: stdlib_json_body(tool_result), args.repeat)
+            fast = best_of(lambda: json_body(tool_result), args.repeat) if service.orjson is not None else float("nan")
+            markdown_size = len(markdown_body(tool_result)) / 1e6
+            json_size = len(json_body(tool_result)) / 1e6
+            print(f"{tool_name:<20} {rows:>8} {markdown:>12.1f} {default:>16.1f} {stdlib:>15.1f} {fast:>12.1f} {markdown_size:>12.2f} {json_size:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark for the conversation store in memory.py.
+
+Fills a store with many active sessions and reports the bytes each session
+costs (measured with tracemalloc, message text excluded since both layouts
+share it) and the time to append a message. "Before" is the previous layout:
+one dict per message with an ISO timestamp string, in a list that is copied
+down to the last 50 messages once it grows past them. "After" is the
+Memory class: slotted Interaction records with float timestamps in a
+fixed-capacity ring buffer.
+
+Usage:
+    python bench_memory.py [--sessions 100000] [--messages 10] [--capacity 50]
+"""
+import argparse
+import gc
+import logging
+import time
+import tracemalloc
+from datetime import datetime
+
+import memory
+
+class LegacyMemory:
+    """
+    The conversation store as it was before the ring buffer.
+    """
+
+    def __init__(self):
+        self.conversations = {}
+
+    def add_interaction(self, session_id, role, content, result=None):
+        if session_id not in self.conversations:
+            self.conversations[session_id] = []
+        self.conversations[session_id].append({
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat(),
+            "result": result,
+        })
+        if len(self.conversations[session_id]) > 50:
+            self.conversations[session_id] = self.conversations[session_id][-50:]
+
+def fill(store, session_ids, messages, contents):
+    for session_id in session_ids:
+        for i in range(messages):
+            store.add_interaction(session_id, "user" if i % 2 == 0 else "assistant", contents[i])
+
+def measure(make_store, session_ids, messages, contents):
+    """
+    Bytes held by a filled store and seconds taken to fill it.
+    """
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = make_store()
+    fill(store, session_ids, messages, contents)
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return size, elapsed
+
+def append_rate(make_store, appends):
+    """
+    Microseconds per append to a single session that is already full.
+    """
+    store = make_store()
+    fill(store, ["full"], 200, ["message"] * 200)
+    started = time.perf_counter()
+    for _ in range(appends):
+        store.add_interaction("full", "user", "message")
+    return (time.perf_counter() - started) * 1e6 / appends
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000, help="active sessions")
+    parser.add_argument("--messages", type=int, default=10, help="messages per session")
+    parser.add_argument("--capacity", type=int, default=memory.HISTORY_CAPACITY, help="ring buffer capacity")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    # Created up front so neither measurement counts the session IDs or message text
+    session_ids = [f"session-{i}" for i in range(args.sessions)]
+    contents = [f"message number {i} of the conversation" for i in range(args.messages)]
+
+    cases = [
+        ("dict + list (before)", LegacyMemory),
+        ("slots + ring buffer", lambda: memory.Memory(args.capacity)),
+    ]
+
+    print(f"{args.sessions} sessions, {args.messages} messages each, capacity {args.capacity}")
+    print(f"{'store':<22} {'total MB':>10} {'bytes/session':>14} {'fill s':>8} {'append us':>10}")
+    results = []
+    for name, make_store in cases:
+        size, elapsed = measure(make_store, session_ids, args.messages, contents)
+        rate = append_rate(make_store, 100_000)
+        results.append(size)
+        print(f"{name:<22} {size / 1e6:>10.1f} {size / args.sessions:>14.0f} {elapsed:>8.2f} {rate:>10.2f}")
+    print(f"saved per session: {(results[0] - results[1]) / args.sessions:.0f} bytes ({1 - results[1] / results[0]:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Throughput benchmark for the conversation store backends in memory.py.
+
+Replays chat turns the way /chat uses the store (read the history, add the
+prompt, add the response with its tool result) across many sessions, and
+reports turns per second for:
+
+  memory                 the default in-process backend
+  sqlite, write-behind   SQLiteMemory with its background flush every MEMORY_FLUSH_MS
+  sqlite, write-through  SQLiteMemory committing after every turn, for reference
+
+With --workers N the write-behind case also runs in N processes sharing one
+database, as uvicorn workers would.
+
+Usage:
+    python bench_memory_backends.py [--sessions 1000] [--turns 20] [--workers 4]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+import memory
+from memory_sqlite import SQLiteMemory
+from results import ToolResult
+
+def make_result(turn):
+    return ToolResult("get_client_details", {"id": str(turn)}, {"id": turn, "name": f"Client {turn}", "niche": "Retail"})
+
+async def replay(store, session_ids, turns, write_through):
+    started = time.perf_counter()
+    for turn in range(turns):
+        for session_id in session_ids:
+            store.get_conversation_history(session_id)
+            store.add_interaction(session_id, "user", f"tell me about client {turn}")
+            store.add_interaction(session_id, "assistant", f"Client {turn} details", result=make_result(turn))
+            if write_through:
+                await store.flush()
+            else:
+                # Let the background flusher run, as it would between requests
+                await asyncio.sleep(0)
+    if isinstance(store, SQLiteMemory):
+        # Includes committing whatever is still queued
+        await store.stop_background_tasks()
+    return time.perf_counter() - started
+
+async def run_case(backend, path, session_ids, turns, write_through=False):
+    store = memory.Memory() if backend == "memory" else SQLiteMemory(path)
+    if isinstance(store, SQLiteMemory) and not write_through:
+        store.start_background_tasks()
+    return await replay(store, session_ids, turns, write_through)
+
+def worker(path, worker_id, sessions, turns, results):
+    logging.disable(logging.CRITICAL)
+    session_ids = [f"worker-{worker_id}-{i}" for i in range(sessions)]
+    results.put(asyncio.run(run_case("sqlite", path, session_ids, turns)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000, help="sessions per process")
+    parser.add_argument("--turns", type=int, default=20, help="chat turns per session")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes sharing the database")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    session_ids = [f"session-{i}" for i in range(args.sessions)]
+    total = args.sessions * args.turns
+
+    # Write-through commits every turn, so it gets fewer of them
+    through_ids = session_ids[:max(1, args.sessions // 10)]
+    cases = [
+        ("memory", lambda: run_case("memory", None, session_ids, args.turns), total),
+        ("sqlite, write-behind", lambda: run_case("sqlite", os.path.join(directory, "behind.db"), session_ids, args.turns), total),
+        ("sqlite, write-through", lambda: run_case("sqlite", os.path.join(directory, "through.db"), through_ids, args.turns, True), len(through_ids) * args.turns),
+    ]
+
+    print(f"{args.sessions} sessions x {args.turns} turns, flush every {SQLiteMemory(os.path.join(directory, 'probe.db')).flush_interval * 1000:g} ms")
+    print(f"{'backend':<32} {'turns':>8} {'seconds':>8} {'turns/s':>10}")
+    for name, case, turns in cases:
+        elapsed = asyncio.run(case())
+        print(f"{name:<32} {turns:>8} {elapsed:>8.2f} {turns / elapsed:>10.0f}")
+
+    if args.workers > 1:
+        path = os.path.join(directory, "shared.db")
+        SQLiteMemory(path).close()
+        results = multiprocessing.Queue()
+        started = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=worker, args=(path, worker_id, args.sessions, args.turns, results))
+            for worker_id in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        slowest = max(results.get() for _ in processes)
+        turns = total * args.workers
+        stored = SQLiteMemory(path).get_all_sessions()
+        assert len(stored) == args.sessions * args.workers, len(stored)
+        print(f"{f'sqlite, {args.workers} workers':<32} {turns:>8} {slowest:>8.2f} {turns / slowest:>10.0f}  (wall {elapsed:.2f} s incl. startup)")
+
+if __name__ == "__main__":
+    main()
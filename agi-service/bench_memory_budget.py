@@ -0,0 +1,63 @@
+"""
+Benchmark for the global memory budget in memory.py.
+
+Replays a burst of one-turn sessions, as /chat creates for every request
+without a session_id, and reports the memory the store holds afterwards
+(measured with tracemalloc), the sessions it keeps, the evictions, its own
+estimate of its size, and turns per second: without a budget, as before,
+and with --budget-mb.
+
+Usage:
+    python bench_memory_budget.py [--sessions 100000] [--budget-mb 32]
+"""
+import argparse
+import gc
+import logging
+import time
+import tracemalloc
+import uuid
+
+import memory
+from results import ToolResult
+
+def burst(store, session_ids, results):
+    for session_id, result in zip(session_ids, results):
+        store.add_interaction(session_id, "user", "tell me about client 7")
+        store.add_interaction(session_id, "assistant", "## Client 7\n- Niche: Retail", result=result)
+
+def run_case(budget, session_ids, results):
+    memory.entity_store.clear()
+    gc.collect()
+    tracemalloc.start()
+    store = memory.Memory()
+    store.memory_budget = budget
+    started = time.perf_counter()
+    burst(store, session_ids, results)
+    elapsed = time.perf_counter() - started
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, held, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000, help="new sessions in the burst")
+    parser.add_argument("--budget-mb", type=float, default=32, help="memory budget of the second run")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    session_ids = [str(uuid.uuid4()) for _ in range(args.sessions)]
+    # One fetched record per session, as a detail lookup returns; built inside the
+    # measured run so the store is charged for the results it keeps alive
+    def make_results():
+        return (ToolResult("get_client_details", {"id": str(i)}, {"id": i, "name": f"Client {i}", "niche": "Retail", "contact_email": f"client{i}@example.com"}) for i in range(args.sessions))
+
+    print(f"burst of {args.sessions} one-turn sessions")
+    print(f"{'budget':<12} {'held MB':>8} {'estimate MB':>12} {'sessions':>9} {'evictions':>10} {'turns/s':>9}")
+    for name, budget in (("none", 0), (f"{args.budget_mb:g} MB", int(args.budget_mb * 1024 * 1024))):
+        store, held, elapsed = run_case(budget, session_ids, make_results())
+        stats = store.stats()
+        print(f"{name:<12} {held / 1e6:>8.1f} {stats['bytes'] / 1e6:>12.1f} {stats['sessions']:>9} {stats['evictions']:>10} {args.sessions / elapsed:>9.0f}")
+        del store
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark for resolving client names with the name index.
+
+Compares name_index.NameIndex lookups (exact, prefix and misspelled names)
+against the previous approach of scanning every remembered client with
+`client["name"].lower() in prompt.lower()`.
+
+Usage:
+    python bench_names.py [--names 1000 100000] [--repeat N]
+"""
+import argparse
+import random
+import time
+
+from name_index import NameIndex
+
+SYLLABLES = [consonant + vowel for consonant in "bcdfghklmnprstvz" for vowel in "aeiou"]
+SUFFIXES = ["Inc.", "LLC", "Labs", "Group", "Media", "Partners", "Studio", ""]
+
+def make_names(count):
+    """
+    Unique, made-up company names such as "Kovami Tesu Labs".
+    """
+    rng = random.Random(7)
+    names = set()
+    while len(names) < count:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize() for _ in range(2)]
+        names.add(" ".join(words + [rng.choice(SUFFIXES)]).strip())
+    return sorted(names)
+
+def misspell(name):
+    # Drop one letter from the first word
+    return name[:2] + name[3:]
+
+def legacy_find(clients, prompt):
+    """
+    The previous name reference check in agent.process_prompt.
+    """
+    for client in clients:
+        if client["name"].lower() in prompt.lower():
+            return client["id"]
+    return None
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, nargs="+", default=[1_000, 100_000], help="index sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="timing runs per lookup (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'names':>8} {'lookup':<10} {'scan us':>10} {'index us':>10} {'build ms':>10}")
+    for count in args.names:
+        names = make_names(count)
+        clients = [{"id": i, "name": name} for i, name in enumerate(names)]
+
+        index = NameIndex()
+        start = time.perf_counter()
+        index.update(clients)
+        build = (time.perf_counter() - start) * 1000
+
+        target = names[count // 2]
+        exact_id = str(count // 2)
+        assert index.resolve(target).id == exact_id
+        assert index.resolve(misspell(target)).id == exact_id
+
+        prompt = f"what is the niche of {target}?"
+        scan = best_of(lambda: legacy_find(clients, prompt), args.repeat)
+        lookups = [
+            ("exact", lambda: index.resolve(target)),
+            ("prefix", lambda: index.matches(target.split()[0])),
+            ("misspelled", lambda: index.resolve(misspell(target))),
+        ]
+        for label, lookup in lookups:
+            print(f"{count:>8} {label:<10} {scan:>10.1f} {best_of(lookup, args.repeat):>10.1f} {build:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark for rendering large list results.
+
+Compares the render module (pages of rows joined once) against the previous
+approach in agent.execute_tool of growing the response with `+=` inside the
+loop, and checks both produce byte-identical markdown. The speedup is
+renderer against renderer; the "old log ms" column is the separate cost of
+the eager `f"Tool execution result: {result}"` log line that used to format
+the whole result on every call.
+
+Usage:
+    python bench_render.py [--rows 10000 100000] [--repeat N]
+"""
+import argparse
+import time
+
+import render
+
+def make_clients(count):
+    return [
+        {
+            "id": i,
+            "name": f"Client {i}",
+            "niche": "fintech" if i % 3 else None,
+            "contact_person": f"Person {i}" if i % 2 else None,
+            "contact_email": f"client{i}@example.com",
+        }
+        for i in range(1, count + 1)
+    ]
+
+def make_marketing_data(count):
+    return [
+        {
+            "month": f"2024-{i % 12 + 1:02d}",
+            "revenue": 1000 + i,
+            "spend": 400 + i % 100,
+            "roi": round((1000 + i) / (400 + i % 100), 2),
+            "client": f"Client {i % 500}",
+        }
+        for i in range(count)
+    ]
+
+def legacy_list_clients(result):
+    """
+    The list_clients branch of agent.execute_tool before the render module.
+    """
+    if not result:
+        response = "No clients found."
+    else:
+        response = "### Client List\n"
+        for i, client in enumerate(result, 1):
+            response += f"{i}. **{client['name']}**\n"
+            response += f"   - ID: {client['id']}\n"
+            response += f"   - Niche: {client['niche'] or 'Not specified'}\n"
+            if client.get('contact_person'):
+                response += f"   - Contact: {client['contact_person']}\n"
+            if client.get('contact_email'):
+                response += f"   - Email: {client['contact_email']}\n"
+
+        response += "\n---\n\n**What would you like to do next?**\n"
+        response += "- Add a new client\n"
+        response += "- Get details about a specific client\n"
+        response += "- Update a client's information\n"
+        response += "- List campaigns\n"
+
+    return response
+
+def legacy_marketing_data(result):
+    """
+    The get_marketing_data branch of agent.execute_tool before the render module.
+    """
+    if not result:
+        response = "No marketing data available."
+    else:
+        response = "### Marketing Performance Data\n\n"
+        response += "| Month | Revenue | Spend | ROI | Client |\n"
+        response += "|-------|---------|-------|-----|--------|\n"
+
+        for data in result:
+            response += f"| {data['month']} | ${data['revenue']} | ${data['spend']} | {data['roi']}x | {data['client']} |\n"
+
+        response += "\n---\n\n**What would you like to do next?**\n"
+        response += "- List campaigns\n"
+        response += "- List content ideas\n"
+        response += "- List clients\n"
+
+    return response
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="row counts to render")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (best is reported)")
+    args = parser.parse_args()
+
+    cases = [
+        ("list_clients", make_clients, legacy_list_clients),
+        ("get_marketing_data", make_marketing_data, legacy_marketing_data),
+    ]
+
+    print(f"{'tool':<20} {'rows':>8} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'old log ms':>11} {'output MB':>10}")
+    for tool_name, make_rows, legacy in cases:
+        for rows in args.rows:
+            result = make_rows(rows)
+            expected = legacy(result)
+            assert render.render(tool_name, result, {}) == expected, f"{tool_name} output differs"
+
+            before = best_of(lambda: legacy(result), args.repeat)
+            after = best_of(lambda: render.render(tool_name, result, {}), args.repeat)
+            log = best_of(lambda: f"Tool execution result: {result}", args.repeat)
+            size = len(expected.encode()) / 1e6
+            print(f"{tool_name:<20} {rows:>8} {before:>10.1f} {after:>10.1f} {before / after:>7.2f}x {log:>11.1f} {size:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark for intent routing in agent.select_tool.
+
+Compares the compiled, keyword-indexed router against the previous approach
+of trying every raw pattern string in REGEX_PATTERNS with re.match, one by one.
+
+Usage:
+    python bench_routing.py [--repeat N]
+"""
+import argparse
+import logging
+import re
+import statistics
+import time
+
+import agent
+
+# Prompts taken from real sessions, including misses that fall through every pattern
+PROMPTS = [
+    "list clients",
+    "list all clients",
+    "show campaigns",
+    "list content ideas",
+    "show marketing data",
+    "get performance",
+    "help",
+    "what can you do",
+    "tell me about client 12",
+    "tell me about client with id 42",
+    "give me details on campaign 7",
+    "tell me about idea 3",
+    "tell me about clients 3, 7 and 12",
+    "show campaigns 4-9",
+    "add client named Acme Inc with niche fintech",
+    "add a new client named Globex with niche retail with email ops@globex.com",
+    "update client with id 5 set niche to healthcare",
+    "delete client with id 9",
+    "add campaign named Summer Promotion for client Acme Inc",
+    "add idea titled 10 Ways to Improve Your Marketing with type blog for client Acme",
+    "list clients with niche fintech limit 10",
+    "list campaigns with status active",
+    "list ideas for client Acme",
+    "next page",
+    "show clients page 3",
+    "clients page 2",
+    "campaigns for client 3",
+    "revenue for Acme in Q2",
+    "top 5 clients by revenue",
+    "what's the weather today?",
+    "thanks!",
+    "can you summarize last week's numbers",
+]
+
+def legacy_select_tool(prompt):
+    """
+    The previous routing strategy: every pattern, in order, via re.match on the
+    raw pattern string (relying on the re module's internal cache).
+    """
+    for name, _, _, handler in agent.INTENTS:
+        match = re.match(agent.REGEX_PATTERNS[name], prompt)
+        if match:
+            selection = handler(match, prompt)
+            if selection:
+                return selection
+    return None, {}
+
+# Leading words and intents combined into the prompts both strategies must
+# route the same way, beyond the timed ones above
+LEADS = ["", "show", "list", "get", "go to", "show me", "list all", "give", "what", "tell me about", "all", "add", "compare", "top 5", "next"]
+SUBJECTS = ["", "clients", "campaigns", "content ideas", "ideas", "all clients"]
+INTENT_TAILS = [
+    "page 2", "page 3 of clients", "page 2 of content ideas", "next page", "last page of campaigns",
+    "campaigns for client 3", "ideas of campaign 4", "clients", "campaigns", "client 7", "clients 3-5",
+    "data", "revenue for Acme", "roi by client", "revenue trend", "q1 vs q2", "help",
+]
+
+def check_prompts():
+    for lead in LEADS:
+        for subject in SUBJECTS:
+            for tail in INTENT_TAILS:
+                prompt = " ".join(word for word in (lead, subject, tail) if word)
+                yield prompt
+                yield prompt.upper()
+
+def measure(select, repeat):
+    """
+    Returns per-prompt latencies in microseconds (best of `repeat` batches).
+    """
+    latencies = []
+    for prompt in PROMPTS:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(100):
+                select(prompt)
+            best = min(best, (time.perf_counter() - start) / 100)
+        latencies.append(best * 1e6)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="timing batches per prompt")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    # Both strategies must agree before their timings mean anything
+    for prompt in [*PROMPTS, *check_prompts()]:
+        assert legacy_select_tool(prompt) == agent.select_tool(prompt, None), prompt
+
+    before = measure(legacy_select_tool, args.repeat)
+    after = measure(lambda prompt: agent.select_tool(prompt, None), args.repeat)
+
+    print(f"{'prompt':<60} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for prompt, old, new in zip(PROMPTS, before, after):
+        print(f"{prompt[:60]:<60} {old:>10.2f} {new:>10.2f} {old / new:>7.1f}x")
+
+    print()
+    print(f"mean   before {statistics.mean(before):.2f} us   after {statistics.mean(after):.2f} us")
+    print(f"median before {statistics.median(before):.2f} us   after {statistics.median(after):.2f} us")
+    print(f"max    before {max(before):.2f} us   after {max(after):.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark for memory snapshots (memory_snapshot.py).
+
+Fills the in-memory backend with active sessions, then for each compression
+setting reports the snapshot size, the time taken to copy the state and
+the longest the event loop is held while doing so, the total time to write the snapshot, the time a
+restarted service takes to restore it (ready to serve), and the cost of
+loading a restored session on its first use.
+
+Usage:
+    python bench_snapshot.py [--sessions 100000] [--messages 10]
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import tempfile
+import time
+
+import memory
+from memory_snapshot import COMPRESSIONS, MemorySnapshots
+from results import ToolResult
+
+def fill(store, sessions, messages):
+    for i in range(sessions):
+        session_id = f"session-{i}"
+        for turn in range(messages // 2):
+            record = {"id": turn, "name": f"Client {turn}", "niche": "Retail", "contact_email": f"client{turn}@example.com"}
+            store.add_interaction(session_id, "user", f"tell me about client {turn}")
+            store.add_interaction(session_id, "assistant", f"## Client {turn}\n- Niche: Retail", result=ToolResult("get_client_details", {"id": str(turn)}, record))
+
+async def run(args):
+    # Without a memory budget, so every session is kept and snapshotted
+    store = memory.Memory()
+    store.memory_budget = 0
+    fill(store, args.sessions, args.messages)
+    entities = dict(memory.entity_store)
+    path = os.path.join(tempfile.mkdtemp(), "memory.snapshot")
+    # Freeze the filled store so collections of it don't land in the timings
+    gc.collect()
+    gc.freeze()
+
+    print(f"{args.sessions} sessions, {args.messages} messages each")
+    print(f"{'compression':<12} {'MB':>8} {'copy ms':>9} {'pause ms':>9} {'save ms':>9} {'restore ms':>11} {'first use us':>13} {'resave ms':>10}")
+    for compression in COMPRESSIONS:
+        memory.entity_store.clear()
+        memory.entity_store.update(entities)
+        saved = await MemorySnapshots(store, path, compression=compression).save()
+
+        memory.entity_store.clear()
+        restored = memory.Memory()
+        restored.memory_budget = 0
+        snapshots = MemorySnapshots(restored, path, compression=compression)
+        started = time.perf_counter()
+        count = snapshots.restore()
+        restore = (time.perf_counter() - started) * 1000
+        assert count == args.sessions
+
+        # A restarted service snapshots again before most sessions come back
+        resaved = await snapshots.save()
+
+        sample = [f"session-{i}" for i in range(0, args.sessions, max(1, args.sessions // 1000))]
+        started = time.perf_counter()
+        for session_id in sample:
+            restored.get_conversation_history(session_id)
+        first_use = (time.perf_counter() - started) * 1e6 / len(sample)
+        assert len(restored.get_conversation_history("session-0")) == len(store.get_conversation_history("session-0"))
+
+        print(f"{compression:<12} {saved['bytes'] / 1e6:>8.2f} {saved['capture_ms']:>9.1f} {saved['longest_pause_ms']:>9.1f} {saved['duration_ms']:>9.1f} {restore:>11.1f} {first_use:>13.1f} {resaved['duration_ms']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100_000, help="active sessions")
+    parser.add_argument("--messages", type=int, default=10, help="messages per session")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str]
+ToolFunction = Callable[[Optional[Dict[str, Any]]], Awaitable[Any]]
+
+class TTLCache:
+    """
+    Size-bounded LRU cache with a per-entry time to live.
+
+    Entries are keyed by tool name + parameters so that invalidating a tool
+    only touches the keys that belong to it.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # Structure: {(tool_name, params_json): (expires_at, value)}
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        # Structure: {tool_name: {keys}}
+        self._keys_by_tool: Dict[str, Set[CacheKey]] = {}
+        # Bumped on every invalidation so in-flight reads can't store stale data
+        self._generations: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(tool_name: str, params: Optional[Dict[str, Any]]) -> CacheKey:
+        """
+        Build a stable cache key from a tool name and its parameters.
+        """
+        return tool_name, json.dumps(params or {}, sort_keys=True, default=str)
+
+    def generation(self, tool_name: str) -> int:
+        """
+        Current invalidation generation of a tool.
+        """
+        return self._generations.get(tool_name, 0)
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        """
+        Look up a key. Returns a (found, value) tuple.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(self, key: CacheKey, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None) -> bool:
+        """
+        Store a value. When `generation` is given and the tool has been
+        invalidated since it was read, the value is dropped as stale.
+        Returns True if the value was stored.
+        """
+        tool_name = key[0]
+        if generation is not None and generation != self.generation(tool_name):
+            return False
+
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return False
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        self._keys_by_tool.setdefault(tool_name, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+        return True
+
+    def invalidate(self, tool_names: Iterable[str]) -> int:
+        """
+        Drop every entry belonging to the given tools.
+        Returns the number of entries removed.
+        """
+        removed = 0
+        for tool_name in tool_names:
+            self._generations[tool_name] = self.generation(tool_name) + 1
+            for key in list(self._keys_by_tool.get(tool_name, ())):
+                self._remove(key)
+                removed += 1
+
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        """
+        Drop all entries. Counters are kept.
+        """
+        for tool_name in self._keys_by_tool:
+            self._generations[tool_name] = self.generation(tool_name) + 1
+        self._entries.clear()
+        self._keys_by_tool.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters used to tune TTLs and the size bound.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_tool.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_tool[key[0]]
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls so they share one outstanding
+    request. Every waiter receives the same result or the same exception.
+    """
+
+    def __init__(self):
+        # Structure: {(tool_name, params_json): task}
+        self._inflight: Dict[CacheKey, "asyncio.Future[Any]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: CacheKey, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `func` unless a call with the same key is already in flight,
+        in which case wait for that call instead.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.calls += 1
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        # Shield so a cancelled caller doesn't cancel the request for the other waiters
+        return await asyncio.shield(task)
+
+    def forget(self, tool_names: Iterable[str]) -> None:
+        """
+        Stop handing out in-flight calls of the given tools, so callers
+        arriving after a write start a fresh request.
+        """
+        tool_names = set(tool_names)
+        for key in [key for key in self._inflight if key[0] in tool_names]:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters showing how many calls were served by a shared request.
+        """
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
+
+    def _finish(self, key: CacheKey, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+def cached(tool_name: str, func: ToolFunction, cache: TTLCache, ttl: Optional[float] = None) -> ToolFunction:
+    """
+    Wrap a read tool so results are served from `cache` while fresh.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+    async def wrapper(params=None):
+        key = cache.make_key(tool_name, params)
+        found, value = cache.get(key)
+        if found:
+            logger.debug(f"Cache hit for {tool_name}")
+            return value
+
+        generation = cache.generation(tool_name)
+        value = await func(params)
+        cache.set(key, value, ttl, generation=generation)
+        return value
+
+    wrapper.__name__ = getattr(func, "__name__", tool_name)
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def coalesced(tool_name: str, func: ToolFunction, flight: SingleFlight) -> ToolFunction:
+    """
+    Wrap a read tool so concurrent identical calls share one backend request.
+    """
+    async def wrapper(params=None):
+        key = TTLCache.make_key(tool_name, params)
+        return await flight.do(key, lambda: func(dict(params) if params else params))
+
+    wrapper.__name__ = getattr(func, "__name__", tool_name)
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+def invalidating(func: ToolFunction, cache: TTLCache, tool_names: Iterable[str], flight: Optional[SingleFlight] = None) -> ToolFunction:
+    """
+    Wrap a write tool so the given read tools are invalidated once it succeeds.
+    """
+    tool_names = tuple(tool_names)
+
+    async def wrapper(params=None):
+        result = await func(params)
+        if flight is not None:
+            flight.forget(tool_names)
+        removed = cache.invalidate(tool_names)
+        logger.debug(f"Invalidated {removed} cache entries for {', '.join(tool_names)}")
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
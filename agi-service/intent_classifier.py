@@ -0,0 +1,201 @@
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bundled training examples, "<label><TAB><prompt>" per line
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.txt")
+
+# Minimum probability of the best label for a prediction to be used
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", "0.4"))
+
+# Minimum lead of the best label's probability over the runner-up's
+CLASSIFIER_MARGIN = float(os.getenv("CLASSIFIER_MARGIN", "0.2"))
+
+# Predictions that took longer than this are discarded once they finish. A
+# post-hoc cutoff, not a timeout: one prediction's cost is bounded by
+# MAX_PROMPT_CHARS, and this keeps a classifier that has grown slow (a much
+# larger corpus, a loaded host) from being relied on.
+CLASSIFIER_BUDGET_MS = float(os.getenv("CLASSIFIER_BUDGET_MS", "5"))
+
+# Label for prompts the agent can't help with; never returned as a prediction
+OTHER_LABEL = "other"
+
+# Character n-gram sizes, and how much of a prompt is looked at
+NGRAM_SIZES = (2, 3, 4)
+MAX_PROMPT_CHARS = 200
+
+# Training: full-batch gradient descent on the softmax cross-entropy
+TRAINING_EPOCHS = 150
+LEARNING_RATE = 4.0
+L2_PENALTY = 1e-4
+
+_NON_WORD = re.compile(r"[^\w?]+")
+_DIGITS = re.compile(r"\d+")
+
+class Prediction(NamedTuple):
+    label: str
+    confidence: float
+    # Lead of the confidence over the runner-up label's probability
+    margin: float
+
+def is_confident(prediction: Prediction, threshold: float = CLASSIFIER_THRESHOLD, margin: float = CLASSIFIER_MARGIN) -> bool:
+    """
+    Whether a prediction is an in-scope label, likely enough and clear of the runner-up.
+    """
+    return prediction.label != OTHER_LABEL and prediction.confidence >= threshold and prediction.margin >= margin
+
+def ngrams(prompt: str) -> Counter:
+    """
+    Character n-grams of each word, padded with spaces so word starts and
+    ends are features of their own. Digits are folded so IDs look alike.
+    """
+    text = _DIGITS.sub("0", _NON_WORD.sub(" ", prompt[:MAX_PROMPT_CHARS].casefold())).strip()
+    counts = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            counts.update(padded[i:i + size] for i in range(len(padded) - size + 1))
+    return counts
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Tuple[str, str]]:
+    """
+    (label, prompt) pairs from a corpus file; blank lines and # comments are skipped.
+    """
+    examples = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, prompt = line.split("\t", 1)
+            examples.append((label.strip(), prompt.strip()))
+    return examples
+
+class IntentClassifier:
+    """
+    Linear intent classifier over TF-IDF weighted character n-grams.
+
+    Small enough to train at startup from the bundled corpus (no network, no
+    GPU). Prompts are scored in batches: their features form one sparse
+    matrix that is multiplied with the weights in a single NumPy pass.
+    """
+
+    def __init__(self, examples: Sequence[Tuple[str, str]]):
+        self.labels: List[str] = sorted({label for label, _ in examples})
+        label_ids = {label: i for i, label in enumerate(self.labels)}
+
+        counts = [ngrams(prompt) for _, prompt in examples]
+        document_frequency = Counter(gram for grams in counts for gram in grams)
+        # Structure: {ngram: feature column}
+        self.vocabulary: Dict[str, int] = {gram: i for i, gram in enumerate(sorted(document_frequency))}
+        self.idf = np.array(
+            [math.log((1 + len(examples)) / (1 + document_frequency[gram])) + 1 for gram in sorted(document_frequency)],
+            dtype=np.float64,
+        )
+
+        features = np.zeros((len(examples), len(self.vocabulary)))
+        indices, values, offsets = self._sparse(counts)
+        for row in range(len(examples)):
+            features[row, indices[offsets[row]:offsets[row + 1]]] = values[offsets[row]:offsets[row + 1]]
+        targets = np.zeros((len(examples), len(self.labels)))
+        targets[np.arange(len(examples)), [label_ids[label] for label, _ in examples]] = 1.0
+
+        self.weights = np.zeros((len(self.vocabulary), len(self.labels)))
+        self.bias = np.zeros(len(self.labels))
+        for _ in range(TRAINING_EPOCHS):
+            gradient = (_softmax(features @ self.weights + self.bias) - targets) / len(examples)
+            self.weights -= LEARNING_RATE * (features.T @ gradient + L2_PENALTY * self.weights)
+            self.bias -= LEARNING_RATE * gradient.sum(axis=0)
+
+    @classmethod
+    def from_corpus(cls, path: str = CORPUS_PATH) -> "IntentClassifier":
+        start = time.perf_counter()
+        classifier = cls(load_corpus(path))
+        logger.info(f"Trained intent classifier on {path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return classifier
+
+    def _sparse(self, counts: Iterable[Counter]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        L2-normalized TF-IDF rows in compressed sparse row form: feature
+        columns, values, and where each row starts.
+        """
+        indices: List[int] = []
+        values: List[float] = []
+        offsets = [0]
+        for grams in counts:
+            columns = [self.vocabulary[gram] for gram in grams if gram in self.vocabulary]
+            weights = np.array([1 + math.log(grams[gram]) for gram in grams if gram in self.vocabulary]) * self.idf[columns]
+            norm = np.linalg.norm(weights)
+            indices.extend(columns)
+            values.extend((weights / norm).tolist() if norm else [])
+            offsets.append(len(indices))
+        return np.array(indices, dtype=np.int64), np.array(values), np.array(offsets, dtype=np.int64)
+
+    def probabilities(self, prompts: Sequence[str]) -> np.ndarray:
+        """
+        Label probabilities for a batch of prompts, one row per prompt.
+        """
+        indices, values, offsets = self._sparse(ngrams(prompt) for prompt in prompts)
+        scores = np.tile(self.bias, (len(prompts), 1))
+        if len(indices):
+            # Sum the weighted weight rows of each prompt's features in one pass;
+            # prompts without known n-grams keep just the bias
+            contributions = self.weights[indices] * values[:, None]
+            nonempty = np.flatnonzero(np.diff(offsets))
+            scores[nonempty] += np.add.reduceat(contributions, offsets[nonempty], axis=0)
+        return _softmax(scores)
+
+    def predict(self, prompts: Sequence[str]) -> List[Prediction]:
+        """
+        The most likely label of each prompt, its probability and its lead
+        over the runner-up.
+        """
+        probabilities = self.probabilities(prompts)
+        best = probabilities.argmax(axis=1)
+        top_two = np.sort(probabilities, axis=1)[:, -2:] if len(self.labels) > 1 else np.zeros((len(prompts), 2))
+        return [
+            Prediction(self.labels[label], float(probabilities[row, label]), float(top_two[row, 1] - top_two[row, 0]))
+            for row, label in enumerate(best)
+        ]
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    exponentials = np.exp(scores - scores.max(axis=1, keepdims=True))
+    return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+_classifier: Optional[IntentClassifier] = None
+
+def get_classifier() -> IntentClassifier:
+    """
+    The classifier trained from the bundled corpus, trained on first use.
+    """
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier.from_corpus()
+    return _classifier
+
+def classify(prompt: str) -> Optional[Prediction]:
+    """
+    The intent label of a prompt the regex router didn't match, or None if
+    the classifier isn't confident (see is_confident), thinks it is out of
+    scope, or took longer than its latency budget (checked afterwards).
+    """
+    classifier = get_classifier()
+    start = time.perf_counter()
+    prediction = classifier.predict([prompt])[0]
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if elapsed > CLASSIFIER_BUDGET_MS:
+        logger.warning(f"Intent classifier took {elapsed:.1f} ms, over its {CLASSIFIER_BUDGET_MS:g} ms budget; ignoring its prediction")
+        return None
+    logger.info(f"Intent classifier: {prediction.label} ({prediction.confidence:.2f}, lead {prediction.margin:.2f}) in {elapsed:.2f} ms")
+    if not is_confident(prediction):
+        return None
+    return prediction
@@ -1,15 +1,25 @@
+import json
 import logging
-import os
 import uuid
-from fastapi import FastAPI, HTTPException, Depends, Header, BackgroundTasks, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 from datetime import datetime
 
 import agent
+import intent_classifier
+import tools
 from memory import memory
-from agent import process_prompt
+from memory_snapshot import MemorySnapshots
+from agent import process_prompt, process_prompt_result, stream_prompt, summarize_result
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib encoder is used without it
+    orjson = None
 
 # Configure logging
 logging.basicConfig(
@@ -19,10 +29,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open shared resources on startup and release them on shutdown.
+    """
+    await tools.open_http_client()
+    # Train the fallback intent classifier now rather than on the first prompt that needs it
+    intent_classifier.get_classifier()
+    memory.start_background_tasks()
+    # Pick up the conversations of the previous run when snapshots are enabled
+    snapshots.start()
+    try:
+        yield
+    finally:
+        await snapshots.stop()
+        await memory.stop_background_tasks()
+        await tools.close_http_client()
+
+snapshots = MemorySnapshots(memory)
+
 app = FastAPI(
     title="Agi Agent Service",
     description="AI-powered agent that serves as a central command interface",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -37,11 +68,44 @@ app.add_middleware(
 class ChatRequest(BaseModel):
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     prompt: str
+    # Per-request options, e.g. {"page_size": 20} for the rows shown per page of a list,
+    # or {"response_format": "json"} for the raw tool result instead of markdown
     context: Optional[Dict[str, Any]] = None
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
+    # Set in the JSON response mode: "json", and the typed tool result
+    format: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+
+# Media type that asks /chat for the JSON response mode
+JSON_RESULT_MEDIA_TYPE = "application/vnd.agi.result+json"
+
+class CompactJSONResponse(JSONResponse):
+    """
+    JSON response encoded without whitespace, with orjson when it is
+    installed. Skips FastAPI's per-field encoding, which dominates the cost
+    of returning large lists.
+    """
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=str)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+def wants_json_result(context: Optional[Dict[str, Any]], accept: Optional[str]) -> bool:
+    """
+    Whether a chat request asked for the typed tool result rather than
+    markdown: `{"response_format": "json"}` in the context, or an Accept
+    header naming the result media type or only application/json.
+    """
+    if context and "response_format" in context:
+        return str(context["response_format"]).lower() == "json"
+    if not accept:
+        return False
+    media_types = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    # "application/json, text/plain, */*" (the axios default) still gets markdown
+    return JSON_RESULT_MEDIA_TYPE in media_types or media_types == {"application/json"}
 
 class SessionRequest(BaseModel):
     session_id: str
@@ -55,37 +119,103 @@ async def get_or_create_session_id(session_id: Optional[str] = Header(None, alia
     return session_id
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, accept: Optional[str] = Header(None)):
     """
     Process a chat request and return a response.
+
+    In the JSON response mode the markdown is not rendered at all; `result`
+    carries the tool result and `response` a one-line summary of it.
     """
     # Use provided session_id or generate a new one
     active_session_id = request.session_id
     
     logger.info(f"Received prompt for session {active_session_id}: {request.prompt}")
     
-    # Get conversation history
-    conversation_history = memory.get_conversation_history(active_session_id)
-    
     # Add user message to history
     memory.add_interaction(active_session_id, "user", request.prompt)
     
+    # What the agent needs from earlier turns, kept up to date by the memory
+    session = memory.get_context(active_session_id)
+    
+    if wants_json_result(request.context, accept):
+        tool_result = await process_prompt_result(request.prompt, active_session_id, session, request.context)
+        response = summarize_result(tool_result)
+        memory.add_interaction(active_session_id, "assistant", response, result=tool_result)
+        
+        logger.info(f"Sending JSON result for session {active_session_id}: {response}")
+        
+        return CompactJSONResponse({
+            "response": response,
+            "session_id": active_session_id,
+            "format": "json",
+            "result": tool_result.to_dict(),
+        })
+    
     # Generate response using the agent
-    response = await process_prompt(request.prompt, active_session_id, conversation_history)
+    response, tool_result = await process_prompt(request.prompt, active_session_id, session, request.context)
     
-    # Add agent response to history
-    memory.add_interaction(active_session_id, "assistant", response)
+    # Add agent response to history, with the structured result for entity tracking
+    memory.add_interaction(active_session_id, "assistant", response, result=tool_result)
     
-    logger.info(f"Sending response for session {active_session_id}: {response}")
+    logger.info(f"Sending response for session {active_session_id}: {len(response)} characters")
     
     return ChatResponse(response=response, session_id=active_session_id)
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format one Server-Sent Event. Data is JSON so multi-line markdown
+    survives the line-based framing.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Process a chat request and stream the response as Server-Sent Events.
+
+    Emits a `start` event with the session ID, one `chunk` event per rendered
+    piece of markdown (header, pages of rows, footer) and a `done` event.
+    The response is recorded in the conversation once the stream ends; if
+    the client goes away first, as much of it as was rendered.
+    """
+    active_session_id = request.session_id
+    
+    logger.info(f"Received streaming prompt for session {active_session_id}: {request.prompt}")
+    
+    memory.add_interaction(active_session_id, "user", request.prompt)
+    session = memory.get_context(active_session_id)
+    
+    async def events():
+        yield sse_event("start", {"session_id": active_session_id})
+        
+        tool_result, rendered = await stream_prompt(request.prompt, active_session_id, session, request.context)
+        
+        # A disconnect or cancellation raises at a yield; the tool has run
+        # by then, so its result is still tracked with the partial response
+        chunks = []
+        try:
+            for chunk in rendered:
+                chunks.append(chunk)
+                yield sse_event("chunk", {"text": chunk})
+        finally:
+            response = "".join(chunks)
+            memory.add_interaction(active_session_id, "assistant", response, result=tool_result)
+            logger.info(f"Streamed response for session {active_session_id}: {len(response)} characters in {len(chunks)} chunks")
+        
+        yield sse_event("done", {"session_id": active_session_id})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/conversation/{session_id}")
 async def get_conversation(session_id: str):
     """
     Get the conversation history for a session.
     """
-    conversation = memory.get_conversation_history(session_id)
+    conversation = memory.get_transcript(session_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
@@ -96,10 +226,7 @@ async def clear_conversation(session_id: str):
     """
     Clear the conversation history for a session.
     """
-    # This is a placeholder - we need to implement this in the Memory class
-    # For now, we'll just reset the conversation to an empty list
-    if session_id in memory.conversations:
-        memory.conversations[session_id] = []
+    memory.clear_conversation(session_id)
     
     return {"message": "Conversation cleared", "session_id": session_id}
 
@@ -108,7 +235,7 @@ async def get_session_history(session_id: str, limit: int = None):
     """
     Get conversation history for a specific session.
     """
-    history = memory.get_conversation_history(session_id, limit)
+    history = memory.get_transcript(session_id, limit)
     return {"session_id": session_id, "history": history}
 
 @app.get("/sessions/{session_id}/entities")
@@ -137,12 +264,61 @@ async def list_sessions():
 @app.delete("/sessions/{session_id}")
 async def clear_session(session_id: str):
     """
-    Clear a specific session.
+    Delete a specific session: its conversation and tracked entities.
     """
-    # This is a temporary solution until we implement a proper clear method
-    memory.cleanup_old_sessions()
+    if not memory.delete_session(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
     return {"message": f"Session {session_id} cleared"}
 
+@app.get("/admin/cache")
+async def get_cache_stats():
+    """
+    Get hit/miss/eviction counters for the tool result cache and the
+    intent parsing cache, and the number of reads coalesced into a shared
+    backend request.
+    """
+    return {
+        "tool_cache": tools.tool_cache.stats(),
+        "single_flight": tools.single_flight.stats(),
+        "intent_cache": agent.intent_cache.stats(),
+    }
+
+@app.delete("/admin/cache")
+async def clear_cache():
+    """
+    Drop every cached tool result and parsed intent.
+    """
+    tools.tool_cache.clear()
+    agent.intent_cache.clear()
+    return {"message": "Caches cleared"}
+
+@app.get("/admin/memory")
+async def get_memory_stats():
+    """
+    Get the sessions in memory, their estimated size against the memory
+    budget, and how many sessions were evicted to stay within it.
+    """
+    return memory.stats()
+
+@app.get("/admin/memory/snapshot")
+async def get_snapshot_stats():
+    """
+    Get the size and duration of the last memory snapshot and restore.
+    """
+    return snapshots.stats()
+
+@app.post("/admin/memory/snapshot")
+async def take_snapshot():
+    """
+    Snapshot the conversations and tracked entities now.
+    """
+    if not snapshots.enabled:
+        raise HTTPException(status_code=409, detail="Memory snapshots are off; set MEMORY_SNAPSHOT_PATH with the in-memory backend")
+    try:
+        return await snapshots.save()
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Snapshot failed: {e}")
+
 @app.get("/health")
 async def health_check():
     """
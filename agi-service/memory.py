@@ -1,206 +1,741 @@
+import asyncio
+import heapq
 import logging
+import os
+import sys
 import time
-import re
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Callable, Deque, Dict, List, Optional, Any, Set, Tuple
+from datetime import datetime
+
+from results import ListCursor, ToolResult
 
 logger = logging.getLogger(__name__)
 
 # Entity memory to track mentioned entities across conversations
-# Structure: {session_id: {"clients": [{"id": 1, "name": "Acme Inc", "last_mentioned": timestamp}]}}
-entity_store = {}
+# Structure: {session_id: {"clients": EntityIndex, "campaigns": EntityIndex, "content_ideas": EntityIndex}}
+entity_store: Dict[str, Dict[str, "EntityIndex"]] = {}
+
+# Messages kept per session; the oldest drop off once a session is full
+HISTORY_CAPACITY = int(os.getenv("HISTORY_CAPACITY", "50"))
+
+# Entities of one type remembered per session; the least recently mentioned are dropped
+ENTITY_INDEX_CAPACITY = int(os.getenv("ENTITY_INDEX_CAPACITY", "1000"))
+
+# Estimated bytes all sessions may hold together; the least recently active are evicted beyond it (0 = no limit)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "256"))
+
+# Elements of a long list measured to estimate its size
+SIZE_SAMPLE = 32
+
+# Bytes a session costs beyond its messages and entities: the ring buffer and
+# its entries in the session dicts and the expiry heap
+SESSION_OVERHEAD = sys.getsizeof(deque()) + 400
+
+# Bytes of one record ID string as the entity graph keys records by
+ID_SIZE = sys.getsizeof("100000")
+
+# Sessions idle for longer than this are forgotten
+SESSION_TTL_MINUTES = float(os.getenv("SESSION_TTL_MINUTES", "60"))
+
+# How often the background expirer looks for idle sessions
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "30"))
+
+# How long a listing of a client's campaigns or content ideas answers follow-ups before they are fetched again
+ENTITY_GRAPH_TTL_SECONDS = float(os.getenv("ENTITY_GRAPH_TTL_SECONDS", "120"))
+
+# Entity types whose records are linked to a client by the client name they carry
+CLIENT_LINKED_TYPES = ("campaigns", "content_ideas")
+
+def iso_timestamp(epoch: float) -> str:
+    """
+    Format an epoch timestamp the way the API returns it.
+    """
+    return datetime.fromtimestamp(epoch).isoformat()
+
+# Types that hold no other values
+FLAT_TYPES = {str, int, float, bool, type(None)}
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate bytes held by a value and the values it contains. Long lists
+    are estimated from an even sample of SIZE_SAMPLE elements, and dict keys
+    are left out as records of one listing share them.
+    """
+    size = sys.getsizeof(value)
+    kind = type(value)
+    if kind is dict:
+        values = value.values()
+    elif kind is list or kind is tuple:
+        if len(value) > SIZE_SAMPLE:
+            step = len(value) / SIZE_SAMPLE
+            sample = sum(estimate_size(value[int(i * step)]) for i in range(SIZE_SAMPLE))
+            return size + sample * len(value) // SIZE_SAMPLE
+        values = value
+    else:
+        return size
+    # Most values are strings and numbers; only containers need the recursion
+    for item in values:
+        size += sys.getsizeof(item) if type(item) in FLAT_TYPES else estimate_size(item)
+    return size
+
+def result_size(tool_result: ToolResult) -> int:
+    """
+    Estimated bytes of a structured tool result. A page of a paged list only
+    counts its own list: the rows are the cursor's, shared by every page and
+    counted once per session (see Memory.cursor_rows).
+    """
+    size = 0
+    for part in tool_result.parts:
+        size += sys.getsizeof(part) + estimate_size(part.parameters)
+        if part.cursor is not None:
+            size += sys.getsizeof(part.cursor) + sys.getsizeof(part.result)
+        else:
+            size += estimate_size(part.result)
+    return size
+
+def has_cursor(tool_result: Optional[ToolResult]) -> bool:
+    return tool_result is not None and any(part.cursor is not None for part in tool_result.parts)
+
+class Interaction:
+    """
+    One message of a conversation. Timestamps are epoch seconds; they are
+    only formatted when the message leaves the service (see to_dict).
+    """
+    __slots__ = ("role", "content", "timestamp", "result", "nbytes")
+
+    def __init__(self, role: str, content: str, timestamp: float, result: Optional[ToolResult] = None):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        # Structured tool result behind an assistant response
+        self.result = result
+        # Estimated bytes of the message and its tool result
+        self.nbytes = sys.getsizeof(self) + sys.getsizeof(content) + (0 if result is None else result_size(result))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The message as returned by the API, without the tool result.
+        """
+        return {"role": self.role, "content": self.content, "timestamp": iso_timestamp(self.timestamp)}
+
+class EntityIndex:
+    """
+    The entities of one type a session has seen, by ID and in order of last
+    mention: upserts, deletes and the most recent k are O(1) per entity,
+    with no scan or sort.
+    """
+    __slots__ = ("capacity", "_entities", "nbytes")
+
+    def __init__(self, capacity: int = ENTITY_INDEX_CAPACITY):
+        self.capacity = capacity
+        # Structure: {entity_id: {"id": 1, "name": "Acme Inc", ..., "last_mentioned": timestamp}}, least recent first
+        self._entities: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Estimated bytes of the index and its entity dicts; the values are
+        # shared with the records in the history
+        self.nbytes = sys.getsizeof(self) + sys.getsizeof(self._entities)
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def get(self, entity_id: Any) -> Optional[Dict[str, Any]]:
+        return self._entities.get(str(entity_id))
+
+    def mention(self, record: Dict[str, Any], now: float) -> None:
+        """
+        Remember a record as just mentioned, refreshing what was known about it.
+        """
+        entity_id = str(record["id"])
+        entity = self._entities.get(entity_id)
+        if entity is None:
+            entity = self._entities[entity_id] = dict(record)
+            entity["last_mentioned"] = now
+            self.nbytes += sys.getsizeof(entity_id) + sys.getsizeof(entity)
+            if len(self._entities) > self.capacity:
+                dropped_id, dropped = self._entities.popitem(last=False)
+                self.nbytes -= sys.getsizeof(dropped_id) + sys.getsizeof(dropped)
+        else:
+            # Records are typed and current, so refresh what we knew
+            before = sys.getsizeof(entity)
+            entity.update(record)
+            entity["last_mentioned"] = now
+            self._entities.move_to_end(entity_id)
+            self.nbytes += sys.getsizeof(entity) - before
+
+    def remove(self, entity_id: Any) -> None:
+        entity_id = str(entity_id)
+        entity = self._entities.pop(entity_id, None)
+        if entity is not None:
+            self.nbytes -= sys.getsizeof(entity_id) + sys.getsizeof(entity)
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Entities, most recently mentioned first.
+        """
+        return list(islice(reversed(self._entities.values()), limit))
+
+def client_key(name: Any) -> str:
+    """
+    A client name as the backend compares it in filters: case-insensitively.
+    """
+    return str(name or "").casefold()
+
+def listing_scope(tool_name: str, parameters: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+    """
+    Whether a list call returns every record it could, and if so of which
+    client (None when unfiltered). Lists cut by limit, offset, field
+    selection or filters other than the client are partial.
+    """
+    filters = parameters.get("filters") or {}
+    if (
+        not tool_name.startswith("list_")
+        or parameters.get("limit")
+        or parameters.get("offset")
+        or parameters.get("fields")
+        or set(filters) - {"client"}
+    ):
+        return False, None
+    return True, client_key(filters["client"]) if filters else None
+
+class EntityGraph:
+    """
+    The clients, campaigns and content ideas in a session's tool results,
+    with campaigns and content ideas linked to their client. The backend
+    links them only by the client name they carry, so a campaign reaches
+    its content ideas through its client.
+
+    A client's campaigns or content ideas are answered from here only while
+    a listing that returned all of them (unfiltered, or filtered on that
+    client alone) is less than `ttl` seconds old; after that they are
+    fetched again. Records are the ones in the results, not copies.
+    """
+    __slots__ = ("ttl", "records", "linked", "fetched", "focus")
+
+    def __init__(self, ttl: float = ENTITY_GRAPH_TTL_SECONDS):
+        self.ttl = ttl
+        # Structure: {entity_type: {entity_id: record}}
+        self.records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Structure: {entity_type: {client_key: {entity_id: record}}}
+        self.linked: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
+        # When complete listings were fetched, of all clients (None) or of one
+        # Structure: {entity_type: {client_key or None: epoch seconds}}
+        self.fetched: Dict[str, Dict[Optional[str], float]] = {}
+        # The last record of each type shown on its own, what "that client" refers to
+        self.focus: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, entity_type: str, entity_id: Any) -> Optional[Dict[str, Any]]:
+        return self.records.get(entity_type, {}).get(str(entity_id))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Estimated bytes of the graph's own dicts and ID keys; the records
+        themselves are counted with the results they came in.
+        """
+        size = sys.getsizeof(self) + sum(map(sys.getsizeof, (self.records, self.linked, self.fetched, self.focus)))
+        for records in self.records.values():
+            size += sys.getsizeof(records) + len(records) * ID_SIZE
+        for by_client in self.linked.values():
+            size += sys.getsizeof(by_client)
+            for records in by_client.values():
+                size += sys.getsizeof(records) + len(records) * ID_SIZE
+        return size + sum(map(sys.getsizeof, self.fetched.values()))
+
+    def is_fresh(self, entity_type: str, client: Optional[str], now: float) -> bool:
+        """
+        Whether the campaigns or content ideas of a client (client_key) were
+        all fetched less than `ttl` seconds before `now`.
+        """
+        fetched = self.fetched.get(entity_type)
+        if not fetched:
+            return False
+        latest = max(fetched.get(None, float("-inf")), fetched.get(client, float("-inf")))
+        return now - latest < self.ttl
+
+    def lookup(self, entity_type: str, client: str, now: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        The campaigns or content ideas of a client, by name, or None if they
+        have to be fetched.
+        """
+        key = client_key(client)
+        if not self.is_fresh(entity_type, key, now):
+            return None
+        return list(self.linked.get(entity_type, {}).get(key, {}).values())
+
+    def add(self, tool_result: ToolResult, now: float) -> None:
+        """
+        Take in the records of one tool result, fetched at `now`.
+        """
+        entity_type = tool_result.entity_type
+        if entity_type is None:
+            return
+        
+        deleted_id = tool_result.deleted_id
+        if deleted_id is not None:
+            self._unlink(entity_type, self.records.get(entity_type, {}).pop(deleted_id, None))
+            if str(self.focus.get(entity_type, {}).get("id")) == deleted_id:
+                del self.focus[entity_type]
+            return
+        
+        # A paged list holds all its rows in the cursor
+        cursor = tool_result.cursor
+        rows = cursor.rows if cursor is not None else tool_result.records
+        parameters = cursor.parameters if cursor is not None else tool_result.parameters
+        rows = [row for row in rows if isinstance(row, dict) and "id" in row]
+        
+        complete, client = listing_scope(tool_result.tool_name, parameters)
+        if complete and entity_type in CLIENT_LINKED_TYPES:
+            if client is not None and self.is_fresh(entity_type, client, now):
+                # Answered from this graph (see lookup); nothing new was fetched
+                return
+            # The listing replaces what was known about the records it covers
+            self.fetched.setdefault(entity_type, {})[client] = now
+            if client is None:
+                self.records[entity_type] = {}
+                self.linked[entity_type] = {}
+            else:
+                for record in self.linked.get(entity_type, {}).pop(client, {}).values():
+                    self.records[entity_type].pop(str(record["id"]), None)
+        
+        for row in rows:
+            self._link(entity_type, row)
+        if len(rows) == 1 and not tool_result.tool_name.startswith("list_"):
+            self.focus[entity_type] = rows[0]
+
+    def _link(self, entity_type: str, record: Dict[str, Any]) -> None:
+        records = self.records.setdefault(entity_type, {})
+        entity_id = str(record["id"])
+        self._unlink(entity_type, records.get(entity_id))
+        records[entity_id] = record
+        if entity_type in CLIENT_LINKED_TYPES and record.get("client"):
+            self.linked.setdefault(entity_type, {}).setdefault(client_key(record["client"]), {})[entity_id] = record
+
+    def _unlink(self, entity_type: str, record: Optional[Dict[str, Any]]) -> None:
+        if record is None or entity_type not in CLIENT_LINKED_TYPES or not record.get("client"):
+            return
+        linked = self.linked.get(entity_type, {})
+        key = client_key(record["client"])
+        linked.get(key, {}).pop(str(record["id"]), None)
+        if key in linked and not linked[key]:
+            del linked[key]
+
+class SessionContext:
+    """
+    What the agent needs from earlier turns of a session, kept up to date as
+    messages are added rather than found by scanning the history on every
+    prompt: the cursor of the latest paged list, overall and per list tool,
+    and the graph of the records the session has seen.
+    """
+    __slots__ = ("cursor", "cursors", "graph")
 
-class Memory:
     def __init__(self):
-        # In-memory storage for conversation history
-        # Structure: {session_id: [{"role": "user"|"assistant", "content": "message", "timestamp": timestamp}]}
-        self.conversations = {}
+        self.cursor: Optional[ListCursor] = None
+        # Structure: {tool_name: ListCursor}
+        self.cursors: Dict[str, ListCursor] = {}
+        self.graph = EntityGraph()
+
+    def update(self, tool_result: ToolResult, now: float) -> None:
+        """
+        Take in the structured result of a new assistant message, added at `now`.
+        """
+        for part in tool_result.parts:
+            if part.cursor is not None:
+                self.cursor = self.cursors[part.tool_name] = part.cursor
+            self.graph.add(part, now)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Estimated bytes of the context; its cursors are the ones in the history.
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self.cursors) + self.graph.nbytes
+
+    def find_cursor(self, tool_name: Optional[str] = None) -> Optional[ListCursor]:
+        """
+        The cursor of the most recent paged list, optionally of one list tool.
+        """
+        return self.cursor if tool_name is None else self.cursors.get(tool_name)
+
+class Memory:
+    def __init__(self, history_capacity: int = HISTORY_CAPACITY):
+        # In-memory storage for conversation history, one ring buffer per session
+        # Structure: {session_id: deque([Interaction, ...], maxlen=history_capacity)}
+        self.conversations: Dict[str, Deque[Interaction]] = {}
+        self.history_capacity = history_capacity
         # TTL for sessions in minutes
-        self.session_ttl = 60
+        self.session_ttl = SESSION_TTL_MINUTES
+        # Structure: {session_id: epoch seconds of the last interaction}
+        self.last_active: Dict[str, float] = {}
+        # Min-heap of (deadline, session_id), at most one entry per session.
+        # Activity doesn't touch the heap: an entry that comes due for a
+        # session that has been active since is pushed back to its new deadline.
+        self._expiries: List[Tuple[float, str]] = []
+        self._scheduled: Set[str] = set()
+        self._expirer: Optional["asyncio.Task[None]"] = None
+        # Sessions known but not in memory yet, loaded on first use (see memory_snapshot.py)
+        # Structure: {session_id: function that loads the session, given its ID}
+        self._unloaded: Dict[str, Callable[[str], None]] = {}
+        # Context of the sessions the agent has worked in, see get_context
+        # Structure: {session_id: SessionContext}
+        self.contexts: Dict[str, SessionContext] = {}
+        # Estimated bytes of each session in memory (messages, tracked
+        # entities, context and the rows of its paged lists), least recently
+        # active first, and their total
+        # Structure: OrderedDict({session_id: bytes})
+        self.sizes: "OrderedDict[str, int]" = OrderedDict()
+        # Rows of the paged lists a session's messages or context still hold,
+        # counted once however many pages show them. The messages keep the
+        # rows alive, so an ID isn't reused while its entry is here.
+        # Structure: {session_id: {id(cursor.rows): bytes}}
+        self.cursor_rows: Dict[str, Dict[int, int]] = {}
+        self.total_bytes = 0
+        self.memory_budget = int(MEMORY_BUDGET_MB * 1024 * 1024)
+        self.evictions = 0
     
-    def add_interaction(self, session_id: str, role: str, content: str) -> None:
+    def add_interaction(self, session_id: str, role: str, content: str, result: Optional[ToolResult] = None) -> None:
         """
         Add a user or assistant interaction to the conversation history.
+        `result` is the structured tool result behind an assistant response.
         """
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-        
-        interaction = {
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        }
+        self._ensure_loaded(session_id)
+        history = self.conversations.get(session_id)
+        size = 0
+        if history is None:
+            history = self.conversations[session_id] = deque(maxlen=self.history_capacity)
+            size = SESSION_OVERHEAD
         
-        self.conversations[session_id].append(interaction)
+        # A full buffer drops its oldest message, so history size stays bounded
+        now = time.time()
+        interaction = Interaction(role, content, now, result)
+        size += interaction.nbytes
+        dropped = history[0] if len(history) == history.maxlen else None
+        if dropped is not None:
+            size -= dropped.nbytes
+        history.append(interaction)
+        self._schedule(session_id, now)
+        # Re-adding the session moves it to the most recently active end
+        self.sizes[session_id] = self.sizes.pop(session_id, 0) + size
+        self.total_bytes += size
         
-        # Limit history size to prevent memory issues
-        if len(self.conversations[session_id]) > 50:
-            self.conversations[session_id] = self.conversations[session_id][-50:]
+        logger.debug(f"Added interaction to session {session_id}, history size: {len(history)}")
         
-        logger.debug(f"Added interaction to session {session_id}, history size: {len(self.conversations[session_id])}")
+        # Track entities from the typed records rather than the markdown
+        if result is not None:
+            self.track_entities(session_id, result)
+            context = self.contexts.get(session_id)
+            if context is not None:
+                before = context.nbytes
+                context.update(result, now)
+                self._resize(session_id, context.nbytes - before)
+        # A new page or list may share rows already counted, or replace the
+        # context's cursor; a dropped message may release the last page of one
+        if has_cursor(result) or (dropped is not None and has_cursor(dropped.result)):
+            self._count_rows(session_id)
         
-        # Extract and track entities from the message
-        if "assistant" in role:
-            self.extract_and_track_entities(session_id, content)
+        if self.memory_budget and self.total_bytes > self.memory_budget:
+            self._enforce_budget(session_id)
     
-    def get_conversation_history(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def get_conversation_history(self, session_id: str, limit: Optional[int] = None) -> List[Interaction]:
         """
-        Get the conversation history for a specific session.
+        Get the conversation history for a specific session, oldest first.
         """
-        if session_id not in self.conversations:
+        self._ensure_loaded(session_id)
+        history = self.conversations.get(session_id)
+        if not history:
             return []
         
-        history = self.conversations[session_id]
-        
         if limit is not None and limit > 0:
-            history = history[-limit:]
+            return list(islice(history, max(0, len(history) - limit), None))
         
-        return history
+        return list(history)
+    
+    def get_context(self, session_id: str) -> SessionContext:
+        """
+        The session's context for the agent, in O(1) whatever the length of
+        the history. It is built from the history the first time it is asked
+        for and then updated by every message added.
+        """
+        self._ensure_loaded(session_id)
+        context = self.contexts.get(session_id)
+        if context is None:
+            context = self.contexts[session_id] = SessionContext()
+            for interaction in self.conversations.get(session_id, ()):
+                if interaction.result is not None:
+                    context.update(interaction.result, interaction.timestamp)
+            self._resize(session_id, context.nbytes)
+        return context
+    
+    def get_transcript(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get the conversation history without structured tool results, as
+        returned by the API.
+        """
+        return [interaction.to_dict() for interaction in self.get_conversation_history(session_id, limit)]
+    
+    def clear_conversation(self, session_id: str) -> None:
+        """
+        Forget the messages of a session, keeping the session itself.
+        """
+        self._ensure_loaded(session_id)
+        self.contexts.pop(session_id, None)
+        if session_id in self.conversations:
+            self.conversations[session_id].clear()
+            self._measure(session_id)
+    
+    def _ensure_loaded(self, session_id: str) -> None:
+        """
+        Bring a session into memory before it is used. Backends that keep
+        sessions elsewhere override this.
+        """
+        load = self._unloaded.pop(session_id, None)
+        if load is not None:
+            load(session_id)
+    
+    def _schedule(self, session_id: str, last_active: float) -> None:
+        """
+        Record activity in a session, queueing it for expiry if it isn't yet.
+        """
+        self.last_active[session_id] = last_active
+        if session_id not in self._scheduled:
+            self._scheduled.add(session_id)
+            heapq.heappush(self._expiries, (last_active + self.session_ttl * 60, session_id))
+    
+    def delete_session(self, session_id: str) -> bool:
+        """
+        Forget a session: its messages and its tracked entities.
+        Returns whether the session existed.
+        """
+        return self._forget(session_id)
+    
+    def _forget(self, session_id: str) -> bool:
+        # Any heap entry stays behind and is dropped when it comes due
+        existed = self.conversations.pop(session_id, None) is not None
+        existed = self._unloaded.pop(session_id, None) is not None or existed
+        self.last_active.pop(session_id, None)
+        self.contexts.pop(session_id, None)
+        self.total_bytes -= self.sizes.pop(session_id, 0)
+        self.cursor_rows.pop(session_id, None)
+        existed = entity_store.pop(session_id, None) is not None or existed
+        return existed
+    
+    def _resize(self, session_id: str, delta: int) -> None:
+        self.sizes[session_id] = self.sizes.get(session_id, 0) + delta
+        self.total_bytes += delta
+    
+    def _measure(self, session_id: str) -> None:
+        """
+        Estimate a session's size from scratch, after its messages or
+        entities were replaced (cleared, or loaded from storage).
+        """
+        history = self.conversations.get(session_id)
+        size = SESSION_OVERHEAD + sum(interaction.nbytes for interaction in history) if history is not None else 0
+        size += sum(entities.nbytes for entities in entity_store.get(session_id, {}).values())
+        context = self.contexts.get(session_id)
+        if context is not None:
+            size += context.nbytes
+        self.cursor_rows.pop(session_id, None)
+        self._resize(session_id, size - self.sizes.get(session_id, 0))
+        self._count_rows(session_id)
+    
+    def _count_rows(self, session_id: str) -> None:
+        """
+        Bring the session's cursor_rows up to date with the paged lists its
+        messages and context hold: new rows are counted, released ones dropped.
+        """
+        held = {}
+        for interaction in self.conversations.get(session_id, ()):
+            if interaction.result is not None:
+                for part in interaction.result.parts:
+                    if part.cursor is not None:
+                        held[id(part.cursor.rows)] = part.cursor.rows
+        context = self.contexts.get(session_id)
+        if context is not None:
+            for cursor in context.cursors.values():
+                held[id(cursor.rows)] = cursor.rows
+        
+        counted = self.cursor_rows.setdefault(session_id, {})
+        delta = 0
+        for key in [key for key in counted if key not in held]:
+            delta -= counted.pop(key)
+        for key, rows in held.items():
+            if key not in counted:
+                counted[key] = estimate_size(rows)
+                delta += counted[key]
+        if not counted:
+            del self.cursor_rows[session_id]
+        self._resize(session_id, delta)
+    
+    def _enforce_budget(self, active: str) -> None:
+        """
+        Evict the least recently active sessions while the estimated total is
+        over the memory budget. The session being written is never evicted.
+        """
+        while self.total_bytes > self.memory_budget and self.sizes:
+            session_id = next(iter(self.sizes))
+            if session_id == active or not self._evict(session_id):
+                break
+            self.evictions += 1
+        
+        # Evicted sessions leave their expiry entries behind; rebuild the heap
+        # once most of it is stale, so a burst of new sessions doesn't keep them
+        if len(self._expiries) > 2 * len(self.last_active) + 1024:
+            ttl = self.session_ttl * 60
+            self._expiries = [(last_active + ttl, session_id) for session_id, last_active in self.last_active.items()]
+            heapq.heapify(self._expiries)
+            self._scheduled = set(self.last_active)
+    
+    def _evict(self, session_id: str) -> bool:
+        """
+        Drop a session to stay within the memory budget. Returns whether it
+        could be; backends that keep sessions elsewhere only drop their copy.
+        """
+        logger.debug(f"Evicting session {session_id} ({self.sizes.get(session_id, 0)} bytes) over the memory budget")
+        self._forget(session_id)
+        return True
     
     def cleanup_old_sessions(self) -> int:
         """
         Remove sessions that have been inactive for longer than the TTL.
+        Only sessions whose deadline has passed are looked at, not every session.
         Returns the number of sessions removed.
         """
-        now = datetime.now()
-        sessions_to_remove = []
+        now = time.time()
+        ttl = self.session_ttl * 60
+        removed = 0
         
-        for session_id, interactions in self.conversations.items():
-            if not interactions:
-                sessions_to_remove.append(session_id)
+        while self._expiries and self._expiries[0][0] <= now:
+            _, session_id = heapq.heappop(self._expiries)
+            last_active = self.last_active.get(session_id)
+            if last_active is not None and last_active + ttl > now:
+                # Active since this entry was pushed; check again at its new deadline
+                heapq.heappush(self._expiries, (last_active + ttl, session_id))
                 continue
             
-            last_interaction = interactions[-1]
-            last_timestamp = datetime.fromisoformat(last_interaction["timestamp"])
-            
-            if now - last_timestamp > timedelta(minutes=self.session_ttl):
-                sessions_to_remove.append(session_id)
+            self._scheduled.discard(session_id)
+            removed += self._forget(session_id)
         
-        for session_id in sessions_to_remove:
-            del self.conversations[session_id]
-            if session_id in entity_store:
-                del entity_store[session_id]
-        
-        return len(sessions_to_remove)
+        if removed:
+            logger.info(f"Expired {removed} idle sessions, {len(self.conversations)} active")
+        return removed
+    
+    def start_background_tasks(self, interval: float = SESSION_SWEEP_SECONDS) -> None:
+        """
+        Start removing idle sessions in the background every `interval`
+        seconds. Called once at application startup.
+        """
+        if self._expirer is None or self._expirer.done():
+            self._expirer = asyncio.create_task(self._expire_periodically(interval))
     
-    def extract_and_track_entities(self, session_id: str, content: str) -> None:
+    async def stop_background_tasks(self) -> None:
         """
-        Extract entities from the message content and track them in entity store.
+        Stop the background expirer. Called once at application shutdown.
         """
-        if session_id not in entity_store:
-            entity_store[session_id] = {"clients": []}
+        if self._expirer is not None:
+            self._expirer.cancel()
+            try:
+                await self._expirer
+            except asyncio.CancelledError:
+                pass
+            self._expirer = None
+    
+    async def _expire_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.cleanup_old_sessions()
+            except Exception:
+                logger.exception("Session expiry failed")
+    
+    def track_entities(self, session_id: str, tool_result: ToolResult) -> None:
+        """
+        Track the clients, campaigns and content ideas in a structured tool
+        result in the entity store.
+        """
+        for part in tool_result.parts:
+            self._track_part(session_id, part)
+    
+    def _track_part(self, session_id: str, tool_result: ToolResult) -> None:
+        entity_type = tool_result.entity_type
+        if entity_type is None:
+            return
         
-        # Extract client information from list responses
-        if "### Client List" in content:
-            client_blocks = re.findall(r'\d+\.\s+\*\*([^*]+)\*\*\s+- ID:\s+(\d+).*?(?=\d+\.\s+\*\*|$)', content, re.DOTALL)
-            
-            for client_block in client_blocks:
-                client_name = client_block[0].strip()
-                client_id = client_block[1].strip()
-                
-                # Check if client already exists in entity store
-                client_exists = False
-                for client in entity_store[session_id]["clients"]:
-                    if client["id"] == int(client_id):
-                        client["last_mentioned"] = time.time()
-                        client_exists = True
-                        break
-                
-                if not client_exists:
-                    # Extract other details
-                    niche_match = re.search(r'Niche:\s+([^\n]+)', client_block[0], re.DOTALL)
-                    email_match = re.search(r'Email:\s+([^\n]+)', client_block[0], re.DOTALL)
-                    
-                    entity_store[session_id]["clients"].append({
-                        "id": int(client_id),
-                        "name": client_name,
-                        "niche": niche_match.group(1).strip() if niche_match else "",
-                        "contact_email": email_match.group(1).strip() if email_match else "",
-                        "last_mentioned": time.time()
-                    })
-        
-        # Extract client information from client addition responses
-        elif "Successfully added client:" in content:
-            client_match = re.search(r'Successfully added client:\s+\*\*([^*]+)\*\*\s+with ID:\s+\*\*(\d+)\*\*', content)
-            if client_match:
-                client_name = client_match.group(1).strip()
-                client_id = client_match.group(2).strip()
-                
-                # Check if client already exists in entity store
-                client_exists = False
-                for client in entity_store[session_id]["clients"]:
-                    if client["id"] == int(client_id):
-                        client["last_mentioned"] = time.time()
-                        client_exists = True
-                        break
-                
-                if not client_exists:
-                    entity_store[session_id]["clients"].append({
-                        "id": int(client_id),
-                        "name": client_name,
-                        "last_mentioned": time.time()
-                    })
-        
-        # Extract client information from client details responses
-        elif "### Client Details" in content:
-            client_match = re.search(r'\*\*([^*]+)\*\*\s+\(ID:\s+(\d+)\)', content)
-            if client_match:
-                client_name = client_match.group(1).strip()
-                client_id = client_match.group(2).strip()
-                
-                # Check if client already exists in entity store
-                client_exists = False
-                for client in entity_store[session_id]["clients"]:
-                    if client["id"] == int(client_id):
-                        client["last_mentioned"] = time.time()
-                        client_exists = True
-                        break
-                
-                if not client_exists:
-                    # Extract other details
-                    niche_match = re.search(r'\*\*Niche:\*\*\s+([^\n]+)', content)
-                    email_match = re.search(r'\*\*Contact Email:\*\*\s+([^\n]+)', content)
-                    
-                    entity_store[session_id]["clients"].append({
-                        "id": int(client_id),
-                        "name": client_name,
-                        "niche": niche_match.group(1).strip() if niche_match else "",
-                        "contact_email": email_match.group(1).strip() if email_match else "",
-                        "last_mentioned": time.time()
-                    })
+        entities = entity_store.setdefault(session_id, {}).get(entity_type)
+        before = 0
+        if entities is None:
+            entities = entity_store[session_id][entity_type] = EntityIndex()
+        else:
+            before = entities.nbytes
+        
+        deleted_id = tool_result.deleted_id
+        if deleted_id is not None:
+            entities.remove(deleted_id)
+        else:
+            now = time.time()
+            for record in tool_result.records:
+                if "id" in record:
+                    entities.mention(record, now)
+        self._resize(session_id, entities.nbytes - before)
 
     def get_recent_entities(self, session_id: str, entity_type: str = "clients", limit: int = 5) -> List[Dict[str, Any]]:
         """
         Get the most recently mentioned entities of a specific type.
         """
-        if session_id not in entity_store or entity_type not in entity_store[session_id]:
+        self._ensure_loaded(session_id)
+        entities = entity_store.get(session_id, {}).get(entity_type)
+        if entities is None:
             return []
         
-        # Sort by last_mentioned timestamp (most recent first) and limit the results
-        entities = sorted(
-            entity_store[session_id][entity_type],
-            key=lambda x: x.get("last_mentioned", 0),
-            reverse=True
-        )
-        
-        return entities[:limit]
+        return entities.recent(limit)
 
     def get_session_summary(self, session_id: str) -> Dict[str, Any]:
         """
         Get a summary of the session including conversation history and tracked entities.
         """
+        self._ensure_loaded(session_id)
         return {
-            "conversation_history": self.get_conversation_history(session_id),
-            "entities": entity_store.get(session_id, {}),
+            "conversation_history": self.get_transcript(session_id),
+            "entities": {
+                entity_type: entities.recent()
+                for entity_type, entities in entity_store.get(session_id, {}).items()
+            },
             "message_count": len(self.conversations.get(session_id, [])),
+            "size_bytes": self.sizes.get(session_id, 0),
             "session_id": session_id
         }
 
+    def stats(self) -> Dict[str, Any]:
+        """
+        Sessions in memory, their estimated size against the budget, and
+        evictions so far.
+        """
+        return {
+            "sessions": len(self.sizes),
+            "bytes": self.total_bytes,
+            "budget_bytes": self.memory_budget,
+            "evictions": self.evictions,
+        }
+
     def get_all_sessions(self) -> List[str]:
         """
         Get a list of all active session IDs.
         """
-        return list(self.conversations.keys())
+        return list(self.conversations.keys()) + list(self._unloaded.keys())
+
+# Where conversations are kept: "memory" (this process only) or "sqlite"
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "memory")
+
+def create_memory(backend: str = MEMORY_BACKEND) -> Memory:
+    """
+    The conversation store for the configured backend.
+    """
+    if backend == "sqlite":
+        from memory_sqlite import SQLiteMemory
+        return SQLiteMemory()
+    if backend != "memory":
+        raise ValueError(f"Unknown MEMORY_BACKEND {backend!r}; expected 'memory' or 'sqlite'")
+    return Memory()
 
 # Create a singleton instance
-memory = Memory() 
\ No newline at end of file
+memory = create_memory()
+ 
\ No newline at end of file
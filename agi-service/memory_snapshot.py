@@ -0,0 +1,387 @@
+import asyncio
+import gc
+import logging
+import mmap
+import os
+import pickle
+import struct
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from memory import EntityIndex, Interaction, Memory, entity_store
+from results import ListCursor, ToolResult
+
+logger = logging.getLogger(__name__)
+
+# Snapshot file of the in-memory backend; empty disables snapshots
+MEMORY_SNAPSHOT_PATH = os.getenv("MEMORY_SNAPSHOT_PATH", "")
+
+# Seconds between periodic snapshots
+MEMORY_SNAPSHOT_SECONDS = float(os.getenv("MEMORY_SNAPSHOT_SECONDS", "60"))
+
+# "none" or "zlib"
+MEMORY_SNAPSHOT_COMPRESSION = os.getenv("MEMORY_SNAPSHOT_COMPRESSION", "none")
+
+# File layout: header, one blob per session, then the pickled index of the
+# blobs. The header is MAGIC, the format version, the compression code and
+# the offset of the index.
+MAGIC = b"AGIMEM"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(f"<{len(MAGIC)}sBBQ")
+
+# Sessions are compressed one by one, so only a codec that is cheap to start is offered
+COMPRESSIONS = {"none": 0, "zlib": 1}
+CODECS = {
+    0: (bytes, bytes),
+    1: (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+
+# Sessions copied per step of a snapshot before the event loop gets control back
+SNAPSHOT_CHUNK = 1000
+
+# Index entry of one session: (session_id, last_active, offset, length)
+IndexEntry = Tuple[str, float, int, int]
+
+def flatten_result(result: Optional[ToolResult]) -> Optional[Tuple[Any, ...]]:
+    """
+    A tool result as plain tuples, which pickle faster and smaller than the
+    dataclasses. Errors of batch lookups keep only their message, since
+    some (HTTP errors) can't be unpickled.
+    """
+    if result is None:
+        return None
+    value = result.result
+    if result.tool_name == "plan":
+        value = [flatten_result(part) for part in value]
+    elif isinstance(value, list) and value and isinstance(value[0], tuple):
+        value = [(record_id, RuntimeError(str(record)) if isinstance(record, BaseException) else record) for record_id, record in value]
+    cursor = result.cursor
+    if cursor is not None:
+        cursor = (cursor.tool_name, cursor.parameters, cursor.rows, cursor.page_size, cursor.page)
+    return result.tool_name, result.parameters, value, cursor
+
+def inflate_result(flat: Optional[Tuple[Any, ...]]) -> Optional[ToolResult]:
+    if flat is None:
+        return None
+    tool_name, parameters, value, cursor = flat
+    if tool_name == "plan":
+        value = [inflate_result(part) for part in value]
+    return ToolResult(tool_name, parameters, value, ListCursor(*cursor) if cursor is not None else None)
+
+@contextmanager
+def paused_gc():
+    """
+    Hold off garbage collection while a burst of objects is allocated; the
+    collector would otherwise walk the whole heap several times over.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+class MemorySnapshots:
+    """
+    Periodic snapshots of the in-memory backend to a single file, so a
+    restart picks up conversations and tracked entities where they were.
+
+    Each session is pickled into its own blob, followed by an index of
+    where the blobs are. A snapshot is written to a temporary file and
+    renamed over the previous one, so a crash mid-write leaves the last
+    complete snapshot in place. The state is copied on the event loop;
+    pickling, compression and the write happen in a worker thread.
+
+    Restoring maps the file into memory and reads only the index, so the
+    service is ready without unpickling any conversation. A session is
+    unpickled from the mapping the first time it is used; sessions nobody
+    comes back to are copied into the next snapshot as they are.
+    """
+
+    def __init__(
+        self,
+        store: Memory,
+        path: str = MEMORY_SNAPSHOT_PATH,
+        interval: float = MEMORY_SNAPSHOT_SECONDS,
+        compression: str = MEMORY_SNAPSHOT_COMPRESSION,
+    ):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown snapshot compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+        self.memory = store
+        self.path = path
+        self.interval = interval
+        self.compression = compression
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._lock = asyncio.Lock()
+        # The restored snapshot while some of its sessions haven't been loaded
+        self._mapped: Optional[mmap.mmap] = None
+        self._mapped_codec = 0
+        # Structure: {session_id: (offset, length)} of restored sessions not loaded yet
+        self._lazy: Dict[str, Tuple[int, int]] = {}
+        self.snapshots = 0
+        self.failures = 0
+        self.lazy_loads = 0
+        self.last_snapshot: Optional[Dict[str, Any]] = None
+        self.last_restore: Optional[Dict[str, Any]] = None
+
+    @property
+    def enabled(self) -> bool:
+        # Only the in-memory backend needs them; the SQLite backend is durable already
+        return bool(self.path) and type(self.memory) is Memory
+
+    # Saving
+
+    async def capture(self) -> Tuple[List[Tuple[Any, ...]], List[Tuple[str, float, bytes]], float]:
+        """
+        Copy of every session's state: the messages and entities of loaded
+        sessions, and the stored blobs of sessions restored but not loaded
+        since. Taken on the event loop in chunks of SNAPSHOT_CHUNK sessions,
+        so requests keep being served; also returns the longest pause in ms.
+        """
+        memory = self.memory
+        sessions = list(memory.conversations.items())
+        restored = list(self._lazy.items())
+        loaded = []
+        unloaded = []
+        longest = 0.0
+
+        for start in range(0, len(sessions) + len(restored), SNAPSHOT_CHUNK):
+            started = time.perf_counter()
+            with paused_gc():
+                for session_id, history in sessions[start:start + SNAPSHOT_CHUNK]:
+                    if memory.conversations.get(session_id) is not history:
+                        continue  # Deleted since the capture started
+                    # Interactions are never changed once added, so copying the buffer is
+                    # enough. Entities are updated in place; each is copied in the writer
+                    # thread, which is safe as a dict copies under the GIL in one step.
+                    entities = {entity_type: index.recent() for entity_type, index in entity_store.get(session_id, {}).items()}
+                    loaded.append((session_id, memory.last_active.get(session_id, 0.0), list(history), entities))
+
+                for session_id, (offset, length) in restored[max(0, start - len(sessions)):max(0, start + SNAPSHOT_CHUNK - len(sessions))]:
+                    if session_id not in memory._unloaded and session_id not in memory.conversations:
+                        self._lazy.pop(session_id, None)  # Expired or deleted since the restore
+                        continue
+                    # A session loaded since the capture started is saved as restored; the next snapshot has its changes
+                    unloaded.append((session_id, memory.last_active.get(session_id, 0.0), self._mapped[offset:offset + length]))
+            longest = max(longest, (time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0)
+        return loaded, unloaded, longest
+
+    def write(self, loaded: List[Tuple[Any, ...]], unloaded: List[Tuple[str, float, bytes]], unloaded_codec: int) -> int:
+        """
+        Write a captured state to the snapshot file. Returns its size in bytes.
+        """
+        code = COMPRESSIONS[self.compression]
+        compress = CODECS[code][0]
+        decompress = CODECS[unloaded_codec][1]
+        index: List[IndexEntry] = []
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(HEADER.pack(MAGIC, FORMAT_VERSION, code, 0))
+            offset = HEADER.size
+            for session_id, last_active, messages, entities in loaded:
+                messages = [(message.role, message.content, message.timestamp, flatten_result(message.result)) for message in messages]
+                entities = {entity_type: [dict(entity) for entity in reversed(recent)] for entity_type, recent in entities.items()}
+                blob = compress(pickle.dumps((messages, entities), pickle.HIGHEST_PROTOCOL))
+                snapshot.write(blob)
+                index.append((session_id, last_active, offset, len(blob)))
+                offset += len(blob)
+            for session_id, last_active, blob in unloaded:
+                if unloaded_codec != code:
+                    blob = compress(decompress(blob))
+                snapshot.write(blob)
+                index.append((session_id, last_active, offset, len(blob)))
+                offset += len(blob)
+
+            snapshot.write(pickle.dumps((time.time(), index), pickle.HIGHEST_PROTOCOL))
+            size = snapshot.tell()
+            snapshot.seek(0)
+            snapshot.write(HEADER.pack(MAGIC, FORMAT_VERSION, code, offset))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, self.path)
+        return size
+
+    async def save(self) -> Dict[str, Any]:
+        """
+        Take a snapshot now. Returns its metrics.
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            unloaded_codec = self._mapped_codec
+            loaded, unloaded, longest = await self.capture()
+            captured = time.perf_counter()
+            try:
+                size = await asyncio.to_thread(self.write, loaded, unloaded, unloaded_codec)
+            except Exception:
+                self.failures += 1
+                logger.exception(f"Writing the memory snapshot to {self.path} failed")
+                raise
+            finally:
+                self._release_mapping()
+            finished = time.perf_counter()
+
+            self.snapshots += 1
+            self.last_snapshot = {
+                "saved_at": time.time(),
+                "sessions": len(loaded) + len(unloaded),
+                "sessions_copied_unloaded": len(unloaded),
+                "bytes": size,
+                "capture_ms": round((captured - started) * 1000, 3),
+                "longest_pause_ms": round(longest, 3),
+                "duration_ms": round((finished - started) * 1000, 3),
+            }
+            logger.info(f"Saved memory snapshot of {self.last_snapshot['sessions']} sessions to {self.path}: {size} bytes in {self.last_snapshot['duration_ms']:.1f} ms")
+            return self.last_snapshot
+
+    # Restoring
+
+    def restore(self) -> int:
+        """
+        Map the snapshot file and register its sessions to be loaded on
+        first use, skipping those idle past the TTL since. Returns the
+        number of sessions restored.
+        """
+        started = time.perf_counter()
+        try:
+            mapped = self._map()
+        except Exception:
+            logger.exception(f"Could not read the memory snapshot {self.path}; starting empty")
+            return 0
+        if mapped is None:
+            return 0
+        mapped, code, index_offset = mapped
+
+        try:
+            with memoryview(mapped) as view:
+                saved_at, index = pickle.loads(view[index_offset:])
+        except Exception:
+            mapped.close()
+            logger.exception(f"Could not read the index of the memory snapshot {self.path}; starting empty")
+            return 0
+
+        self._release_mapping()
+        self._mapped, self._mapped_codec = mapped, code
+        memory = self.memory
+        cutoff = time.time() - memory.session_ttl * 60
+        with paused_gc():
+            for session_id, last_active, offset, length in index:
+                if last_active < cutoff or session_id in memory.conversations:
+                    continue
+                self._lazy[session_id] = (offset, length)
+                memory._unloaded[session_id] = self._load
+                memory._schedule(session_id, last_active)
+        restored = len(self._lazy)
+        self._release_mapping()
+
+        self.last_restore = {
+            "saved_at": saved_at,
+            "sessions": restored,
+            "skipped_expired": len(index) - restored,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        logger.info(f"Restored {restored} sessions from {self.path} in {self.last_restore['duration_ms']:.1f} ms")
+        return restored
+
+    def _map(self) -> Optional[Tuple[mmap.mmap, int, int]]:
+        """
+        The snapshot file mapped into memory, its compression code and
+        index offset, or None if there is no usable snapshot.
+        """
+        try:
+            snapshot = open(self.path, "rb")
+        except FileNotFoundError:
+            return None
+        with snapshot:
+            if os.fstat(snapshot.fileno()).st_size <= HEADER.size:
+                logger.warning(f"Ignoring {self.path}: too short to be a memory snapshot")
+                return None
+            # The mapping stays valid after the file is closed or replaced
+            mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, code, index_offset = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != FORMAT_VERSION or code not in CODECS or not HEADER.size <= index_offset < len(mapped):
+            mapped.close()
+            logger.warning(f"Ignoring {self.path}: not a memory snapshot of format version {FORMAT_VERSION}")
+            return None
+        return mapped, code, index_offset
+
+    def _load(self, session_id: str) -> None:
+        offset, length = self._lazy.pop(session_id)
+        messages, entities = pickle.loads(CODECS[self._mapped_codec][1](self._mapped[offset:offset + length]))
+        memory = self.memory
+        memory.conversations[session_id] = deque(
+            (Interaction(role, content, timestamp, inflate_result(result)) for role, content, timestamp, result in messages),
+            maxlen=memory.history_capacity,
+        )
+        if entities:
+            indexes = entity_store[session_id] = {}
+            for entity_type, records in entities.items():
+                index = indexes[entity_type] = EntityIndex()
+                for record in records:
+                    index.mention(record, record["last_mentioned"])
+        memory._measure(session_id)
+        self.lazy_loads += 1
+        self._release_mapping()
+
+    def _release_mapping(self) -> None:
+        # Once every restored session is loaded or gone, the file isn't needed;
+        # a snapshot being taken may still be copying from it
+        if self._mapped is not None and not self._lazy and not self._lock.locked():
+            self._mapped.close()
+            self._mapped = None
+            self._mapped_codec = 0
+
+    # Lifecycle
+
+    def start(self) -> None:
+        """
+        Restore the last snapshot and start taking new ones every interval.
+        Called once at application startup.
+        """
+        if not self.enabled:
+            return
+        self.restore()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._save_periodically())
+
+    async def stop(self) -> None:
+        """
+        Stop the periodic snapshots and take a last one. Called once at
+        application shutdown.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.save()
+
+    async def _save_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except Exception:
+                pass  # Logged by save; try again next interval
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path or None,
+            "compression": self.compression,
+            "interval_seconds": self.interval,
+            "snapshots": self.snapshots,
+            "failures": self.failures,
+            "last_snapshot": self.last_snapshot,
+            "last_restore": self.last_restore,
+            "sessions_loaded_lazily": self.lazy_loads,
+            "sessions_not_loaded": len(self._lazy),
+        }
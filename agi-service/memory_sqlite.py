@@ -0,0 +1,462 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from memory import ENTITY_INDEX_CAPACITY, EntityIndex, Interaction, Memory, entity_store
+from results import ListCursor, ToolResult
+
+logger = logging.getLogger(__name__)
+
+# Database shared by every worker process using the SQLite backend
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "agi_memory.db")
+
+# How often queued writes are committed, in milliseconds
+MEMORY_FLUSH_MS = float(os.getenv("MEMORY_FLUSH_MS", "100"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_active REAL NOT NULL,
+    revision INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active);
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS interactions_session ON interactions (session_id, id);
+CREATE TABLE IF NOT EXISTS cursor_rows (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    rows TEXT NOT NULL,
+    PRIMARY KEY (session_id, key)
+);
+CREATE TABLE IF NOT EXISTS entities (
+    session_id TEXT NOT NULL,
+    entity_type TEXT NOT NULL,
+    entity_id TEXT NOT NULL,
+    record TEXT NOT NULL,
+    last_mentioned REAL NOT NULL,
+    PRIMARY KEY (session_id, entity_type, entity_id)
+);
+"""
+
+# A queued write: (kind, session_id, *arguments)
+Write = Tuple[Any, ...]
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    # WAL lets readers in every worker run while one of them commits
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA busy_timeout=5000")
+    return connection
+
+def dump_result(result: ToolResult, row_keys: Dict[int, str]) -> str:
+    """
+    A tool result as JSON. A page of a paged list is stored without its rows:
+    the cursor names its rows by their key in row_keys ({id(rows): key}),
+    stored once in cursor_rows, and the page is cut from them when loaded.
+    Errors of batch lookups keep only their message.
+    """
+    def encode(part: ToolResult) -> Dict[str, Any]:
+        value = part.result
+        encoded: Dict[str, Any] = {"tool": part.tool_name, "parameters": part.parameters}
+        if part.tool_name == "plan":
+            value = [encode(step) for step in value]
+        elif part.cursor is not None:
+            cursor = part.cursor
+            encoded["cursor"] = [cursor.tool_name, cursor.parameters, row_keys[id(cursor.rows)], cursor.page_size, cursor.page]
+            return encoded
+        elif isinstance(value, list) and value and isinstance(value[0], tuple):
+            encoded["batch"] = True
+            value = [[record_id, None, str(record)] if isinstance(record, BaseException) else [record_id, record, None] for record_id, record in value]
+        encoded["result"] = value
+        return encoded
+
+    return json.dumps(encode(result), default=str)
+
+def load_result(text: Optional[str], rows_by_key: Dict[str, List[Any]]) -> Optional[ToolResult]:
+    """
+    A stored tool result, or None if it can't be restored: rows it pages
+    through are gone, or it was stored by an older version (as a pickle,
+    which is never loaded). The rendered message is stored separately, so
+    only follow-ups on that result are lost.
+    """
+    if not isinstance(text, str):
+        return None
+
+    def decode(encoded: Dict[str, Any]) -> ToolResult:
+        value = encoded.get("result")
+        if encoded["tool"] == "plan":
+            value = [decode(step) for step in value]
+        elif "cursor" in encoded:
+            tool_name, parameters, key, page_size, page = encoded["cursor"]
+            rows = rows_by_key[key]
+            start = (page - 1) * page_size
+            return ToolResult(encoded["tool"], encoded["parameters"], rows[start:start + page_size], ListCursor(tool_name, parameters, rows, page_size, page))
+        elif encoded.get("batch"):
+            value = [(record_id, RuntimeError(error) if error is not None else record) for record_id, record, error in value]
+        return ToolResult(encoded["tool"], encoded["parameters"], value)
+
+    try:
+        return decode(json.loads(text))
+    except Exception as e:
+        logger.warning(f"Could not restore a stored tool result: {e}")
+        return None
+
+class SQLiteMemory(Memory):
+    """
+    Conversation store that survives restarts and is shared by worker
+    processes, kept in a SQLite database in WAL mode.
+
+    The in-memory structures of Memory act as a hot cache of the sessions
+    this process has seen, so reads are served from memory. Writes update
+    the cache at once and are queued; a background task commits the queue
+    in one transaction every MEMORY_FLUSH_MS. Every commit bumps the
+    revision of the sessions it touches. Before a cached session is read,
+    its revision is checked against the database and the session reloaded
+    if another worker changed it. Writes from another worker show up once
+    that worker has flushed them.
+    """
+
+    def __init__(self, path: str = MEMORY_DB_PATH, flush_interval: float = MEMORY_FLUSH_MS / 1000, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.flush_interval = flush_interval
+        # Reads happen on the event loop and commits in a worker thread, each on its own connection
+        self._reader = connect(path)
+        self._reader.executescript(SCHEMA)
+        self._writer = connect(path)
+        self._pending: List[Write] = []
+        # Writes per session not yet committed; such sessions are newer in the cache than in the database
+        self._unflushed: Counter = Counter()
+        # Structure: {session_id: database revision the cached session reflects}
+        self._revisions: Dict[str, int] = {}
+        # Keys of the paged lists stored for each session, for the rows its
+        # history holds. The rows are kept here so their ID isn't reused.
+        # Structure: {session_id: {id(rows): (rows, key)}}
+        self._row_keys: Dict[str, Dict[int, Tuple[List[Any], str]]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional["asyncio.Task[None]"] = None
+        self.flushes = 0
+        self.writes = 0
+
+    # Hot cache
+
+    def _ensure_loaded(self, session_id: str) -> None:
+        """
+        Make the cached session match the database, loading it if this
+        process hasn't seen it or another worker has changed it.
+        """
+        if self._unflushed[session_id]:
+            return
+        row = self._reader.execute(
+            "SELECT revision, last_active FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            # Deleted or expired by another worker
+            if session_id in self.conversations or session_id in entity_store:
+                self._forget(session_id)
+                self._revisions.pop(session_id, None)
+            return
+        revision, last_active = row
+        if self._revisions.get(session_id) != revision:
+            self._load(session_id, revision, last_active)
+
+    def _load(self, session_id: str, revision: int, last_active: float) -> None:
+        rows = self._reader.execute(
+            "SELECT role, content, timestamp, result FROM interactions WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.history_capacity),
+        ).fetchall()
+        # Every page of a list shares the one copy of its rows
+        rows_by_key = {
+            key: json.loads(stored)
+            for key, stored in self._reader.execute("SELECT key, rows FROM cursor_rows WHERE session_id = ?", (session_id,))
+        }
+        history = self.conversations[session_id] = deque(maxlen=self.history_capacity)
+        for role, content, timestamp, result in reversed(rows):
+            history.append(Interaction(role, content, timestamp, load_result(result, rows_by_key)))
+        self._row_keys[session_id] = {id(rows): (rows, key) for key, rows in rows_by_key.items()}
+        # Rebuilt from the reloaded history when next asked for
+        self.contexts.pop(session_id, None)
+
+        indexes: Dict[str, EntityIndex] = {}
+        for entity_type, record, last_mentioned in self._reader.execute(
+            "SELECT entity_type, record, last_mentioned FROM entities WHERE session_id = ? ORDER BY last_mentioned, rowid",
+            (session_id,),
+        ):
+            indexes.setdefault(entity_type, EntityIndex()).mention(json.loads(record), last_mentioned)
+        if indexes:
+            entity_store[session_id] = indexes
+        else:
+            entity_store.pop(session_id, None)
+
+        self._measure(session_id)
+        self._revisions[session_id] = revision
+        self._schedule(session_id, last_active)
+        logger.debug(f"Loaded session {session_id} at revision {revision}: {len(history)} messages")
+
+    def _evict(self, session_id: str) -> bool:
+        # Stored sessions are only dropped from the cache and reloaded when next
+        # used; a session with writes still queued waits for them to be flushed
+        if self._unflushed[session_id]:
+            return False
+        self._forget(session_id)
+        self._revisions.pop(session_id, None)
+        return True
+
+    def _forget(self, session_id: str) -> bool:
+        self._row_keys.pop(session_id, None)
+        return super()._forget(session_id)
+
+    def _queue(self, write: Write) -> None:
+        self._pending.append(write)
+        if write[1] is not None:
+            self._unflushed[write[1]] += 1
+
+    # Memory interface
+
+    def add_interaction(self, session_id: str, role: str, content: str, result: Optional[ToolResult] = None) -> None:
+        super().add_interaction(session_id, role, content, result)
+        cursors = [part.cursor for part in result.parts if part.cursor is not None] if result is not None else []
+        if not cursors:
+            self._queue(("add", session_id, self.conversations[session_id][-1], {}))
+            return
+
+        # Rows are written once, with the first page that shows them; the
+        # database keeps as much history as memory, so rows no message here
+        # holds any more are written again if a later page shows them
+        history = self.conversations[session_id]
+        held = {id(part.cursor.rows) for interaction in history if interaction.result is not None for part in interaction.result.parts if part.cursor is not None}
+        known = self._row_keys.setdefault(session_id, {})
+        for stale in [rows_id for rows_id in known if rows_id not in held]:
+            del known[stale]
+        for cursor in cursors:
+            if id(cursor.rows) not in known:
+                key = uuid.uuid4().hex
+                known[id(cursor.rows)] = (cursor.rows, key)
+                self._queue(("rows", session_id, key, cursor.rows))
+        self._queue(("add", session_id, history[-1], {id(cursor.rows): known[id(cursor.rows)][1] for cursor in cursors}))
+
+    def _track_part(self, session_id: str, tool_result: ToolResult) -> None:
+        super()._track_part(session_id, tool_result)
+        entities = entity_store.get(session_id, {}).get(tool_result.entity_type)
+        if entities is None:
+            return
+        deleted_id = tool_result.deleted_id
+        if deleted_id is not None:
+            self._queue(("forget_entity", session_id, tool_result.entity_type, deleted_id))
+            return
+        for record in tool_result.records:
+            entity = entities.get(record["id"]) if "id" in record else None
+            if entity is not None:
+                # Copied so later mentions don't change what is written
+                self._queue(("entity", session_id, tool_result.entity_type, str(record["id"]), dict(entity)))
+
+    def clear_conversation(self, session_id: str) -> None:
+        super().clear_conversation(session_id)
+        if session_id in self.conversations:
+            self._queue(("clear", session_id))
+
+    def delete_session(self, session_id: str) -> bool:
+        existed = super().delete_session(session_id)
+        existed = existed or self._reader.execute(
+            "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone() is not None
+        self._revisions.pop(session_id, None)
+        self._queue(("delete", session_id))
+        return existed
+
+    def cleanup_old_sessions(self) -> int:
+        """
+        Evict idle sessions from the hot cache, and delete sessions that no
+        worker has used within the TTL from the database.
+        """
+        removed = super().cleanup_old_sessions()
+        for session_id in [session_id for session_id in self._revisions if session_id not in self.conversations]:
+            del self._revisions[session_id]
+        self._queue(("expire", None, time.time() - self.session_ttl * 60))
+        return removed
+
+    def get_all_sessions(self) -> List[str]:
+        stored = [session_id for session_id, in self._reader.execute("SELECT session_id FROM sessions")]
+        known = set(stored)
+        # Sessions created here whose first write isn't committed yet
+        return stored + [session_id for session_id in self._unflushed if session_id not in known]
+
+    # Write-behind
+
+    def start_background_tasks(self, *args, **kwargs) -> None:
+        super().start_background_tasks(*args, **kwargs)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def stop_background_tasks(self) -> None:
+        await super().stop_background_tasks()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        # Commit what is still queued before the process exits
+        await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Commit every queued write in one transaction, off the event loop.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            expected = {write[1]: self._revisions.get(write[1], 0) for write in batch if write[1] is not None}
+            try:
+                revisions = await asyncio.to_thread(self._commit, batch)
+            except Exception:
+                # Keep the writes for the next flush
+                logger.exception(f"Committing {len(batch)} memory writes to {self.path} failed")
+                self._pending[:0] = batch
+                return
+
+            self.flushes += 1
+            self.writes += len(batch)
+            for write in batch:
+                if write[1] is not None:
+                    self._unflushed[write[1]] -= 1
+                    if not self._unflushed[write[1]]:
+                        del self._unflushed[write[1]]
+            for session_id, (before, after) in revisions.items():
+                if after is None:
+                    self._revisions.pop(session_id, None)
+                elif before == expected[session_id]:
+                    self._revisions[session_id] = after
+                else:
+                    # Another worker wrote to the session too; reload it on its next read
+                    self._revisions.pop(session_id, None)
+
+    def _commit(self, batch: Iterable[Write]) -> Dict[str, Tuple[int, Optional[int]]]:
+        """
+        Apply a batch of writes. Returns the revision of each session
+        before and after, None after if the session was deleted.
+        """
+        connection = self._writer
+        before: Dict[str, int] = {}
+        # Structure: {session_id: latest activity}, for sessions that still exist after the batch
+        touched: Dict[str, float] = {}
+        trimmed = set()
+        entity_types = set()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for kind, session_id, *arguments in batch:
+                if session_id is not None and session_id not in before:
+                    row = connection.execute("SELECT revision FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                    before[session_id] = row[0] if row else 0
+
+                if kind == "add":
+                    interaction, row_keys = arguments
+                    result = interaction.result
+                    connection.execute(
+                        "INSERT INTO interactions (session_id, role, content, timestamp, result) VALUES (?, ?, ?, ?, ?)",
+                        (session_id, interaction.role, interaction.content, interaction.timestamp,
+                         dump_result(result, row_keys) if result is not None else None),
+                    )
+                    touched[session_id] = max(touched.get(session_id, 0.0), interaction.timestamp)
+                    trimmed.add(session_id)
+                elif kind == "rows":
+                    key, rows = arguments
+                    connection.execute(
+                        "INSERT OR REPLACE INTO cursor_rows (session_id, key, rows) VALUES (?, ?, ?)",
+                        (session_id, key, json.dumps(rows, default=str)),
+                    )
+                elif kind == "entity":
+                    entity_type, entity_id, entity = arguments
+                    connection.execute(
+                        "INSERT OR REPLACE INTO entities (session_id, entity_type, entity_id, record, last_mentioned) VALUES (?, ?, ?, ?, ?)",
+                        (session_id, entity_type, entity_id, json.dumps(entity, default=str), entity["last_mentioned"]),
+                    )
+                    touched[session_id] = max(touched.get(session_id, 0.0), entity["last_mentioned"])
+                    entity_types.add((session_id, entity_type))
+                elif kind == "forget_entity":
+                    entity_type, entity_id = arguments
+                    connection.execute(
+                        "DELETE FROM entities WHERE session_id = ? AND entity_type = ? AND entity_id = ?",
+                        (session_id, entity_type, entity_id),
+                    )
+                    touched[session_id] = max(touched.get(session_id, 0.0), time.time())
+                elif kind == "clear":
+                    for table in ("interactions", "cursor_rows"):
+                        connection.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+                    touched[session_id] = max(touched.get(session_id, 0.0), time.time())
+                elif kind == "delete":
+                    for table in ("interactions", "cursor_rows", "entities", "sessions"):
+                        connection.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+                    touched.pop(session_id, None)
+                elif kind == "expire":
+                    cutoff, = arguments
+                    for table in ("interactions", "cursor_rows", "entities"):
+                        connection.execute(
+                            f"DELETE FROM {table} WHERE session_id IN (SELECT session_id FROM sessions WHERE last_active < ?)",
+                            (cutoff,),
+                        )
+                    connection.execute("DELETE FROM sessions WHERE last_active < ?", (cutoff,))
+
+            # One revision bump per session and batch, however many writes it had
+            for session_id, last_active in touched.items():
+                connection.execute(
+                    "INSERT INTO sessions (session_id, last_active, revision) VALUES (?, ?, 1) "
+                    "ON CONFLICT (session_id) DO UPDATE SET last_active = max(last_active, excluded.last_active), revision = revision + 1",
+                    (session_id, last_active),
+                )
+
+            # Only as much as the hot cache holds is ever read back
+            for session_id in trimmed & touched.keys():
+                connection.execute(
+                    "DELETE FROM interactions WHERE session_id = ? AND id NOT IN "
+                    "(SELECT id FROM interactions WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, self.history_capacity),
+                )
+                # Rows no stored page refers to any more; keys are unique hex strings
+                connection.execute(
+                    "DELETE FROM cursor_rows WHERE session_id = ? AND NOT EXISTS "
+                    "(SELECT 1 FROM interactions WHERE interactions.session_id = cursor_rows.session_id AND instr(interactions.result, cursor_rows.key))",
+                    (session_id,),
+                )
+            for session_id, entity_type in entity_types:
+                if session_id in touched:
+                    connection.execute(
+                        "DELETE FROM entities WHERE session_id = ? AND entity_type = ? AND rowid NOT IN "
+                        "(SELECT rowid FROM entities WHERE session_id = ? AND entity_type = ? ORDER BY last_mentioned DESC LIMIT ?)",
+                        (session_id, entity_type, session_id, entity_type, ENTITY_INDEX_CAPACITY),
+                    )
+
+            after = {}
+            for session_id in before:
+                row = connection.execute("SELECT revision FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                after[session_id] = row[0] if row else None
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return {session_id: (before[session_id], after[session_id]) for session_id in before}
+
+    def close(self) -> None:
+        self._reader.close()
+        self._writer.close()
@@ -0,0 +1,232 @@
+import bisect
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from results import ToolResult
+
+# Company suffixes ignored when comparing names, so "Acme" matches "Acme Inc."
+NAME_SUFFIXES = {"inc", "incorporated", "llc", "ltd", "limited", "co", "corp", "corporation", "company", "gmbh", "plc"}
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy match
+FUZZY_THRESHOLD = 0.6
+
+# Bounds on one fuzzy lookup: IDs read from trigram postings, and names
+# (those sharing the most rare trigrams with the query) scored in full
+MAX_FUZZY_POSTINGS = 20000
+MAX_FUZZY_CANDIDATES = 50
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+class NameMatch(NamedTuple):
+    id: str
+    name: str
+    # 1.0 exact, 0.9 prefix, otherwise trigram similarity
+    score: float
+
+def best_match(candidates: List[NameMatch]) -> Optional[NameMatch]:
+    """
+    The first of a ranked list of candidates, unless it is tied with the second.
+    """
+    if not candidates:
+        return None
+    if len(candidates) > 1 and candidates[1].score == candidates[0].score:
+        return None
+    return candidates[0]
+
+def normalize_name(name: str) -> str:
+    """
+    Case-fold a name, drop punctuation and company suffixes.
+    """
+    words = _NON_WORD.sub(" ", name.casefold()).split()
+    significant = [word for word in words if word not in NAME_SUFFIXES]
+    return " ".join(significant or words)
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    """
+    In-memory index from entity names to IDs, fed from tool results.
+
+    Exact and prefix lookups use the normalized name; misspellings fall back
+    to trigram similarity. Every lookup touches only the names that share a
+    key, prefix or trigram with the query, never the whole table. IDs are
+    kept as strings, the form tool parameters use.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        # Structure: {id: (name, normalized_name)}
+        self._entries: Dict[str, Tuple[str, str]] = {}
+        # Structure: {normalized_name: {ids}}
+        self._ids_by_key: Dict[str, Set[str]] = {}
+        # Structure: {trigram: {ids}}
+        self._ids_by_trigram: Dict[str, Set[str]] = {}
+        # Sorted normalized names for prefix lookups, rebuilt lazily after changes
+        self._sorted_keys: Optional[List[str]] = None
+        # Last complete listing indexed, so a cached listing isn't indexed twice
+        self._last_listing: Any = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entity_id: Any, name: str) -> None:
+        """
+        Index a name, replacing the previous name of the same ID.
+        """
+        entity_id = str(entity_id)
+        entry = self._entries.get(entity_id)
+        if entry is not None:
+            if entry[0] == name:
+                return
+            self.remove(entity_id)
+
+        key = normalize_name(name)
+        if not key:
+            return
+        self._entries[entity_id] = (name, key)
+        if key not in self._ids_by_key:
+            self._sorted_keys = None
+        self._ids_by_key.setdefault(key, set()).add(entity_id)
+        for trigram in trigrams(key):
+            self._ids_by_trigram.setdefault(trigram, set()).add(entity_id)
+
+    def remove(self, entity_id: Any) -> None:
+        entity_id = str(entity_id)
+        entry = self._entries.pop(entity_id, None)
+        if entry is None:
+            return
+
+        key = entry[1]
+        ids = self._ids_by_key[key]
+        ids.discard(entity_id)
+        if not ids:
+            del self._ids_by_key[key]
+            self._sorted_keys = None
+        for trigram in trigrams(key):
+            ids = self._ids_by_trigram.get(trigram)
+            if ids is not None:
+                ids.discard(entity_id)
+                if not ids:
+                    del self._ids_by_trigram[trigram]
+
+    def update(self, records: Iterable[Dict[str, Any]], name_field: str = "name") -> None:
+        """
+        Index the names of a batch of records.
+        """
+        for record in records:
+            if "id" in record and record.get(name_field):
+                self.add(record["id"], str(record[name_field]))
+
+    def replace(self, listing: List[Dict[str, Any]], name_field: str = "name") -> None:
+        """
+        Index a listing of the whole table, dropping IDs that are no longer
+        in it. Indexing the same (cached) listing again is a no-op.
+        """
+        if listing is self._last_listing:
+            return
+        self._last_listing = listing
+
+        self.update(listing, name_field)
+        seen = {str(record["id"]) for record in listing if "id" in record}
+        for entity_id in [entity_id for entity_id in self._entries if entity_id not in seen]:
+            self.remove(entity_id)
+
+    def matches(self, query: str, limit: int = 5) -> List[NameMatch]:
+        """
+        Candidate entities for a name, best first: exact matches, then
+        names starting with the query, then similar names.
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+
+        exact = self._ids_by_key.get(key)
+        if exact:
+            return self._ranked({entity_id: 1.0 for entity_id in exact}, limit)
+
+        prefixed = {}
+        keys = self._prefix_keys()
+        position = bisect.bisect_left(keys, key)
+        while position < len(keys) and keys[position].startswith(key) and len(prefixed) < limit:
+            for entity_id in self._ids_by_key[keys[position]]:
+                prefixed[entity_id] = 0.9
+            position += 1
+        if prefixed:
+            return self._ranked(prefixed, limit)
+
+        return self._ranked(self._similar(key), limit)
+
+    def resolve(self, query: str) -> Optional[NameMatch]:
+        """
+        The single entity a name refers to, or None if there is no match or
+        the best match is tied.
+        """
+        return best_match(self.matches(query, limit=2))
+
+    def _similar(self, key: str) -> Dict[str, float]:
+        query_trigrams = trigrams(key)
+        # Reaching the threshold takes at least this many of the query's trigrams...
+        needed = math.ceil(FUZZY_THRESHOLD * len(query_trigrams) / (2 - FUZZY_THRESHOLD))
+        # ...so a match appears in at least one of the rarest len - needed + 1 postings
+        postings = sorted((self._ids_by_trigram.get(trigram, ()) for trigram in query_trigrams), key=len)
+
+        shared = Counter()
+        scanned = 0
+        for ids in postings[:len(postings) - needed + 1]:
+            if scanned and scanned + len(ids) > MAX_FUZZY_POSTINGS:
+                # Bound the work; the rarest trigrams are the most telling anyway
+                break
+            shared.update(ids)
+            scanned += len(ids)
+
+        scores = {}
+        for entity_id, _ in shared.most_common(MAX_FUZZY_CANDIDATES):
+            candidate_trigrams = trigrams(self._entries[entity_id][1])
+            score = 2 * len(query_trigrams & candidate_trigrams) / (len(query_trigrams) + len(candidate_trigrams))
+            if score >= FUZZY_THRESHOLD:
+                scores[entity_id] = score
+        return scores
+
+    def _ranked(self, scores: Dict[str, float], limit: int) -> List[NameMatch]:
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._entries[item[0]][0]))
+        return [NameMatch(entity_id, self._entries[entity_id][0], round(score, 3)) for entity_id, score in ranked[:limit]]
+
+    def _prefix_keys(self) -> List[str]:
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._ids_by_key)
+        return self._sorted_keys
+
+# Shared across sessions: names come from the backend, not from a conversation
+client_names = NameIndex()
+campaign_names = NameIndex()
+
+# List parameters that make a listing cover only part of the table
+LISTING_NARROWERS = ("filters", "limit", "offset", "fields")
+
+NAME_INDEXES = {
+    "clients": client_names,
+    "campaigns": campaign_names,
+}
+
+def index_result(tool_result: ToolResult) -> None:
+    """
+    Feed the names in a tool result to the matching index. An unfiltered,
+    unpaginated listing also drops names that no longer exist.
+    """
+    for part in tool_result.parts:
+        index = NAME_INDEXES.get(part.entity_type)
+        if index is None:
+            continue
+
+        if part.deleted_id is not None:
+            index.remove(part.deleted_id)
+        elif part.tool_name.startswith("list_") and not any(part.parameters.get(name) for name in LISTING_NARROWERS):
+            index.replace(part.result)
+        else:
+            index.update(part.records)
@@ -0,0 +1,438 @@
+import logging
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Renderers are generators that yield the response in chunks (header, runs
+# of rows, suggestions footer). Joining the chunks once keeps rendering linear
+# in the number of rows, and the same chunks can be streamed.
+Renderer = Callable[[Any, Dict[str, Any]], Iterator[str]]
+
+# Rows rendered into one chunk
+CHUNK_ROWS = 500
+
+def next_steps(*suggestions: str, separator: str = "\n\n") -> str:
+    """
+    Format the proactive suggestions footer.
+    """
+    lines = "".join(f"- {suggestion}\n" for suggestion in suggestions)
+    return f"{separator}---\n\n**What would you like to do next?**\n{lines}"
+
+LIST_CLIENTS_NEXT = next_steps(
+    "Add a new client",
+    "Get details about a specific client",
+    "Update a client's information",
+    "List campaigns",
+    separator="\n",
+)
+LIST_CAMPAIGNS_NEXT = next_steps(
+    "Add a new campaign",
+    "Get details about a specific campaign",
+    "List content ideas",
+    separator="\n",
+)
+LIST_CONTENT_IDEAS_NEXT = next_steps(
+    "Add a new content idea",
+    "Get details about a specific idea",
+    "List campaigns",
+    separator="\n",
+)
+MARKETING_DATA_NEXT = next_steps(
+    "List campaigns",
+    "List content ideas",
+    "List clients",
+    separator="\n",
+)
+CLIENT_DETAILS_NEXT = next_steps(
+    "Update this client's information",
+    "Delete this client",
+    "List all clients",
+    "Add a campaign for this client",
+)
+CAMPAIGN_DETAILS_NEXT = next_steps(
+    "List all campaigns",
+    "Add content ideas for this campaign",
+    "View marketing data",
+)
+CONTENT_IDEA_DETAILS_NEXT = next_steps(
+    "List all content ideas",
+    "Add another content idea",
+)
+CLIENT_ADDED_NEXT = next_steps(
+    "Add another client",
+    "Update this client's information",
+    "List all clients",
+    "Add a campaign for this client",
+)
+CAMPAIGN_ADDED_NEXT = next_steps(
+    "Add another campaign",
+    "Add content ideas for this campaign",
+    "List all campaigns",
+)
+CONTENT_IDEA_ADDED_NEXT = next_steps(
+    "Add another content idea",
+    "List all content ideas",
+    "View marketing data",
+)
+
+MARKETING_TABLE_HEADER = (
+    "| Month | Revenue | Spend | ROI | Client |\n"
+    "|-------|---------|-------|-----|--------|\n"
+)
+MARKETING_DATA_HEADER = "### Marketing Performance Data\n\n" + MARKETING_TABLE_HEADER
+MARKETING_ANALYSIS_NEXT = next_steps(
+    "Show ROI by client",
+    "Show the top 5 clients by revenue",
+    "Show the spend trend for the last 6 months",
+    "Compare Q1 vs Q2",
+    separator="\n",
+)
+METRIC_LABELS = {"revenue": "Revenue", "spend": "Spend", "roi": "ROI"}
+
+def describe_list_query(parameters: Dict[str, Any]) -> str:
+    """
+    Describe the filters of a list command, e.g. "niche = fintech".
+    """
+    filters = (parameters or {}).get("filters") or {}
+    return ", ".join(f"{field} = {value}" for field, value in filters.items())
+
+def describe_page(parameters: Dict[str, Any], first: int, last: int) -> str:
+    """
+    Position of a page within a paged list, and how to move on from it.
+    """
+    page, total = parameters["page"], parameters["total"]
+    pages = -(-total // parameters["page_size"])
+    hint = 'say "next page" for more' if page < pages else 'say "previous page" to go back'
+    return f"\n*Showing {first}-{last} of {total} (page {page} of {pages}); {hint}.*\n"
+
+# Detail formatters
+def format_client_details(client: Dict[str, Any]) -> str:
+    """
+    Format the body of a client details block.
+    """
+    parts = [
+        f"**{client['name']}** (ID: {client['id']})\n\n",
+        f"- **Niche:** {client['niche'] or 'Not specified'}\n",
+        f"- **Contact Person:** {client['contact_person'] or 'Not specified'}\n",
+        f"- **Contact Email:** {client['contact_email'] or 'Not specified'}\n",
+        f"- **Notes:** {client['notes'] or 'None'}\n",
+    ]
+    if client.get('industry'):
+        parts.append(f"- **Industry:** {client['industry']}\n")
+    if client.get('satisfaction') is not None:
+        parts.append(f"- **Satisfaction:** {client['satisfaction']}\n")
+    if client.get('tier'):
+        parts.append(f"- **Tier:** {client['tier']}\n")
+    parts.append(f"\n*Created: {client['created_at']}*\n")
+    parts.append(f"*Last Updated: {client['updated_at']}*")
+    return "".join(parts)
+
+def format_campaign_details(campaign: Dict[str, Any]) -> str:
+    """
+    Format the body of a campaign details block.
+    """
+    parts = [
+        f"**{campaign['name']}** (ID: {campaign['id']})\n\n",
+        f"- **Status:** {campaign['status'] or 'Not specified'}\n",
+        f"- **Client:** {campaign['client'] or 'Not specified'}\n",
+        f"- **Budget:** {campaign['budget'] or 'Not specified'}\n",
+        f"- **Start Date:** {campaign['startDate'] or 'Not specified'}\n",
+        f"- **End Date:** {campaign['endDate'] or 'Not specified'}\n",
+        f"- **Target Audience:** {campaign['targetAudience'] or 'Not specified'}\n",
+    ]
+    if campaign.get('channels'):
+        channels = campaign['channels']
+        if isinstance(channels, list):
+            parts.append(f"- **Channels:** {', '.join(channels)}\n")
+        else:
+            parts.append(f"- **Channels:** {channels}\n")
+    return "".join(parts)
+
+def format_content_idea_details(idea: Dict[str, Any]) -> str:
+    """
+    Format the body of a content idea details block.
+    """
+    return (
+        f"**{idea['title']}** (ID: {idea['id']})\n\n"
+        f"- **Type:** {idea['type'] or 'Not specified'}\n"
+        f"- **Status:** {idea['status'] or 'New'}\n"
+        f"- **Priority:** {idea['priority'] or 'Medium'}\n"
+        f"- **Client:** {idea['client'] or 'Not specified'}\n"
+    )
+
+# Row formatters for list responses
+def format_client_row(index: int, client: Dict[str, Any]) -> str:
+    niche = f"   - Niche: {client['niche'] or 'Not specified'}\n" if 'niche' in client else ""
+    contact = f"   - Contact: {client['contact_person']}\n" if client.get('contact_person') else ""
+    email = f"   - Email: {client['contact_email']}\n" if client.get('contact_email') else ""
+    return f"{index}. **{client['name']}**\n   - ID: {client['id']}\n{niche}{contact}{email}"
+
+def format_campaign_row(index: int, campaign: Dict[str, Any]) -> str:
+    status = f"   - Status: {campaign['status'] or 'Not specified'}\n" if 'status' in campaign else ""
+    client = f"   - Client: {campaign['client'] or 'Not specified'}\n" if 'client' in campaign else ""
+    budget = f"   - Budget: {campaign['budget']}\n" if campaign.get('budget') else ""
+    start = f"   - Start Date: {campaign['startDate']}\n" if campaign.get('startDate') else ""
+    end = f"   - End Date: {campaign['endDate']}\n" if campaign.get('endDate') else ""
+    return f"{index}. **{campaign['name']}**\n   - ID: {campaign['id']}\n{status}{client}{budget}{start}{end}"
+
+def format_content_idea_row(index: int, idea: Dict[str, Any]) -> str:
+    content_type = f"   - Type: {idea['type'] or 'Not specified'}\n" if 'type' in idea else ""
+    status = f"   - Status: {idea['status'] or 'New'}\n" if 'status' in idea else ""
+    priority = f"   - Priority: {idea['priority'] or 'Medium'}\n" if 'priority' in idea else ""
+    client = f"   - Client: {idea['client']}\n" if idea.get('client') else ""
+    return f"{index}. **{idea['title']}**\n   - ID: {idea['id']}\n{content_type}{status}{priority}{client}"
+
+def format_marketing_row(data: Dict[str, Any]) -> str:
+    return f"| {data['month']} | ${data['revenue']} | ${data['spend']} | {data['roi']}x | {data['client']} |\n"
+
+# Per-tool renderers
+def iter_list(title: str, empty: str, row: Callable[[int, Dict[str, Any]], str], footer: str, result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    """
+    Render a numbered list response: header, one chunk per run of rows, footer.
+    A page of a longer list is numbered from its position in the whole list.
+    """
+    filters = describe_list_query(parameters)
+    if not result:
+        yield f"{empty} matching {filters}." if filters else f"{empty}."
+        return
+
+    yield f"### {title}\n*Filtered by {filters}*\n" if filters else f"### {title}\n"
+    first = (parameters.get("page", 1) - 1) * parameters.get("page_size", 0) + 1
+    for start in range(0, len(result), CHUNK_ROWS):
+        chunk = result[start:start + CHUNK_ROWS]
+        yield "".join([row(index, record) for index, record in enumerate(chunk, first + start)])
+    if "page" in parameters:
+        yield describe_page(parameters, first, first + len(result) - 1)
+    yield footer
+
+def iter_list_clients(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    return iter_list("Client List", "No clients found", format_client_row, LIST_CLIENTS_NEXT, result, parameters)
+
+def iter_list_campaigns(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    return iter_list("Campaign List", "No campaigns found", format_campaign_row, LIST_CAMPAIGNS_NEXT, result, parameters)
+
+def iter_list_content_ideas(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    return iter_list("Content Ideas List", "No content ideas found", format_content_idea_row, LIST_CONTENT_IDEAS_NEXT, result, parameters)
+
+def describe_marketing_slice(description: Dict[str, Any]) -> str:
+    """
+    The client and months a marketing data slice covers, e.g. "Acme, 2024-03 to 2024-06".
+    """
+    parts = []
+    if description.get("client"):
+        parts.append(description["client"])
+    if description.get("start"):
+        start, end = description["start"], description.get("end")
+        parts.append(start if not end or end == start else f"{start} to {end}")
+    return ", ".join(parts)
+
+def iter_marketing_slice(result: Dict[str, Any], parameters: Dict[str, Any]) -> Iterator[str]:
+    description = describe_marketing_slice(result["slice"])
+    if result["totals"] is None:
+        yield f"I couldn't find marketing data for client '{parameters.get('client')}'."
+        return
+    if not result["rows"]:
+        yield f"No marketing data found for {description}."
+        return
+
+    totals = result["totals"]
+    metric = parameters.get("metric")
+    yield f"### Marketing Performance: {description}\n\n"
+    if metric in METRIC_LABELS:
+        yield f"**{METRIC_LABELS[metric]}:** {format_metric(metric, totals[metric])}\n\n"
+    yield f"*Totals: revenue {format_metric('revenue', totals['revenue'])}, spend {format_metric('spend', totals['spend'])}, ROI {format_metric('roi', totals['roi'])} over {len(result['rows'])} rows*\n\n"
+    yield MARKETING_TABLE_HEADER
+    rows = result["rows"]
+    for start in range(0, len(rows), CHUNK_ROWS):
+        yield "".join([format_marketing_row(data) for data in rows[start:start + CHUNK_ROWS]])
+    yield MARKETING_DATA_NEXT
+
+def iter_marketing_data(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    if isinstance(result, dict) and "slice" in result:
+        yield from iter_marketing_slice(result, parameters)
+        return
+    if not result:
+        yield "No marketing data available."
+        return
+
+    yield MARKETING_DATA_HEADER
+    for start in range(0, len(result), CHUNK_ROWS):
+        yield "".join([format_marketing_row(data) for data in result[start:start + CHUNK_ROWS]])
+    yield MARKETING_DATA_NEXT
+
+def format_metric(metric: str, value: Any) -> str:
+    if value is None:
+        return "-"
+    return f"{value}x" if metric == "roi" else f"${value:,.2f}"
+
+def format_delta(metric: str, value: Any) -> str:
+    if value is None:
+        return "-"
+    sign = "-" if value < 0 else "+"
+    return f"{sign}{abs(value)}x" if metric == "roi" else f"{sign}${abs(value):,.2f}"
+
+def format_percent(value: Any) -> str:
+    return "-" if value is None else f"{value:+.2f}%"
+
+def iter_marketing_analysis(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    """
+    Render an analyze_marketing_data result as a markdown table.
+    """
+    rows = (result or {}).get("rows")
+    if not rows:
+        yield "No marketing data available."
+        return
+
+    analysis = result["analysis"]
+    if analysis in ("roi_by_client", "top_clients"):
+        if analysis == "top_clients":
+            yield f"### Top {result['limit']} Clients by {METRIC_LABELS[result['metric']]}\n\n"
+        else:
+            yield "### ROI by Client\n\n"
+        yield "| # | Client | Revenue | Spend | ROI |\n|---|--------|---------|-------|-----|\n"
+        for start in range(0, len(rows), CHUNK_ROWS):
+            yield "".join([
+                f"| {index} | {row['client']} | {format_metric('revenue', row['revenue'])} | {format_metric('spend', row['spend'])} | {format_metric('roi', row['roi'])} |\n"
+                for index, row in enumerate(rows[start:start + CHUNK_ROWS], start + 1)
+            ])
+    elif analysis == "trend":
+        metric = result["metric"]
+        label = METRIC_LABELS[metric]
+        yield f"### {label} Trend (Last {result['months']} Months)\n\n"
+        yield f"| Month | {label} | Change | Rolling Average |\n|-------|------|--------|-----------------|\n"
+        yield "".join([
+            f"| {row['month']} | {format_metric(metric, row[metric])} | {format_delta(metric, row['change'])} | {format_metric(metric, row['rolling_average'])} |\n"
+            for row in rows
+        ])
+    elif analysis == "compare_quarters":
+        yield f"### {' vs '.join(row['period'] for row in rows)}\n\n"
+        yield "| Period | Revenue | Spend | ROI |\n|--------|---------|-------|-----|\n"
+        for row in rows:
+            yield f"| {row['period']} | {format_metric('revenue', row['revenue'])} | {format_metric('spend', row['spend'])} | {format_metric('roi', row['roi'])} |\n"
+            if "change" in row:
+                change = row["change"]
+                yield f"| Change | {format_percent(change['revenue'])} | {format_percent(change['spend'])} | {format_percent(change['roi'])} |\n"
+    yield MARKETING_ANALYSIS_NEXT
+
+def iter_client_details(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    if not result:
+        yield f"I couldn't find a client with ID {parameters.get('id')}. Please check the ID and try again."
+        return
+    yield "### Client Details\n\n"
+    yield format_client_details(result)
+    yield CLIENT_DETAILS_NEXT
+
+def iter_campaign_details(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    if not result:
+        yield f"I couldn't find a campaign with ID {parameters.get('id')}. Please check the ID and try again."
+        return
+    yield "### Campaign Details\n\n"
+    yield format_campaign_details(result)
+    yield CAMPAIGN_DETAILS_NEXT
+
+def iter_content_idea_details(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    if not result:
+        yield f"I couldn't find a content idea with ID {parameters.get('id')}. Please check the ID and try again."
+        return
+    yield "### Content Idea Details\n\n"
+    yield format_content_idea_details(result)
+    yield CONTENT_IDEA_DETAILS_NEXT
+
+def iter_client_added(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    yield f"### Client Added\nSuccessfully added client: **{result['name']}** with ID: **{result['id']}**"
+    yield CLIENT_ADDED_NEXT
+
+def iter_campaign_added(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    yield f"### Campaign Added\nSuccessfully added campaign: **{result['name']}** with ID: **{result['id']}**"
+    yield CAMPAIGN_ADDED_NEXT
+
+def iter_content_idea_added(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    yield f"### Content Idea Added\nSuccessfully added content idea: **{result['title']}** with ID: **{result['id']}**"
+    yield CONTENT_IDEA_ADDED_NEXT
+
+def iter_client_updated(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    yield "Client updated successfully! The changes have been applied to the client record."
+
+def iter_client_deleted(result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    yield "Client deleted successfully. The client has been removed from the database."
+
+# Batch lookups: tool name -> (block title, entity label, details formatter, suggestions footer)
+BATCH_DETAILS: Dict[str, Tuple[str, str, Callable[[Dict[str, Any]], str], str]] = {
+    "get_clients": ("Client Details", "client", format_client_details, next_steps(
+        "Update a client's information",
+        "List all clients",
+        "Add a campaign for one of these clients",
+    )),
+    "get_campaigns": ("Campaign Details", "campaign", format_campaign_details, next_steps(
+        "List all campaigns",
+        "Add content ideas for one of these campaigns",
+        "View marketing data",
+    )),
+    "get_content_ideas": ("Content Idea Details", "content idea", format_content_idea_details, next_steps(
+        "List all content ideas",
+        "Add another content idea",
+    )),
+}
+
+def format_batch_record(label: str, formatter: Callable[[Dict[str, Any]], str], record_id: str, record: Any) -> str:
+    """
+    Format one record of a batch lookup, or the reason it couldn't be fetched.
+    """
+    if isinstance(record, httpx.HTTPStatusError) and record.response.status_code == 404:
+        return f"**{label.capitalize()} {record_id}:** I couldn't find a {label} with this ID."
+    if isinstance(record, Exception):
+        return f"**{label.capitalize()} {record_id}:** Sorry, I encountered an error: {str(record)}"
+    if not record:
+        return f"**{label.capitalize()} {record_id}:** I couldn't find a {label} with this ID."
+    return formatter(record).rstrip("\n")
+
+def iter_batch_details(tool_name: str, results: List[Tuple[str, Any]], parameters: Dict[str, Any]) -> Iterator[str]:
+    """
+    Render a batch lookup as one combined details block, reporting failures
+    per ID instead of failing the whole response.
+    """
+    title, label, formatter, footer = BATCH_DETAILS[tool_name]
+    yield f"### {title}\n\n"
+    for position, (record_id, record) in enumerate(results):
+        separator = "\n\n---\n\n" if position else ""
+        yield separator + format_batch_record(label, formatter, record_id, record)
+    yield footer
+
+RENDERERS: Dict[str, Renderer] = {
+    "list_clients": iter_list_clients,
+    "get_client_details": iter_client_details,
+    "add_client": iter_client_added,
+    "update_client": iter_client_updated,
+    "delete_client": iter_client_deleted,
+    "list_campaigns": iter_list_campaigns,
+    "get_campaign": iter_campaign_details,
+    "add_campaign": iter_campaign_added,
+    "list_content_ideas": iter_list_content_ideas,
+    "get_content_idea": iter_content_idea_details,
+    "add_content_idea": iter_content_idea_added,
+    "get_marketing_data": iter_marketing_data,
+    "analyze_marketing_data": iter_marketing_analysis,
+    "get_clients": partial(iter_batch_details, "get_clients"),
+    "get_campaigns": partial(iter_batch_details, "get_campaigns"),
+    "get_content_ideas": partial(iter_batch_details, "get_content_ideas"),
+}
+
+def iter_render(tool_name: str, result: Any, parameters: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield the markdown response for a tool result in chunks.
+    """
+    renderer = RENDERERS.get(tool_name)
+    if renderer is None:
+        # Generic response for other tools
+        yield f"Operation completed successfully. Result: {result}"
+        return
+    yield from renderer(result, parameters)
+
+def render(tool_name: str, result: Any, parameters: Dict[str, Any]) -> str:
+    """
+    Render the markdown response for a tool result.
+    """
+    return "".join(iter_render(tool_name, result, parameters))
@@ -0,0 +1,141 @@
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+# Entity type of the records each tool works on
+ENTITY_TYPES = {
+    "list_clients": "clients",
+    "get_client": "clients",
+    "get_client_details": "clients",
+    "get_clients": "clients",
+    "add_client": "clients",
+    "update_client": "clients",
+    "delete_client": "clients",
+    "list_campaigns": "campaigns",
+    "get_campaign": "campaigns",
+    "get_campaigns": "campaigns",
+    "add_campaign": "campaigns",
+    "list_content_ideas": "content_ideas",
+    "get_content_idea": "content_ideas",
+    "get_content_ideas": "content_ideas",
+    "add_content_idea": "content_ideas",
+}
+
+# Parameters added when a list result is paged; reported separately in JSON
+PAGE_PARAMETERS = ("page", "page_size", "total")
+
+# Keys the backend wraps a written record in, e.g. {"message": ..., "client": {...}}
+RECORD_KEYS = ("client", "campaign", "content_idea")
+
+@dataclass
+class ToolResult:
+    """
+    Structured outcome of a tool call, stored in memory next to the rendered
+    markdown so entity tracking and context resolution can read typed records
+    instead of re-parsing the text.
+    """
+    tool_name: str
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    # Raw value returned by the tool, or the rows of one page of a list
+    result: Any = None
+    # Set when `result` is one page of a longer list
+    cursor: Optional["ListCursor"] = None
+
+    @property
+    def entity_type(self) -> Optional[str]:
+        """
+        "clients", "campaigns" or "content_ideas", or None for other tools.
+        """
+        return ENTITY_TYPES.get(self.tool_name)
+
+    @property
+    def parts(self) -> List["ToolResult"]:
+        """
+        The results of each step of a compound prompt, or just this result.
+        """
+        return self.result if self.tool_name == "plan" else [self]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-ready form of the result for the JSON response mode. The raw
+        records are included as they are, not copied.
+        """
+        if self.tool_name == "plan":
+            return {"tool": "plan", "steps": [part.to_dict() for part in self.parts]}
+        if self.tool_name == "respond":
+            return {"tool": "respond", "message": self.result}
+        if self.tool_name == "error":
+            return {"tool": self.parameters.get("tool_name"), "error": self.result}
+
+        result = self.result
+        if isinstance(result, list) and result and isinstance(result[0], tuple):
+            # Batch lookups: report each ID's record or error
+            result = [
+                {"id": record_id, "error": str(record)} if isinstance(record, Exception) else {"id": record_id, "record": record}
+                for record_id, record in result
+            ]
+
+        parameters = {name: value for name, value in self.parameters.items() if name not in PAGE_PARAMETERS}
+        payload = {"tool": self.tool_name, "parameters": parameters, "data": result}
+        if self.cursor is not None:
+            payload["page"] = {
+                "number": self.cursor.page,
+                "size": self.cursor.page_size,
+                "pages": self.cursor.pages,
+                "total": len(self.cursor.rows),
+            }
+        return payload
+
+    @property
+    def deleted_id(self) -> Optional[str]:
+        """
+        ID of the record removed by a delete tool.
+        """
+        if self.tool_name.startswith("delete_") and self.parameters.get("id") is not None:
+            return str(self.parameters["id"])
+        return None
+
+    @cached_property
+    def records(self) -> List[Dict[str, Any]]:
+        """
+        Records carried by the result: the rows of a list, a fetched or
+        written record, or the successful lookups of a batch.
+        """
+        result = self.result
+        if isinstance(result, dict):
+            for key in RECORD_KEYS:
+                if isinstance(result.get(key), dict):
+                    return [result[key]]
+            return [result] if "id" in result else []
+        if not isinstance(result, list):
+            return []
+        if result and isinstance(result[0], tuple):
+            # Batch lookups: [(id, record or exception)]
+            return [record for _, record in result if isinstance(record, dict) and record]
+        return [record for record in result if isinstance(record, dict)]
+
+@dataclass
+class ListCursor:
+    """
+    Position in a list result paged across the turns of a session. Holds all
+    the rows, so later pages are served without refetching.
+    """
+    tool_name: str
+    parameters: Dict[str, Any]
+    rows: List[Any]
+    page_size: int
+    page: int = 1
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def page_result(self, page: int, page_size: Optional[int] = None) -> ToolResult:
+        """
+        The tool result showing one page of the rows.
+        """
+        page_size = page_size or self.page_size
+        start = (page - 1) * page_size
+        cursor = ListCursor(self.tool_name, self.parameters, self.rows, page_size, page)
+        parameters = {**self.parameters, "page": page, "page_size": page_size, "total": len(self.rows)}
+        return ToolResult(self.tool_name, parameters, self.rows[start:start + page_size], cursor)
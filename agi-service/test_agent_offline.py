@@ -0,0 +1,254 @@
+"""
+Checks of the agent's routing, caching, paging and session memory that run
+without the backend: HTTP calls go to an in-process mock of its API.
+Unlike test_agent.py and test_new_tools.py, these run under pytest:
+
+    python -m pytest test_agent_offline.py
+"""
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+import agent
+import intent_classifier
+import memory as memory_module
+import tools
+from memory import Memory, SessionContext
+from memory_sqlite import SQLiteMemory
+from results import ListCursor, ToolResult
+
+CLIENTS = [{"id": i, "name": f"Client {i}", "niche": "retail"} for i in range(1, 121)]
+CAMPAIGNS = [{"id": i, "name": f"Campaign {i}", "status": "active", "client": "Client 1"} for i in range(1, 6)]
+
+@pytest.fixture
+def backend():
+    """
+    Route the tools' HTTP client to a mock backend; returns a Counter of the
+    (method, path) requests it served.
+    """
+    calls = Counter()
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        calls[(request.method, request.url.path)] += 1
+        table = {"clients": CLIENTS, "campaigns": CAMPAIGNS}[request.url.path.split("/")[2]]
+        if request.method == "GET":
+            return httpx.Response(200, json=table)
+        return httpx.Response(200, json={**json.loads(request.content or b"{}"), "id": 1})
+
+    saved = tools._http_client
+    tools._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    tools.tool_cache.clear()
+    yield calls
+    tools.tool_cache.clear()
+    tools._http_client = saved
+
+def run(tool_name, parameters=None):
+    return asyncio.run(tools.get_tool(tool_name)["execute"](parameters or {}))
+
+# Plan splitting
+
+def test_plan_splits_compound_prompts():
+    session = SessionContext()
+    assert agent.select_plan("list clients and list campaigns", session) == [("list_clients", {}), ("list_campaigns", {})]
+    assert agent.select_plan("list campaigns, then show marketing data", session) == [("list_campaigns", {}), ("get_marketing_data", {})]
+
+def test_plan_lets_analytics_phrasings_start_a_piece():
+    steps = agent.select_plan("list clients and top 5 clients by revenue", SessionContext())
+    assert [tool_name for tool_name, _ in steps] == ["list_clients", "analyze_marketing_data"]
+    assert steps[1][1]["analysis"] == "top_clients"
+
+@pytest.mark.parametrize("prompt", [
+    "add client named Smith and Jones",
+    "add idea titled How to list clients and show data",
+    'add a content idea titled "list clients and show data" for client 1',
+    "show clients 3, 7 and 12",
+])
+def test_plan_leaves_single_commands_whole(prompt):
+    assert agent.select_plan(prompt, SessionContext()) is None
+
+# Cache invalidation
+
+def test_invalidations_name_cached_tools():
+    for write, reads in tools.CACHE_INVALIDATIONS.items():
+        assert tools.get_tool(write) is not None
+        for read in reads:
+            assert read in tools.CACHE_TTLS, f"{write} invalidates {read}, which isn't cached"
+
+def test_client_writes_drop_the_lists_that_carry_client_names(backend):
+    run("list_campaigns")
+    run("list_campaigns")
+    assert backend[("GET", "/api/campaigns")] == 1
+
+    run("update_client", {"id": "1", "name": "Renamed"})
+    run("list_campaigns")
+    assert backend[("GET", "/api/campaigns")] == 2
+
+    run("delete_client", {"id": "1"})
+    run("list_campaigns")
+    assert backend[("GET", "/api/campaigns")] == 3
+
+def test_add_client_drops_the_client_list_only(backend):
+    run("list_clients")
+    run("list_campaigns")
+    run("add_client", {"name": "New"})
+    run("list_clients")
+    run("list_campaigns")
+    assert backend[("GET", "/api/clients")] == 2
+    assert backend[("GET", "/api/campaigns")] == 1
+
+# Paging
+
+def prompt(text, session, context=None):
+    _, result = asyncio.run(agent.process_prompt(text, "s", session, context))
+    if result is not None:
+        session.update(result, time.time())
+    return result
+
+def test_paging_serves_later_pages_from_the_cursor(backend):
+    session = SessionContext()
+    first = prompt("list clients", session)
+    assert [row["id"] for row in first.result] == list(range(1, 51))
+    assert first.parameters["total"] == 120
+
+    second = prompt("next page", session)
+    assert [row["id"] for row in second.result] == list(range(51, 101))
+    assert second.cursor.rows is first.cursor.rows
+    assert prompt("last page", session).result[-1]["id"] == 120
+    assert prompt("next page", session).result == "That was the last page of the list."
+    assert backend[("GET", "/api/clients")] == 1
+
+def test_paging_follows_the_requested_page_size(backend):
+    session = SessionContext()
+    prompt("list clients", session, {"page_size": 20})
+    third = prompt("clients page 3", session, {"page_size": 20})
+    assert [row["id"] for row in third.result] == list(range(41, 61))
+    assert third.parameters["page"] == 3
+
+def test_paging_without_a_list():
+    assert prompt("previous page", SessionContext()).result == agent.NO_CURSOR_MESSAGE
+
+def test_short_and_limited_lists_are_not_paged():
+    short = ToolResult("list_clients", {}, CLIENTS[:10])
+    limited = ToolResult("list_clients", {"limit": 70}, CLIENTS[:70])
+    assert agent.paginate(short) is short
+    assert agent.paginate(limited) is limited
+
+# Classifier refusals
+
+@pytest.fixture
+def classifier(monkeypatch):
+    """
+    Make the intent classifier return the label set on the fixture, confidently.
+    """
+    guess = {"label": None}
+
+    def classify(prompt):
+        guess["prompts"] = guess.get("prompts", 0) + 1
+        return intent_classifier.Prediction(guess["label"], 0.9, 0.8) if guess["label"] else None
+
+    monkeypatch.setattr(intent_classifier, "classify", classify)
+    return guess
+
+@pytest.mark.parametrize("prompt", ["remove all the clients", "wipe the campaigns"])
+def test_classifier_never_guesses_deletes(classifier, prompt):
+    classifier["label"] = "list_clients"
+    assert agent.select_tool_or_classify(prompt, SessionContext()) == ("respond", {"message": agent.DESTRUCTIVE_MESSAGE})
+    assert "prompts" not in classifier
+
+def test_classifier_guess_doesnt_drop_a_number(classifier):
+    classifier["label"] = "list_campaigns"
+    tool_name, parameters = agent.select_tool_or_classify("could you display campaign 3 for me", SessionContext())
+    assert tool_name == "respond"
+    assert "3" in parameters["message"]
+    assert "tell me about campaign [ID]" in parameters["message"]
+
+def test_classifier_guess_runs_a_read(classifier):
+    classifier["label"] = "list_campaigns"
+    assert agent.select_tool_or_classify("could you display our campaigns for me", SessionContext()) == ("list_campaigns", {})
+
+def test_unconfident_predictions_are_dropped():
+    assert not intent_classifier.is_confident(intent_classifier.Prediction("list_clients", 0.9, 0.05))
+    assert not intent_classifier.is_confident(intent_classifier.Prediction("list_clients", 0.3, 0.3))
+    assert not intent_classifier.is_confident(intent_classifier.Prediction(intent_classifier.OTHER_LABEL, 0.9, 0.8))
+    assert intent_classifier.is_confident(intent_classifier.Prediction("list_clients", 0.9, 0.8))
+
+# Session eviction and expiry
+
+def assert_sizes_consistent(store):
+    assert store.total_bytes == sum(store.sizes.values())
+    for session_id in store.sizes:
+        before = store.sizes[session_id]
+        store._measure(session_id)
+        assert store.sizes[session_id] == before
+
+def test_sessions_over_the_budget_are_evicted_least_recent_first():
+    store = Memory()
+    store.memory_budget = 20_000
+    for n in range(50):
+        store.add_interaction(f"s{n}", "user", "list clients " * 20)
+        store.add_interaction(f"s{n}", "assistant", "x" * 400)
+    assert store.evictions > 0
+    assert store.total_bytes <= store.memory_budget
+    assert "s49" in store.sizes and "s0" not in store.sizes
+    assert list(store.sizes) == sorted(store.sizes, key=lambda session_id: int(session_id[1:]))
+    assert_sizes_consistent(store)
+
+def test_paged_rows_are_counted_once():
+    store = Memory()
+    page = ListCursor("list_clients", {}, CLIENTS, 10).page_result(1)
+    store.add_interaction("s", "assistant", "page 1", page)
+    one_page = store.sizes["s"]
+    for n in range(2, 8):
+        page = page.cursor.page_result(n)
+        store.add_interaction("s", "assistant", f"page {n}", page)
+    assert len(store.cursor_rows["s"]) == 1
+    assert store.sizes["s"] - one_page < memory_module.estimate_size(CLIENTS)
+    assert_sizes_consistent(store)
+
+    store.clear_conversation("s")
+    assert "s" not in store.cursor_rows or not store.cursor_rows["s"]
+    assert_sizes_consistent(store)
+
+def test_idle_sessions_expire(monkeypatch):
+    store = Memory()
+    store.session_ttl = 1
+    now = time.time()
+    store.add_interaction("idle", "user", "hello")
+    store.add_interaction("busy", "user", "hello")
+    monkeypatch.setattr(memory_module.time, "time", lambda: now + 50)
+    store.add_interaction("busy", "user", "still here")
+
+    monkeypatch.setattr(memory_module.time, "time", lambda: now + 70)
+    assert store.cleanup_old_sessions() == 1
+    assert store.get_all_sessions() == ["busy"]
+    assert "idle" not in store.sizes and store.total_bytes == sum(store.sizes.values())
+
+    monkeypatch.setattr(memory_module.time, "time", lambda: now + 120)
+    assert store.cleanup_old_sessions() == 1
+    assert store.get_all_sessions() == [] and store.total_bytes == 0
+
+def test_evicted_sqlite_sessions_reload_with_shared_page_rows(tmp_path):
+    async def scenario():
+        store = SQLiteMemory(str(tmp_path / "memory.db"))
+        page = ListCursor("list_clients", {}, CLIENTS, 50).page_result(1)
+        store.add_interaction("s", "assistant", "page 1", page)
+        store.add_interaction("s", "assistant", "page 2", page.cursor.page_result(2))
+        store.add_interaction("s", "assistant", "batch", ToolResult("get_clients", {}, [(1, CLIENTS[0]), (999, ValueError("not found"))]))
+        await store.flush()
+        store.memory_budget = 1
+        store.add_interaction("other", "user", "hello")
+        await store.flush()
+        assert store.evictions == 1 and "s" not in store.conversations
+
+        history = store.get_conversation_history("s")
+        first, second, batch = (interaction.result for interaction in history)
+        assert [row["id"] for row in second.result] == list(range(51, 101))
+        assert second.cursor.rows is first.cursor.rows
+        assert batch.result[0] == (1, CLIENTS[0]) and str(batch.result[1][1]) == "not found"
+        store.close()
+
+    asyncio.run(scenario())
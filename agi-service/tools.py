@@ -1,46 +1,212 @@
+import asyncio
+import hashlib
 import httpx
 import logging
+import os
+from typing import Optional
+
+import analytics
+from cache import SingleFlight, TTLCache, cached, coalesced, invalidating
 
 logger = logging.getLogger(__name__)
 
 # Base URL for the backend API
-API_BASE_URL = "http://localhost:3001/api"
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:3001/api")
+
+# Connection pool settings for the shared backend client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Batch lookups: maximum IDs per request and concurrent backend calls
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Fields the list tools can filter on or select, mirroring the backend whitelists
+LIST_FIELDS = {
+    "list_clients": ["name", "niche", "contact_person", "contact_email", "notes", "industry", "satisfaction", "tier", "created_at", "updated_at"],
+    "list_campaigns": ["name", "status", "budget", "startDate", "endDate", "targetAudience", "channels", "client", "niche"],
+    "list_content_ideas": ["title", "type", "status", "priority", "client", "niche"],
+}
+
+# get_marketing_data parameters that narrow it to a client or range of months
+MARKETING_SLICE_PARAMETERS = ("client", "start", "end")
+
+# Read-through cache in front of the tool registry
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+
+# Time to live in seconds for each cached read tool
+CACHE_TTLS = {
+    "list_clients": 15,
+    "get_client": 30,
+    "list_campaigns": 15,
+    "get_campaign": 30,
+    "list_content_ideas": 15,
+    "get_content_idea": 30,
+    "get_marketing_data": 60,
+}
+
+# Read tools whose cached results are dropped when a write tool succeeds.
+# Campaigns, content ideas and marketing data carry their client's name, so
+# renaming or deleting a client drops them too.
+CLIENT_NAME_READS = ["list_campaigns", "get_campaign", "list_content_ideas", "get_content_idea", "get_marketing_data"]
+CACHE_INVALIDATIONS = {
+    "add_client": ["list_clients"],
+    "update_client": ["list_clients", "get_client", *CLIENT_NAME_READS],
+    "delete_client": ["list_clients", "get_client", *CLIENT_NAME_READS],
+    "add_campaign": ["list_campaigns"],
+    "add_content_idea": ["list_content_ideas"],
+}
+
+# Tools that change backend state; everything else is a read that is safe to run concurrently
+WRITE_TOOLS = frozenset(CACHE_INVALIDATIONS)
+
+tool_cache = TTLCache(max_entries=TOOL_CACHE_MAX_ENTRIES)
+
+# Deduplicates concurrent identical reads that miss the cache
+single_flight = SingleFlight()
+
+# Shared client, opened by the FastAPI lifespan hook in main.py
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _create_http_client() -> httpx.AsyncClient:
+    """
+    Builds a pooled client configured from the environment.
+    """
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed; falling back to HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
+
+async def open_http_client() -> httpx.AsyncClient:
+    """
+    Opens the shared backend client. Called once at application startup.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+        logger.info(f"Opened backend connection pool for {API_BASE_URL}")
+    return _http_client
+
+async def close_http_client() -> None:
+    """
+    Closes the shared backend client. Called once at application shutdown.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("Closed backend connection pool")
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared backend client, creating it lazily when the tools are
+    used outside the FastAPI app (e.g. from scripts).
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+# List query push-down
+def list_query_params(params):
+    """
+    Translates list tool parameters (filters, limit/offset, fields) into
+    backend query parameters.
+    """
+    if not params:
+        return {}
+
+    query = dict(params.get("filters") or {})
+    if params.get("limit"):
+        query["limit"] = params["limit"]
+    if params.get("offset"):
+        query["offset"] = params["offset"]
+    if params.get("fields"):
+        query["select"] = ",".join(params["fields"])
+    return query
+
+def apply_list_query(response, params):
+    """
+    Returns the records of a list response. If the backend didn't apply the
+    pushed-down query (no X-Query-Applied header), the filters, pagination and
+    field selection are applied here instead.
+    """
+    records = response.json()
+    if not params or not isinstance(records, list) or response.headers.get("X-Query-Applied") == "true":
+        return records
+
+    filters = params.get("filters")
+    if filters:
+        wanted = {field: str(value).casefold() for field, value in filters.items()}
+        records = [
+            record for record in records
+            if all(str(record.get(field) or "").casefold() == value for field, value in wanted.items())
+        ]
+
+    offset = params.get("offset") or 0
+    limit = params.get("limit")
+    if offset or limit:
+        records = records[offset:offset + limit if limit else None]
+
+    fields = params.get("fields")
+    if fields:
+        keep = ["id"] + [field for field in fields if field != "id"]
+        records = [{field: record[field] for field in keep if field in record} for record in records]
+
+    return records
 
 # Client Tools
 async def list_clients(params=None):
     """
     Returns a list of all clients in the database.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info("Calling backend API to list clients")
-            response = await client.get(f"{API_BASE_URL}/clients")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error listing clients: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info("Calling backend API to list clients")
+        response = await client.get(f"{API_BASE_URL}/clients", params=list_query_params(params))
+        response.raise_for_status()
+        return apply_list_query(response, params)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error listing clients: {e}")
+        raise
 
 async def get_client(params):
     """
     Gets a specific client by ID.
     """
     client_id = params.get("id")
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Getting client with ID: {client_id}")
-            response = await client.get(f"{API_BASE_URL}/clients/{client_id}")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting client: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Getting client with ID: {client_id}")
+        response = await client.get(f"{API_BASE_URL}/clients/{client_id}")
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error getting client: {e}")
+        raise
 
 async def add_client(params):
     """
@@ -50,190 +216,253 @@ async def add_client(params):
     if "niche" not in params or params["niche"] is None:
         params["niche"] = ""  # Default empty string if not provided
         
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Adding new client: {params}")
-            response = await client.post(f"{API_BASE_URL}/clients", json=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error adding client: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Adding new client: {params}")
+        response = await client.post(f"{API_BASE_URL}/clients", json=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error adding client: {e}")
+        raise
 
 async def update_client(params):
     """
     Updates an existing client.
     """
     client_id = params.pop("id")
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Updating client {client_id}: {params}")
-            response = await client.put(f"{API_BASE_URL}/clients/{client_id}", json=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error updating client: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Updating client {client_id}: {params}")
+        response = await client.put(f"{API_BASE_URL}/clients/{client_id}", json=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error updating client: {e}")
+        raise
 
 async def delete_client(params):
     """
     Deletes a client from the database.
     """
     client_id = params.get("id")
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Deleting client {client_id}")
-            response = await client.delete(f"{API_BASE_URL}/clients/{client_id}")
-            response.raise_for_status()
-            return response.status_code
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error deleting client: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Deleting client {client_id}")
+        response = await client.delete(f"{API_BASE_URL}/clients/{client_id}")
+        response.raise_for_status()
+        return response.status_code
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting client: {e}")
+        raise
 
 # Campaign Tools
 async def list_campaigns(params=None):
     """
     Returns a list of all campaigns in the database.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info("Calling backend API to list campaigns")
-            response = await client.get(f"{API_BASE_URL}/campaigns")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error listing campaigns: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info("Calling backend API to list campaigns")
+        response = await client.get(f"{API_BASE_URL}/campaigns", params=list_query_params(params))
+        response.raise_for_status()
+        return apply_list_query(response, params)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error listing campaigns: {e}")
+        raise
 
 async def get_campaign(params):
     """
     Gets a specific campaign by ID.
     """
     campaign_id = params.get("id")
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Getting campaign with ID: {campaign_id}")
-            response = await client.get(f"{API_BASE_URL}/campaigns/{campaign_id}")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting campaign: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Getting campaign with ID: {campaign_id}")
+        response = await client.get(f"{API_BASE_URL}/campaigns/{campaign_id}")
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error getting campaign: {e}")
+        raise
 
 async def add_campaign(params):
     """
     Adds a new campaign to the database.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Adding new campaign: {params}")
-            response = await client.post(f"{API_BASE_URL}/campaigns", json=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error adding campaign: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Adding new campaign: {params}")
+        response = await client.post(f"{API_BASE_URL}/campaigns", json=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error adding campaign: {e}")
+        raise
 
 # Content Ideas Tools
 async def list_content_ideas(params=None):
     """
     Returns a list of all content ideas in the database.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info("Calling backend API to list content ideas")
-            response = await client.get(f"{API_BASE_URL}/content-ideas")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error listing content ideas: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info("Calling backend API to list content ideas")
+        response = await client.get(f"{API_BASE_URL}/content-ideas", params=list_query_params(params))
+        response.raise_for_status()
+        return apply_list_query(response, params)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error listing content ideas: {e}")
+        raise
 
 async def get_content_idea(params):
     """
     Gets a specific content idea by ID.
     """
     idea_id = params.get("id")
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Getting content idea with ID: {idea_id}")
-            response = await client.get(f"{API_BASE_URL}/content-ideas/{idea_id}")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting content idea: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Getting content idea with ID: {idea_id}")
+        response = await client.get(f"{API_BASE_URL}/content-ideas/{idea_id}")
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error getting content idea: {e}")
+        raise
 
 async def add_content_idea(params):
     """
     Adds a new content idea to the database.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(f"Adding new content idea: {params}")
-            response = await client.post(f"{API_BASE_URL}/content-ideas", json=params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error adding content idea: {e}")
-            raise
+    client = get_http_client()
+    try:
+        logger.info(f"Adding new content idea: {params}")
+        response = await client.post(f"{API_BASE_URL}/content-ideas", json=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error adding content idea: {e}")
+        raise
 
 # Marketing Data Tools
 async def get_marketing_data(params=None):
     """
-    Returns marketing performance data.
+    Returns marketing performance data, or with a client and/or start/end
+    month the matching rows and their totals, read from the month/client
+    index over the full data.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info("Calling backend API to get marketing data")
-            response = await client.get(f"{API_BASE_URL}/marketing-data")
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise
-        except Exception as e:
-            logger.error(f"Error getting marketing data: {e}")
-            raise
+    if params and any(params.get(name) for name in MARKETING_SLICE_PARAMETERS):
+        rows = await get_tool("get_marketing_data")["execute"]()
+        index = analytics.marketing_frame(rows).index
+        return index.slice(params.get("client"), params.get("start"), params.get("end"))
 
-def get_tools():
+    client = get_http_client()
+    try:
+        logger.info("Calling backend API to get marketing data")
+        response = await client.get(f"{API_BASE_URL}/marketing-data")
+        response.raise_for_status()
+        rows = response.json()
+        # Hashing the body once here is far cheaper than parsing it
+        etag = response.headers.get("ETag") or hashlib.blake2b(response.content, digest_size=16).hexdigest()
+        analytics.fetched_listing(rows, f"{len(rows)}:{etag}")
+        return rows
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
+        raise
+    except Exception as e:
+        logger.error(f"Error getting marketing data: {e}")
+        raise
+
+async def analyze_marketing_data(params):
     """
-    Returns a list of all available tools with their metadata.
-    This registry is used by the agent to determine which tool to use.
+    Runs an analysis (ROI by client, top clients, trend, quarter comparison)
+    over the columnar copy of the marketing data.
+    """
+    rows = await get_tool("get_marketing_data")["execute"]()
+    logger.info(f"Analyzing {len(rows)} marketing data rows: {params}")
+    return analytics.analyze(rows, params or {})
+
+# Batch Tools
+async def get_many(tool_name, ids, concurrency=None):
+    """
+    Fetches several records through a registry read tool with bounded
+    concurrency. Returns a list of (id, record) pairs in request order, where
+    a failed lookup carries the exception instead of the record.
+    """
+    execute = get_tool(tool_name)["execute"]
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+
+    async def fetch(record_id):
+        async with semaphore:
+            return await execute({"id": record_id})
+
+    logger.info(f"Fetching {len(ids)} records with {tool_name}")
+    results = await asyncio.gather(*(fetch(record_id) for record_id in ids), return_exceptions=True)
+    return list(zip(ids, results))
+
+async def get_clients(params):
+    """
+    Gets several clients by ID.
+    """
+    return await get_many("get_client", params.get("ids", []))
+
+async def get_campaigns(params):
+    """
+    Gets several campaigns by ID.
+    """
+    return await get_many("get_campaign", params.get("ids", []))
+
+async def get_content_ideas(params):
+    """
+    Gets several content ideas by ID.
+    """
+    return await get_many("get_content_idea", params.get("ids", []))
+
+def _build_registry():
+    """
+    Returns the raw tool definitions, before caching is applied.
     """
     return [
         # Client Tools
         {
             "name": "list_clients",
             "description": "Returns a list of all clients in the database.",
-            "parameters": {},
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "filters": {"type": "object", "description": "Field/value pairs the clients must match"},
+                    "limit": {"type": "integer", "description": "Maximum number of clients to return"},
+                    "offset": {"type": "integer", "description": "Number of clients to skip"},
+                    "fields": {"type": "array", "description": "Only return these fields (the ID is always included)"},
+                },
+            },
             "execute": list_clients,
         },
         {
@@ -299,7 +528,15 @@ def get_tools():
         {
             "name": "list_campaigns",
             "description": "Returns a list of all marketing campaigns in the database.",
-            "parameters": {},
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "filters": {"type": "object", "description": "Field/value pairs the campaigns must match"},
+                    "limit": {"type": "integer", "description": "Maximum number of campaigns to return"},
+                    "offset": {"type": "integer", "description": "Number of campaigns to skip"},
+                    "fields": {"type": "array", "description": "Only return these fields (the ID is always included)"},
+                },
+            },
             "execute": list_campaigns,
         },
         {
@@ -339,7 +576,15 @@ def get_tools():
         {
             "name": "list_content_ideas",
             "description": "Returns a list of all content ideas in the database.",
-            "parameters": {},
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "filters": {"type": "object", "description": "Field/value pairs the content ideas must match"},
+                    "limit": {"type": "integer", "description": "Maximum number of content ideas to return"},
+                    "offset": {"type": "integer", "description": "Number of content ideas to skip"},
+                    "fields": {"type": "array", "description": "Only return these fields (the ID is always included)"},
+                },
+            },
             "execute": list_content_ideas,
         },
         {
@@ -372,11 +617,102 @@ def get_tools():
             "execute": add_content_idea,
         },
         
+        # Batch Tools
+        {
+            "name": "get_clients",
+            "description": "Gets several clients by ID in one request.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ids": {"type": "array", "description": "The IDs of the clients to retrieve"},
+                },
+                "required": ["ids"]
+            },
+            "execute": get_clients,
+        },
+        {
+            "name": "get_campaigns",
+            "description": "Gets several marketing campaigns by ID in one request.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ids": {"type": "array", "description": "The IDs of the campaigns to retrieve"},
+                },
+                "required": ["ids"]
+            },
+            "execute": get_campaigns,
+        },
+        {
+            "name": "get_content_ideas",
+            "description": "Gets several content ideas by ID in one request.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "ids": {"type": "array", "description": "The IDs of the content ideas to retrieve"},
+                },
+                "required": ["ids"]
+            },
+            "execute": get_content_ideas,
+        },
+        
         # Marketing Data Tools
         {
             "name": "get_marketing_data",
-            "description": "Returns marketing performance data.",
-            "parameters": {},
+            "description": "Returns marketing performance data, optionally for one client and/or a range of months.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "client": {"type": "string", "description": "Only this client's rows"},
+                    "start": {"type": "string", "description": "First month, e.g. 'March' or '2024-03'"},
+                    "end": {"type": "string", "description": "Last month (defaults to the start month)"},
+                    "metric": {"type": "string", "description": "revenue, spend or roi to headline in the response"},
+                },
+            },
             "execute": get_marketing_data,
         },
-    ] 
\ No newline at end of file
+        {
+            "name": "analyze_marketing_data",
+            "description": "Aggregates marketing performance data: ROI by client, top clients by a metric, a monthly trend, or a quarter comparison.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "analysis": {"type": "string", "description": "roi_by_client, top_clients, trend or compare_quarters"},
+                    "metric": {"type": "string", "description": "revenue, spend or roi"},
+                    "limit": {"type": "integer", "description": "Number of clients for top_clients"},
+                    "months": {"type": "integer", "description": "Number of recent months for trend"},
+                    "quarters": {"type": "array", "description": "[quarter, year or null] pairs for compare_quarters"},
+                },
+                "required": ["analysis"]
+            },
+            "execute": analyze_marketing_data,
+        },
+    ] 
+
+def _with_cache(tool):
+    """
+    Puts the read-through cache and request coalescing in front of a
+    tool's execute function.
+    """
+    name = tool["name"]
+    if name in CACHE_TTLS:
+        execute = coalesced(name, tool["execute"], single_flight)
+        tool["execute"] = cached(name, execute, tool_cache, CACHE_TTLS[name])
+    elif name in CACHE_INVALIDATIONS:
+        tool["execute"] = invalidating(tool["execute"], tool_cache, CACHE_INVALIDATIONS[name], single_flight)
+    return tool
+
+_TOOLS = [_with_cache(tool) for tool in _build_registry()]
+_TOOLS_BY_NAME = {tool["name"]: tool for tool in _TOOLS}
+
+def get_tools():
+    """
+    Returns a list of all available tools with their metadata.
+    This registry is used by the agent to determine which tool to use.
+    """
+    return _TOOLS
+
+def get_tool(name):
+    """
+    Returns a single tool from the registry, or None if it doesn't exist.
+    """
+    return _TOOLS_BY_NAME.get(name)
@@ -1,9 +1,15 @@
 const db = require('../model/db');
+const listQuery = require('../model/list_query');
+
+// Fields that can be filtered on or selected when listing
+const CAMPAIGN_FIELDS = ['id', 'name', 'status', 'budget', 'startDate', 'endDate', 'targetAudience', 'channels', 'client', 'niche'];
 
 const getAllCampaigns = async (req, res) => {
     try {
-        const { data, error } = await db.from('campaigns').select('*');
+        const { data, error } = await listQuery('campaigns', req.query, CAMPAIGN_FIELDS);
         if (error) throw error;
+        // Tell callers the filters and pagination were applied here
+        res.set('X-Query-Applied', 'true');
         res.status(200).json(data);
     } catch (error) {
         console.error("Error fetching campaigns:", error.message);
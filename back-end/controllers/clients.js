@@ -1,9 +1,15 @@
 const db = require('../model/db');
+const listQuery = require('../model/list_query');
+
+// Fields that can be filtered on or selected when listing
+const CLIENT_FIELDS = ['id', 'name', 'niche', 'contact_person', 'contact_email', 'notes', 'industry', 'satisfaction', 'tier', 'created_at', 'updated_at'];
 
 const getAllClients = async (req, res) => {
     try {
-        const { data, error } = await db.from('clients').select('*');
+        const { data, error } = await listQuery('clients', req.query, CLIENT_FIELDS);
         if (error) throw error;
+        // Tell callers the filters and pagination were applied here
+        res.set('X-Query-Applied', 'true');
         res.status(200).json(data);
     } catch (error) {
         console.error("Error fetching clients:", error.message);
@@ -1,9 +1,15 @@
 const db = require('../model/db');
+const listQuery = require('../model/list_query');
+
+// Fields that can be filtered on or selected when listing
+const CONTENT_IDEA_FIELDS = ['id', 'title', 'type', 'status', 'priority', 'client', 'niche'];
 
 const getAllContentIdeas = async (req, res) => {
     try {
-        const { data, error } = await db.from('content_ideas').select('*');
+        const { data, error } = await listQuery('content_ideas', req.query, CONTENT_IDEA_FIELDS);
         if (error) throw error;
+        // Tell callers the filters and pagination were applied here
+        res.set('X-Query-Applied', 'true');
         res.status(200).json(data);
     } catch (error) {
         console.error("Error fetching content ideas:", error.message);
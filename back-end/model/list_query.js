@@ -0,0 +1,38 @@
+const db = require('./db');
+
+// Escape LIKE wildcards so filter values match literally
+const escapeLike = (value) => String(value).replace(/[\\%_]/g, (char) => `\\${char}`);
+
+// Build a list query from the request query string.
+// Supported parameters:
+//   <field>=<value>  case-insensitive equality filter on an allowed field
+//   select=a,b       only return the given fields (the id is always included)
+//   limit=N          return at most N rows
+//   offset=N         skip the first N rows (used together with limit)
+const listQuery = (table, query, allowedFields) => {
+    const requested = String(query.select || '')
+        .split(',')
+        .map((field) => field.trim())
+        .filter((field) => allowedFields.includes(field));
+    const columns = requested.length > 0 ? ['id', ...requested.filter((field) => field !== 'id')].join(',') : '*';
+
+    let request = db.from(table).select(columns);
+
+    for (const field of allowedFields) {
+        if (field !== 'id' && query[field] !== undefined && query[field] !== '') {
+            request = request.ilike(field, escapeLike(query[field]));
+        }
+    }
+
+    const limit = parseInt(query.limit, 10);
+    const offset = parseInt(query.offset, 10) || 0;
+    if (limit > 0) {
+        request = request.range(offset, offset + limit - 1);
+    } else if (offset > 0) {
+        request = request.range(offset, offset + 999);
+    }
+
+    return request;
+};
+
+module.exports = listQuery;